@@ -0,0 +1,166 @@
+import time
+from collections import OrderedDict
+import numpy as np
+
+# --- PARAMETERS ---
+CONTEXT_PLANS = 16          # FFT plans (size, rate, batch) kept; the least recently used goes first
+CONTEXT_WINDOWS = 256       # Window tables kept, one per length and kind; small, so many
+DEFAULT_WINDOW = "hann"
+WINDOWS = {"hann": np.hanning, "hamming": np.hamming, "blackman": np.blackman, "rectangular": np.ones}
+
+# numpy 2 can write an FFT into a given array; older versions allocate and we copy
+try:
+    np.fft.rfft(np.zeros(2), out=np.zeros(2, dtype=complex))
+    FFT_OUT = True
+except TypeError:
+    FFT_OUT = False
+
+# --- PLAN ---
+class SpectrumPlan:
+    # A size-point FFT of batch channels at sample_rate, worked out and
+    # allocated once: the frequency axis (read-only, may be kept) and the
+    # scratch arrays. Any record up to size samples long goes through the
+    # same plan, zero-padded, so segments of varying length share it and
+    # only their windows differ.
+    def __init__(self, size, sample_rate, batch):
+        self.size = size
+        self.freqs = np.fft.rfftfreq(size, 1.0 / sample_rate)
+        self.freqs.flags.writeable = False
+        self.frame = np.zeros(batch + (size,))
+        self.mean = np.zeros(batch + (1,))
+        self.spectrum = np.zeros(batch + (size // 2 + 1,), dtype=complex)
+        self.amplitude = np.zeros(batch + (size // 2 + 1,))
+
+    def __call__(self, values, window, out=None):
+        # Amplitude of values (batch + (length,)) under window, a
+        # (coefficients, gain) pair from AnalysisContext.window, with the
+        # mean removed so a pure tone reads its own size. Written into out,
+        # else into the plan's own array, which the next call overwrites.
+        coefficients, gain = window
+        length = len(coefficients)
+        frame = self.frame[..., :length]
+        np.mean(values, axis=-1, keepdims=True, out=self.mean)
+        np.subtract(values, self.mean, out=frame)
+        frame *= coefficients
+        self.frame[..., length:] = 0.0  # Padding, whatever a longer record left there
+        if FFT_OUT:
+            np.fft.rfft(self.frame, axis=-1, out=self.spectrum)
+        else:
+            self.spectrum[...] = np.fft.rfft(self.frame, axis=-1)
+        out = self.amplitude if out is None else out
+        np.abs(self.spectrum, out=out)
+        out *= gain
+        return out
+
+# --- CONTEXT ---
+class AnalysisContext:
+    # Two LRU caches: FFT plans keyed by (FFT size, sample rate, batch
+    # shape), which hold the big scratch arrays, and window tables keyed by
+    # (length, kind). A batch over segments of many lengths padded to one
+    # size uses one plan, so it neither reallocates scratch per segment
+    # nor pushes other analyzers' plans out; once its windows are cached,
+    # a repeat allocates no arrays (numpy's FFT keeps its own small
+    # scratch). Plans share scratch arrays, so a context is for one
+    # thread; give a worker thread its own.
+    def __init__(self, capacity=CONTEXT_PLANS, windows=CONTEXT_WINDOWS):
+        self.capacity = capacity
+        self.window_capacity = windows
+        self.plans = OrderedDict()
+        self.windows = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, cache, capacity, key, make):
+        value = cache.get(key)
+        if value is None:
+            self.misses += 1
+            value = cache[key] = make()
+            if len(cache) > capacity:
+                cache.popitem(last=False)
+        else:
+            self.hits += 1
+            cache.move_to_end(key)
+        return value
+
+    def plan(self, size, sample_rate, batch=()):
+        return self._lookup(self.plans, self.capacity, (size, float(sample_rate), tuple(batch)),
+                            lambda: SpectrumPlan(size, sample_rate, tuple(batch)))
+
+    def window(self, length, kind=DEFAULT_WINDOW):
+        # (read-only coefficients, amplitude gain) of a window of length samples
+        def make():
+            coefficients = WINDOWS[kind](length)
+            coefficients.flags.writeable = False
+            return coefficients, 2.0 / coefficients.sum()
+        return self._lookup(self.windows, self.window_capacity, (length, kind), make)
+
+    def spectrum(self, values, sample_rate, window=DEFAULT_WINDOW, size=None, out=None):
+        # (frequencies, amplitude) of (..., length) values in one call
+        values = np.asarray(values, dtype=float)
+        length = values.shape[-1]
+        plan = self.plan(length if size is None else size, sample_rate, values.shape[:-1])
+        return plan.freqs, plan(values, self.window(length, window), out)
+
+    def clear(self):
+        self.plans.clear()
+        self.windows.clear()
+
+CONTEXT = AnalysisContext()  # Shared by the analyzers in this repo, all on the main thread
+
+if __name__ == "__main__":
+    import tracemalloc
+
+    # The per-window spectrum the analyzers take, 256 samples at 120 Hz,
+    # as it was written (window, axis and arrays made every call) and
+    # through a context
+    rng = np.random.default_rng(16)
+    sample_rate = 120.0
+    windows = rng.standard_normal((2000, 256))
+
+    def fresh(values):
+        window = np.hanning(len(values))
+        amplitude = 2.0 * np.abs(np.fft.rfft((values - values.mean()) * window)) / window.sum()
+        return np.fft.rfftfreq(len(values), 1.0 / sample_rate), amplitude
+
+    context = AnalysisContext()
+    out = np.zeros(129)
+    for name, analyse in [("made every call", fresh),
+                          ("from the context", lambda values: context.spectrum(values, sample_rate, out=out))]:
+        analyse(windows[0])
+        started = time.perf_counter()
+        for values in windows:
+            analyse(values)
+        elapsed = time.perf_counter() - started
+        tracemalloc.start()
+        for values in windows[:100]:
+            analyse(values)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:>16}: {elapsed / len(windows) * 1e6:.1f} us per window, "
+              f"at most {peak} bytes allocated at once")
+    error = np.max(np.abs(fresh(windows[-1])[1] - context.spectrum(windows[-1], sample_rate)[1]))
+    print(f"Same spectrum either way: max difference {error:.1e}; plans {len(context.plans)}, "
+          f"hits {context.hits}, misses {context.misses}")
+
+    # Batch: 40 segments of different lengths padded to one FFT size, as
+    # segment_spectrum does with a phase's unbroken stretches
+    lengths = rng.integers(64, 1024, 40)
+    segments = [rng.standard_normal(length) for length in lengths]
+    context = AnalysisContext()
+    for run in range(3):
+        misses = context.misses
+        tracemalloc.start()
+        for segment in segments:
+            context.spectrum(segment, sample_rate, size=1024)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"40 segment lengths, run {run + 1}: {context.misses - misses} misses, "
+              f"at most {peak / 1024:.1f} KB allocated at once")
+
+    # Batch: 100 channels at once through one plan
+    fleet = rng.standard_normal((100, 1024))
+    started = time.perf_counter()
+    for _ in range(100):
+        context.spectrum(fleet, sample_rate)
+    elapsed = time.perf_counter() - started
+    print(f"100 channels x 1024 samples: {elapsed / 100 * 1000:.2f} ms per batch")
@@ -6,6 +6,19 @@ import random
 import numpy as np
 from OpenGL.GL import *
 from OpenGL.GLU import *
+from fixed_timestep import FixedTimestep, PHYSICS_HZ, lerp, lerp_list, lerp_angle
+from mecanum import MecanumDrive, MOTOR_DIRECTIONS, chassis_velocity
+from motion_profile import (LiftJog, MAX_LIFT_SPEED, SCREW_LEAD, SCREW_ROD_LENGTH, SCREW_ROD_RADIUS, STEPPER_SIZE,
+                            LIFT_TRAVEL)
+from fork_dynamics import ForkDynamics, FLOOR_ROUGHNESS, VIBRATION_DISPLAY_GAIN, VIBRATION_THRESHOLD, load_reading
+from load_estimator import LoadEstimator
+from hx711 import simulated_loadcell
+from load_classifier import LoadStateStream, load_model
+from resonance_table import load_table
+from order_tracking import runout_acceleration
+from spectrogram_hud import SpectrogramPanel
+from timeseries_store import TimeSeriesStore, zoom_span, span_label
+from filters import loadcell_bank
 
 # --- PARAMETERS ---
 WIDTH, HEIGHT = 1024, 768
@@ -29,9 +42,6 @@ FORKLIFT_HEIGHT = 0.5
 WHEEL_RADIUS = 0.3
 WHEEL_WIDTH = 0.2
 WHEEL_ROLLERS = 12
-SCREW_ROD_LENGTH = 2.0
-SCREW_ROD_RADIUS = 0.05
-STEPPER_SIZE = 0.25
 FORK_WIDTH = 1.0
 FORK_LENGTH = 1.8
 FORK_THICKNESS = 0.1
@@ -42,19 +52,39 @@ rotation = 0
 fork_height = 0
 max_fork_height = 95  # Set to 95% to prevent exceeding rod length
 min_fork_height = 5   # Minimum height to prevent going beyond bottom
-wheel_steering = [0, 0, 0, 0]
+wheel_speeds = [0.0, 0.0, 0.0, 0.0]  # rad/s, positive driving forward
+wheel_spin = [0, 0, 0, 0]  # Degrees each wheel has turned about its axle
+chassis_speed = 0.0  # m/s over the floor
 screw_rotation = [0, 0]  # Left and right screw rods
 
-# Movement parameters
-linear_speed = 0.1
-angular_speed = 2
-fork_speed = 1
-screw_rotation_speed = 15  # Degrees per frame when raising/lowering
+# Movement parameters (physical units, so motion doesn't depend on frame rate)
+linear_speed = 6.0  # m/s
+angular_speed = 120  # Degrees per second
+physics_clock = FixedTimestep(PHYSICS_HZ)
+drive = MecanumDrive(FORKLIFT_WIDTH, FORKLIFT_LENGTH, WHEEL_RADIUS)
+LIFT_PERCENT_PER_METRE = (max_fork_height - min_fork_height) / LIFT_TRAVEL
+lift = LiftJog(MAX_LIFT_SPEED)  # Acceleration-limited lift at the motor's real top speed, ramping while R/F are held
+fork = ForkDynamics()  # Fork and lead screw as a mass-spring-damper
+loadcell_adc = simulated_loadcell()  # HX711 the load cell is read through: 24-bit counts and their calibration
+load_estimator = LoadEstimator(dt=1.0 / PHYSICS_HZ)  # Payload mass inferred from the load cell alone
+load_state = LoadStateStream(load_model())  # Empty/light/medium/heavy, classified from windows of the load cell
+resonance = load_table()  # Expected fork modes over height and load, looked up per frame
+spectrogram = SpectrogramPanel()  # Fork vibration over time, scrolling under the load cell graph
+
+# Render state (physics state interpolated between the last two steps)
+render_position = [0, 0, 0]
+render_rotation = 0
+render_fork_height = 0
+render_screw_rotation = [0, 0]
+render_wheel_spin = [0, 0, 0, 0]
 
 # Loadcell parameters
-loadcell_data = []
-MAX_DATA_POINTS = 100
-vibration_amplitude = 0.0
+loadcell_store = TimeSeriesStore()  # Every load cell sample, with min/max/mean tiers for zooming out
+loadcell_filters = loadcell_bank(PHYSICS_HZ)  # Streaming low-pass, notch and DC blocker stages on the load cell
+HUD_SIGNAL = "display"  # Filter bank output the graph draws: "raw", "display" (low-passed) or "vibration" (DC-blocked)
+MAX_DATA_POINTS = 200  # Samples shown in the graph before zooming, taken once per physics step
+graph_span = MAX_DATA_POINTS  # Samples across the graph; Page Up/Down zoom out/in
+vibration_amplitude = 0.0  # m
 load_weight = 0.0
 is_vibrating = False
 
@@ -181,12 +211,13 @@ def create_loadcell(width, height, depth, color=METAL):
     glPopMatrix()
 
 # --- MAIN DRAW FUNCTION ---
+# Kept on the GL matrix stack rather than scene_graph: this script has no
+# picking or collision, so nothing but this one pass per frame needs the
+# fork's transforms, and a cached graph would only add matrix products.
 def draw_forklift():
-    global vibration_amplitude, is_vibrating
-    
     glPushMatrix()
-    glTranslatef(position[0], position[1], position[2])
-    glRotatef(rotation, 0, 0, 1)
+    glTranslatef(render_position[0], render_position[1], render_position[2])
+    glRotatef(render_rotation, 0, 0, 1)
     create_cube(FORKLIFT_WIDTH, FORKLIFT_LENGTH, FORKLIFT_HEIGHT, BLUE)
     wheel_positions = [
         (-FORKLIFT_WIDTH/2, -FORKLIFT_LENGTH/2 + WHEEL_RADIUS, -FORKLIFT_HEIGHT/2),
@@ -198,11 +229,11 @@ def draw_forklift():
     for i, (wx, wy, wz) in enumerate(wheel_positions):
         glPushMatrix()
         glTranslatef(wx, wy, wz)
-        glRotatef(wheel_steering[i], 0, 0, 1)
         if i == 0 or i == 3:
             glRotatef(90, 0, 1, 0)
         else:
             glRotatef(-90, 0, 1, 0)
+        glRotatef(render_wheel_spin[i], 0, 0, 1)
         create_mecanum_wheel(WHEEL_RADIUS, WHEEL_WIDTH, WHEEL_ROLLERS, wheel_angles[i])
         glPopMatrix()
     # --- Vertical support and rods ---
@@ -229,20 +260,18 @@ def draw_forklift():
         glPopMatrix()
         glPushMatrix()
         glTranslatef(0, 0, STEPPER_SIZE * 1.25)
-        create_threaded_rod(rod_height - STEPPER_SIZE * 1.25, SCREW_ROD_RADIUS, screw_rotation[i])
+        create_threaded_rod(rod_height - STEPPER_SIZE * 1.25, SCREW_ROD_RADIUS, render_screw_rotation[i])
         glPopMatrix()
         glPopMatrix()
     
     # Calculate normalized height percentage (0.0 to 1.0)
-    normalized_height = (fork_height - min_fork_height) / (max_fork_height - min_fork_height)
+    normalized_height = (render_fork_height - min_fork_height) / (max_fork_height - min_fork_height)
     # Scale to actual rod height (accounting for limits)
     usable_rod_height = rod_height - STEPPER_SIZE * 1.25 - SCREW_ROD_RADIUS * 8
     current_height = STEPPER_SIZE * 1.25 + normalized_height * usable_rod_height
     
     # --- Acrylic fork attached to T-nuts with vibration ---
-    fork_vibration_offset = 0
-    if is_vibrating:
-        fork_vibration_offset = math.sin(pygame.time.get_ticks() * 0.01) * vibration_amplitude
+    fork_vibration_offset = float(fork.displacement) * VIBRATION_DISPLAY_GAIN
     
     glPushMatrix()
     glTranslatef(0, 0.1, current_height + fork_vibration_offset)
@@ -321,7 +350,7 @@ def draw_grid():
     glEnable(GL_LIGHTING)
 
 def draw_loadcell_graph():
-    if not loadcell_data:
+    if not loadcell_store.count:
         return
         
     glMatrixMode(GL_PROJECTION)
@@ -353,16 +382,26 @@ def draw_loadcell_graph():
     glVertex2f(WIDTH - 300, HEIGHT - 20)
     glEnd()
     
-    # Draw data points
+    # Draw data points from the tier that fits the graph: each bucket's
+    # min/max as a dark bar, the means as the line
+    times, low, high, mean = loadcell_store.latest(graph_span, 280)
+    xs = (WIDTH - 300 + 280 * (times - max(loadcell_store.count - graph_span, 0)) / graph_span).tolist()
+    glColor3f(0.0, 0.4, 0.0)
+    glBegin(GL_LINES)
+    for x, bottom, top in zip(xs, low.tolist(), high.tolist()):
+        glVertex2f(x, HEIGHT - 110 + bottom * 80)
+        glVertex2f(x, HEIGHT - 110 + top * 80)
+    glEnd()
     glColor3f(0.0, 1.0, 0.0)
     glBegin(GL_LINE_STRIP)
-    data_len = len(loadcell_data)
-    for i, value in enumerate(loadcell_data):
-        x = WIDTH - 300 + (280 * i / MAX_DATA_POINTS)
+    for x, value in zip(xs, mean.tolist()):
         y = HEIGHT - 110 + value * 80  # Scale for display
         glVertex2f(x, y)
     glEnd()
     
+    # Fork vibration spectrogram underneath: time to the right, 0 Hz at the bottom
+    spectrogram.draw(WIDTH - 300, HEIGHT - 400, WIDTH - 20, HEIGHT - 230)
+    
     glEnable(GL_DEPTH_TEST)
     glEnable(GL_LIGHTING)
     glMatrixMode(GL_PROJECTION)
@@ -370,47 +409,98 @@ def draw_loadcell_graph():
     glMatrixMode(GL_MODELVIEW)
     glPopMatrix()
 
-def update_physics():
-    global screw_rotation, loadcell_data, vibration_amplitude, is_vibrating
+def update_physics(dt):
+    global screw_rotation, vibration_amplitude, is_vibrating
     
-    keys = pygame.key.get_pressed()
-    if keys[K_r] and fork_height < max_fork_height:
-        screw_rotation[0] = (screw_rotation[0] + screw_rotation_speed) % 360
-        screw_rotation[1] = (screw_rotation[1] + screw_rotation_speed) % 360
-    elif keys[K_f] and fork_height > min_fork_height:
-        screw_rotation[0] = (screw_rotation[0] - screw_rotation_speed) % 360
-        screw_rotation[1] = (screw_rotation[1] - screw_rotation_speed) % 360
+    # The screws turn with the lift's actual speed
+    screw_rate = lift.velocity / SCREW_LEAD * 360  # Degrees per second
+    screw_rotation[0] = (screw_rotation[0] + screw_rate * dt) % 360
+    screw_rotation[1] = (screw_rotation[1] + screw_rate * dt) % 360
     
-    # Update loadcell data
-    base_value = load_weight / 10.0  # Base value depends on weight
+    # The fork rings on the mast: driven by the lift's acceleration, the
+    # screws' runout and floor bumps that grow with travel speed
+    height = (fork_height - min_fork_height) / LIFT_PERCENT_PER_METRE
+    bumps = FLOOR_ROUGHNESS * chassis_speed * random.gauss(0, 1)
+    fork.step(dt, lift.acceleration + runout_acceleration(screw_rotation[0], screw_rate) + bumps, load_weight, height)
+    spectrogram.push(float(fork.displacement))
+    vibration_amplitude = float(fork.amplitude(load_weight, height))
+    is_vibrating = vibration_amplitude > VIBRATION_THRESHOLD
+    fork_acceleration = float(fork.acceleration(load_weight, height))
+    force = load_weight * fork_acceleration
     
     # Add some noise
     noise = random.uniform(-0.05, 0.05)
     
-    # Add vibration if fork is moving or if there's active vibration
-    movement_vibration = 0
-    if (keys[K_r] or keys[K_f]) and (fork_height > min_fork_height and fork_height < max_fork_height):
-        movement_vibration = math.sin(pygame.time.get_ticks() * 0.01) * 0.2
-        is_vibrating = True
-        vibration_amplitude = 0.03 + (load_weight * 0.01)
-    elif is_vibrating:
-        # Gradually reduce vibration when movement stops
-        vibration_amplitude *= 0.98
-        if vibration_amplitude < 0.001:
-            is_vibrating = False
-            vibration_amplitude = 0
-    
     # Calculate current value and add to data
-    current_value = base_value + noise + movement_vibration
-    loadcell_data.append(current_value)
+    counts = loadcell_adc.counts(load_reading(load_weight, force) + noise)  # What the HX711 would report
+    current_value = loadcell_adc.units(counts)
+    load_estimator.update(current_value, fork_acceleration)
+    load_state.push(current_value)
+    filtered = loadcell_filters.push(current_value)
+    loadcell_store.push(filtered[HUD_SIGNAL])
+
+def update_wheels(previous_position, previous_rotation, dt):
+    global chassis_speed
     
-    # Keep only the last MAX_DATA_POINTS values
-    if len(loadcell_data) > MAX_DATA_POINTS:
-        loadcell_data.pop(0)
+    # Wheel speeds from how the chassis actually moved this step
+    vx, vy, omega = chassis_velocity(previous_position, previous_rotation, position, rotation, dt).tolist()
+    wheel_speeds[:] = drive.wheel_speeds_scalar(vx, vy, omega)
+    chassis_speed = math.hypot(vx, vy)
+    for i, speed in enumerate(wheel_speeds):
+        wheel_spin[i] = (wheel_spin[i] + math.degrees(speed * dt) * MOTOR_DIRECTIONS[i]) % 360
+
+def handle_movement(keys, dt):
+    global rotation, fork_height
+    
+    previous_position, previous_rotation = position.copy(), rotation
+    step = linear_speed * dt
+    if keys[K_w]:
+        position[0] += step * math.sin(math.radians(rotation))
+        position[1] -= step * math.cos(math.radians(rotation))
+        
+    if keys[K_s]:
+        position[0] -= step * math.sin(math.radians(rotation))
+        position[1] += step * math.cos(math.radians(rotation))
+        
+    if keys[K_a]:
+        position[0] -= step * math.cos(math.radians(rotation))
+        position[1] -= step * math.sin(math.radians(rotation))
+        
+    if keys[K_d]:
+        position[0] += step * math.cos(math.radians(rotation))
+        position[1] += step * math.sin(math.radians(rotation))
+        
+    if keys[K_q]:
+        rotation = (rotation - angular_speed * dt) % 360
+        
+    if keys[K_e]:
+        rotation = (rotation + angular_speed * dt) % 360
+    
+    # The lift ramps up and down within the motion profile's limits
+    command = 1 if keys[K_r] else -1 if keys[K_f] else 0
+    direction = lift.velocity or command
+    room = (max_fork_height - fork_height) if direction > 0 else (fork_height - min_fork_height)
+    fork_height += lift.update(command, dt, load_weight, room / LIFT_PERCENT_PER_METRE) * dt * LIFT_PERCENT_PER_METRE
+    
+    # Constrain fork height within limits
+    fork_height = max(min_fork_height, min(fork_height, max_fork_height))
+    update_wheels(previous_position, previous_rotation, dt)
+
+def snapshot_state():
+    return (position.copy(), rotation, fork_height, screw_rotation.copy(), wheel_spin.copy())
+
+def interpolate_render_state(previous, alpha):
+    global render_rotation, render_fork_height
+    previous_position, previous_rotation, previous_fork_height, previous_screw_rotation, previous_wheel_spin = previous
+    render_position[:] = lerp_list(previous_position, position, alpha)
+    render_rotation = lerp_angle(previous_rotation, rotation, alpha)
+    render_fork_height = lerp(previous_fork_height, fork_height, alpha)
+    render_screw_rotation[:] = [lerp_angle(a, b, alpha) for a, b in zip(previous_screw_rotation, screw_rotation)]
+    render_wheel_spin[:] = [lerp_angle(a, b, alpha) for a, b in zip(previous_wheel_spin, wheel_spin)]
 
 # --- MAIN LOOP ---
 def main():
-    global position, rotation, fork_height, wheel_steering, load_weight
+    global position, rotation, fork_height, load_weight, graph_span
     
     pygame.init()
     pygame.display.set_mode((WIDTH, HEIGHT), DOUBLEBUF | OPENGL)
@@ -435,6 +525,7 @@ def main():
     
     # Initialize fork height to minimum position
     fork_height = min_fork_height
+    previous_state = snapshot_state()
     
     clock = pygame.time.Clock()
     
@@ -464,50 +555,22 @@ def main():
                     load_weight = 5  # Medium load  
                 elif event.key == K_4:
                     load_weight = 10  # Heavy load
+                elif event.key == K_PAGEUP:
+                    graph_span = zoom_span(graph_span, 1, max(loadcell_store.history, MAX_DATA_POINTS))
+                elif event.key == K_PAGEDOWN:
+                    graph_span = zoom_span(graph_span, -1, max(loadcell_store.history, MAX_DATA_POINTS))
                     
         keys = pygame.key.get_pressed()
         if keys[K_ESCAPE]:
             pygame.quit()
             sys.exit()
             
-        if keys[K_w]:
-            position[0] += linear_speed * math.sin(math.radians(rotation))
-            position[1] -= linear_speed * math.cos(math.radians(rotation))
-            wheel_steering[:] = [0, 0, 0, 0]
-            
-        if keys[K_s]:
-            position[0] -= linear_speed * math.sin(math.radians(rotation))
-            position[1] += linear_speed * math.cos(math.radians(rotation))
-            wheel_steering[:] = [0, 0, 0, 0]
-            
-        if keys[K_a]:
-            position[0] -= linear_speed * math.cos(math.radians(rotation))
-            position[1] -= linear_speed * math.sin(math.radians(rotation))
-            wheel_steering[:] = [15, -15, -15, 15]
-            
-        if keys[K_d]:
-            position[0] += linear_speed * math.cos(math.radians(rotation))
-            position[1] += linear_speed * math.sin(math.radians(rotation))
-            wheel_steering[:] = [-15, 15, 15, -15]
-            
-        if keys[K_q]:
-            rotation = (rotation - angular_speed) % 360
-            wheel_steering[:] = [20, 20, -20, -20]
-            
-        if keys[K_e]:
-            rotation = (rotation + angular_speed) % 360
-            wheel_steering[:] = [-20, -20, 20, 20]
-            
-        if keys[K_r] and fork_height < max_fork_height:
-            fork_height += fork_speed
-            
-        if keys[K_f] and fork_height > min_fork_height:
-            fork_height -= fork_speed
-            
-        # Constrain fork height within limits
-        fork_height = max(min_fork_height, min(fork_height, max_fork_height))
-        
-        update_physics()
+        # Run physics in fixed steps, then draw in between the last two states
+        for dt in physics_clock.steps(clock.get_time() / 1000.0):
+            previous_state = snapshot_state()
+            handle_movement(keys, dt)
+            update_physics(dt)
+        interpolate_render_state(previous_state, physics_clock.alpha)
         
         glMatrixMode(GL_PROJECTION)
         glLoadIdentity()
@@ -534,18 +597,22 @@ def main():
             "Q/E - Rotate Left/Right",
             "R/F - Raise/Lower Fork (acrylic sheet)",
             "1-4 - Set Load Weight (0, 2, 5, 10 kg)",
+            f"Page Up/Down - Zoom Load Cell Graph (last {span_label(graph_span, PHYSICS_HZ)})",
             "Right Click + Move - Rotate Camera",
             "Mouse Wheel - Zoom In/Out",
             "ESC - Quit",
             f"Fork Height: {fork_height:.1f}%",
-            f"Load Weight: {load_weight} kg"
+            f"Load Weight: {load_weight} kg (estimated {float(load_estimator.mass):.2f} +- {float(load_estimator.std):.2f} kg)",
+            f"Load State: {load_state.label or 'waiting'} ({load_state.confidence:.0%})",
+            "Expected Resonance: {:.1f} Hz (damping {:.1%})".format(
+                *resonance.fundamental(load_weight, (fork_height - min_fork_height) / LIFT_PERCENT_PER_METRE))
         ]
         
         for i, text in enumerate(instructions):
             display_text(text, 10, 10 + i*20)
             
         pygame.display.flip()
-        clock.tick(60)
+        clock.tick(60)  # Render rate only; physics runs at PHYSICS_HZ
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -9,12 +9,31 @@ import numpy as np
 from OpenGL.GL import *
 from OpenGL.GLU import *
 import matplotlib.pyplot as plt
-from scipy.fft import fft, fftfreq
 import pandas as pd  # Added for CSV export
+from frame_scheduler import FrameScheduler
+from fixed_timestep import FixedTimestep, PHYSICS_HZ, lerp, lerp_list, lerp_angle
+from scene_graph import SceneNode, translation_matrix, rotation_matrix
+from mecanum import MecanumDrive, MOTOR_DIRECTIONS, chassis_velocity
+from motion_profile import (LiftJog, MAX_LIFT_SPEED, SCREW_LEAD, SCREW_ROD_LENGTH, SCREW_ROD_RADIUS, STEPPER_SIZE,
+                            LIFT_TRAVEL)
+from fork_dynamics import ForkDynamics, FLOOR_ROUGHNESS, VIBRATION_DISPLAY_GAIN, VIBRATION_THRESHOLD, load_reading
+from load_estimator import LoadEstimator
+from hx711 import simulated_loadcell, CountStore
+from resonance_table import load_table, RESONANCE_TOLERANCE
+from order_tracking import runout_acceleration, order_spectrum, order_amplitudes, SCREW_ORDERS
+from envelope import EnvelopeAnalyzer, fault_signatures, fault_frequencies, match_faults, wheel_rate
+from wavelet import WaveletStream
+from health_index import HealthMonitor, ALERT_INDEX
+from spectrogram_hud import SpectrogramPanel
+from timeseries_store import TimeSeriesStore, zoom_span, span_label
+from filters import loadcell_bank
+from sample_store import (SampleStore, PHASE_TRAVEL, PHASE_LIFT, PHASE_LIFT_TRAVEL, PHASE_NAMES, phase_of,
+                          segment_spectrum)
 
 # --- PARAMETERS ---
 WIDTH, HEIGHT = 1024, 768
 FPS = 60
+IS_EMSCRIPTEN = std_platform.system() == "Emscripten"
 
 # Colors
 RED = (1, 0, 0)
@@ -39,9 +58,6 @@ FORKLIFT_HEIGHT = 0.5
 WHEEL_RADIUS = 0.3
 WHEEL_WIDTH = 0.2
 WHEEL_ROLLERS = 12
-SCREW_ROD_LENGTH = 2.0
-SCREW_ROD_RADIUS = 0.05
-STEPPER_SIZE = 0.25
 FORK_WIDTH = 1.0
 FORK_LENGTH = 1.8
 FORK_THICKNESS = 0.1
@@ -52,22 +68,57 @@ rotation = 0
 fork_height = 5
 max_fork_height = 95
 min_fork_height = 5
-wheel_steering = [0, 0, 0, 0]
+wheel_speeds = [0.0, 0.0, 0.0, 0.0]  # rad/s, positive driving forward
+wheel_spin = [0, 0, 0, 0]  # Degrees each wheel has turned about its axle
+chassis_speed = 0.0  # m/s over the floor
 screw_rotation = [0, 0]
-linear_speed = 0.1
-angular_speed = 2
-fork_speed = 1
-screw_rotation_speed = 15
+screw_angle = 0.0  # Degrees the screws have turned in total (unwrapped), for order tracking
+linear_speed = 6.0  # m/s
+angular_speed = 120  # Degrees per second
+physics_clock = FixedTimestep(PHYSICS_HZ)
+drive = MecanumDrive(FORKLIFT_WIDTH, FORKLIFT_LENGTH, WHEEL_RADIUS)
+LIFT_PERCENT_PER_METRE = (max_fork_height - min_fork_height) / LIFT_TRAVEL
+lift = LiftJog(MAX_LIFT_SPEED)  # Acceleration-limited lift at the motor's real top speed, ramping while R/F are held
+fork = ForkDynamics()  # Fork and lead screw as a mass-spring-damper
+loadcell_adc = simulated_loadcell()  # HX711 the load cell is read through: 24-bit counts and their calibration
+loadcell_recording = CountStore(["loadcell"], [loadcell_adc])  # Last hour of raw counts, packed int32, saved with the analysis
+load_estimator = LoadEstimator(dt=1.0 / PHYSICS_HZ)  # Payload mass inferred from the load cell alone
+resonance = load_table()  # Expected fork modes over height and load, looked up per frame
+spectrogram = SpectrogramPanel()  # Fork vibration over time, scrolling under the load cell graph
+
+# Render state (physics state interpolated between the last two steps)
+render_position = [0, 0, 0]
+render_rotation = 0
+render_fork_height = 5
+render_screw_rotation = [0, 0]
+render_wheel_spin = [0, 0, 0, 0]
 
 # Loadcell and vibration parameters
-loadcell_data = []
-vibration_data_travel = []
-vibration_data_lift = []
-MAX_DATA_POINTS = 1000
-vibration_amplitude = 0.0
+loadcell_store = TimeSeriesStore()  # Every load cell sample, with min/max/mean tiers for zooming out
+loadcell_filters = loadcell_bank(PHYSICS_HZ)  # Streaming low-pass, notch and DC blocker stages on the load cell
+HUD_SIGNAL = "display"  # Filter bank output the graph draws: "raw", "display" (low-passed) or "vibration" (DC-blocked)
+ANALYSIS_SIGNAL = "vibration"  # Filter bank output the load cell analyzers see
+# Every physics step, timestamped and tagged with phase and load: fork
+# displacement (m), mean wheel speed (rad/s) and screw_angle (degrees)
+samples = SampleStore(["fork", "wheel_speed", "screw_angle"])
+MOVING = (PHASE_TRAVEL, PHASE_LIFT, PHASE_LIFT_TRAVEL)
+TRAVELING = (PHASE_TRAVEL, PHASE_LIFT_TRAVEL)
+LIFTING = (PHASE_LIFT, PHASE_LIFT_TRAVEL)
+resonance_range = [math.inf, 0.0]  # Lowest and highest expected resonance (Hz) while recording
+MAX_DATA_POINTS = 2000  # Samples shown in the load cell graph before zooming
+graph_span = MAX_DATA_POINTS  # Samples across the load cell graph; Page Up/Down zoom out/in
+vibration_amplitude = 0.0  # m
+fork_vibration_offset = 0.0  # m, fork displacement relative to the carriage
 load_weight = 0.0
 is_vibrating = False
-sample_rate = 60  # Hz, based on FPS
+sample_rate = PHYSICS_HZ  # Hz, one sample per physics step regardless of FPS
+MIN_VIBRATION_FREQUENCY = 1.0  # Hz; slower fork motion is it following the lift's acceleration
+FAULT_SIGNATURES = fault_signatures(WHEEL_ROLLERS)  # Roller and screw bearing faults the envelope analysis looks for
+travel_envelope = EnvelopeAnalyzer(sample_rate)  # Streamed while traveling, for roller faults
+lift_envelope = EnvelopeAnalyzer(sample_rate)  # Streamed while lifting, for screw bearing faults
+loadcell_wavelet = WaveletStream()  # Per-octave energy of the load cell stream, updated every block
+TRUCK_ID = "simulator"
+health = HealthMonitor.load(TRUCK_ID)  # Vibration baselines and health trend, kept on disk across runs
 traveling = False
 lifting = False
 
@@ -263,11 +314,7 @@ def draw_warehouse():
 
 # --- BLOCK HANDLING ---
 def check_block_proximity():
-    fork_pos = [
-        position[0] + math.sin(math.radians(rotation)) * FORKLIFT_LENGTH/2,
-        position[1] - math.cos(math.radians(rotation)) * FORKLIFT_LENGTH/2,
-        fork_height / 100 * (SCREW_ROD_LENGTH - STEPPER_SIZE*1.25) + STEPPER_SIZE*1.25 + SCREW_ROD_RADIUS*4 + 0.08
-    ]
+    fork_pos = fork_tip_position()
     dist = math.sqrt(sum((a - b)**2 for a, b in zip(fork_pos, block['position'])))
     height_diff = abs(fork_pos[2] - block['position'][2])
     return dist < 1.0 and height_diff < 0.3
@@ -286,27 +333,33 @@ def place_block():
         block['position'] = place_position.copy()
         load_weight = 0
         perform_vibration_analysis()
+        report_health()
 
 # --- VIBRATION ANALYSIS ---
 def perform_vibration_analysis():
     global analysis_complete, plots_saved
-    if not (vibration_data_travel or vibration_data_lift) or analysis_complete:
+    if analysis_complete or not len(samples.select("fork", MOVING, loaded=True)[0]):
         return
 
-    # Generate CSV file
-    vibration_data = vibration_data_travel + vibration_data_lift
-    time = np.arange(len(vibration_data)) / sample_rate
-    vibration = np.array(vibration_data)
-    df = pd.DataFrame({
+    # Generate CSV file: the loaded samples while moving, at the times they
+    # were taken, with the phase each belongs to
+    phases = [phase for phase in samples.phases("fork", loaded=True) if phase in MOVING]
+    recorded = {phase: samples.select("fork", phase, loaded=True) for phase in phases}
+    df = pd.concat([pd.DataFrame({
         'Time (s)': time,
+        'Phase': PHASE_NAMES[phase],
         'Vibration Amplitude (m)': vibration
-    })
+    }) for phase, (time, vibration) in recorded.items()]).sort_values('Time (s)')
     df.to_csv('vibration_data.csv', index=False)
     print("CSV file 'vibration_data.csv' has been generated.")
+    loadcell_recording.save('loadcell_counts.npz')
+    print(f"Load cell counts ({loadcell_recording.samples} samples, {loadcell_recording.nbytes / 1024:.0f} KB) saved to 'loadcell_counts.npz'.")
 
     analysis_complete = True
     plt.figure(figsize=(10, 6))
-    plt.plot(time, vibration, 'b-')
+    for phase, (time, vibration) in recorded.items():
+        plt.plot(time, vibration, '.', markersize=2, label=PHASE_NAMES[phase])
+    plt.legend()
     plt.title('Vibration vs Time (Traveling and Lifting)')
     plt.xlabel('Time (s)')
     plt.ylabel('Vibration Amplitude (m)')
@@ -314,11 +367,27 @@ def perform_vibration_analysis():
     plt.savefig('vibration_time.png')
     plt.close()
 
-    N = len(vibration)
-    yf = fft(vibration)
-    xf = fftfreq(N, 1/sample_rate)[:N//2]
+    # A dominant frequency outside the fork's expected resonance (for the
+    # loads and heights seen while recording) points at a fault, e.g. a
+    # loose T-nut or a damaged screw, rather than the structure ringing.
+    # Each phase gets its own spectrum, taken only over unbroken stretches.
+    low = resonance_range[0] * (1 - RESONANCE_TOLERANCE)
+    high = resonance_range[1] * (1 + RESONANCE_TOLERANCE)
     plt.figure(figsize=(10, 6))
-    plt.plot(xf, 2.0/N * np.abs(yf[0:N//2]), 'b-')
+    for phase, (time, vibration) in recorded.items():
+        try:
+            xf, spectrum = segment_spectrum(time, vibration)
+        except ValueError as error:
+            print(f"No {PHASE_NAMES[phase]} spectrum: {error}.")
+            continue
+        band = xf >= MIN_VIBRATION_FREQUENCY
+        dominant = xf[band][np.argmax(spectrum[band])] if band.any() else 0.0
+        status = "within" if low <= dominant <= high else "OUTSIDE (possible fault)"
+        print(f"Dominant {PHASE_NAMES[phase]} vibration {dominant:.2f} Hz, {status} the expected resonance "
+              f"of {low:.2f}-{high:.2f} Hz.")
+        plt.plot(xf, spectrum, label=PHASE_NAMES[phase])
+    plt.axvspan(low, high, color='g', alpha=0.2, label='Expected resonance')
+    plt.legend()
     plt.title('Frequency Spectrum of Vibration')
     plt.xlabel('Frequency (Hz)')
     plt.ylabel('Amplitude (m)')
@@ -327,47 +396,90 @@ def perform_vibration_analysis():
     plt.savefig('vibration_frequency.png')
     plt.close()
 
+    # Order tracking: the lift samples resampled to screw angle, so the
+    # screw's own vibration stays at fixed orders however fast it turned
+    lift_time, lift_vibration = samples.select("fork", LIFTING, loaded=True)
+    _, lift_angle = samples.select("screw_angle", LIFTING, loaded=True)
+    try:
+        orders, amplitude = order_spectrum(lift_vibration, lift_angle)
+    except ValueError as error:
+        print(f"No order spectrum: {error}.")
+    else:
+        print("Screw orders: " + ", ".join(f"{order}x {value * 1000:.3f} mm" for order, value in
+                                           zip(SCREW_ORDERS, order_amplitudes(orders, amplitude))))
+        plt.figure(figsize=(10, 6))
+        plt.plot(orders, amplitude, 'b-')
+        plt.title('Order Spectrum of Lift Vibration')
+        plt.xlabel('Order (cycles per screw revolution)')
+        plt.ylabel('Amplitude (m)')
+        plt.grid(True)
+        plt.savefig('vibration_orders.png')
+        plt.close()
+
+    # Envelope analysis: worn rollers and screw bearings knock, and the
+    # knocks show up as lines in the envelope spectrum at their fault
+    # frequencies, from the typical wheel and screw speed while recording
+    _, wheel_speed = samples.select("wheel_speed", TRAVELING, loaded=True)
+    screw_rates = np.abs(np.diff(lift_angle)) / np.maximum(np.diff(lift_time), 1e-9)
+    screw_rates = screw_rates[screw_rates > 0]
+    shaft_rates = {
+        "wheel": wheel_rate(np.median(wheel_speed)) if len(wheel_speed) else 0.0,
+        "screw": float(np.median(screw_rates)) / 360 if len(screw_rates) else 0.0,
+    }
+    faults = fault_frequencies(shaft_rates, FAULT_SIGNATURES)
+    wheel_faults = {name: frequency for name, frequency in faults.items() if FAULT_SIGNATURES[name][0] == "wheel"}
+    screw_faults = {name: frequency for name, frequency in faults.items() if FAULT_SIGNATURES[name][0] == "screw"}
+    matches = match_faults(*travel_envelope.spectrum(), wheel_faults) + match_faults(*lift_envelope.spectrum(), screw_faults)
+    for name, frequency, ratio in matches:
+        print(f"Possible {name} fault: envelope peak at {frequency:.2f} Hz, {ratio:.1f}x the background.")
+    if not matches:
+        print("No roller or screw bearing fault signatures in the envelope spectra.")
+
     plots_saved = True
 
-# --- MAIN DRAW FUNCTION ---
-def draw_forklift():
-    global vibration_amplitude, is_vibrating, vibration_data_travel, vibration_data_lift
-    
-    glPushMatrix()
-    glTranslatef(position[0], position[1], position[2])
-    glRotatef(rotation, 0, 0, 1)
+def report_health():
+    # Each pick-to-place is a health session: its index joins the truck's
+    # trend, and the trend says how long until maintenance is due
+    index = health.end_session()
+    if index is None:
+        print("Health index: still learning the baseline.")
+        return
+    remaining = health.time_to_threshold()
+    if remaining is None:
+        outlook = "not trending towards the alert level"
+    elif remaining == 0:
+        outlook = "AT OR ABOVE the alert level, maintenance due"
+    else:
+        outlook = f"alert level projected in {remaining / 3600:.1f} h"
+    print(f"Health index {index:.2f} (alert at {ALERT_INDEX:.1f}), {outlook}.")
+
+# --- SCENE GRAPH ---
+ROD_DISTANCE = FORKLIFT_WIDTH * 0.3
+WHEEL_OFFSETS = [
+    (-FORKLIFT_WIDTH/2, -FORKLIFT_LENGTH/2 + WHEEL_RADIUS, -FORKLIFT_HEIGHT/2),
+    (FORKLIFT_WIDTH/2, -FORKLIFT_LENGTH/2 + WHEEL_RADIUS, -FORKLIFT_HEIGHT/2),
+    (FORKLIFT_WIDTH/2, FORKLIFT_LENGTH/2 - WHEEL_RADIUS, -FORKLIFT_HEIGHT/2),
+    (-FORKLIFT_WIDTH/2, FORKLIFT_LENGTH/2 - WHEEL_RADIUS, -FORKLIFT_HEIGHT/2)
+]
+WHEEL_ANGLES = [45, -45, 45, -45]
+
+def draw_chassis():
     create_cube(FORKLIFT_WIDTH, FORKLIFT_LENGTH, FORKLIFT_HEIGHT, BLUE)
-    wheel_positions = [
-        (-FORKLIFT_WIDTH/2, -FORKLIFT_LENGTH/2 + WHEEL_RADIUS, -FORKLIFT_HEIGHT/2),
-        (FORKLIFT_WIDTH/2, -FORKLIFT_LENGTH/2 + WHEEL_RADIUS, -FORKLIFT_HEIGHT/2),
-        (FORKLIFT_WIDTH/2, FORKLIFT_LENGTH/2 - WHEEL_RADIUS, -FORKLIFT_HEIGHT/2),
-        (-FORKLIFT_WIDTH/2, FORKLIFT_LENGTH/2 - WHEEL_RADIUS, -FORKLIFT_HEIGHT/2)
-    ]
-    wheel_angles = [45, -45, 45, -45]
-    for i, (wx, wy, wz) in enumerate(wheel_positions):
-        glPushMatrix()
-        glTranslatef(wx, wy, wz)
-        glRotatef(wheel_steering[i], 0, 0, 1)
-        if i == 0 or i == 3:
-            glRotatef(90, 0, 1, 0)
-        else:
-            glRotatef(-90, 0, 1, 0)
-        create_mecanum_wheel(WHEEL_RADIUS, WHEEL_WIDTH, WHEEL_ROLLERS, wheel_angles[i])
-        glPopMatrix()
-    
-    glPushMatrix()
-    glTranslatef(0, -FORKLIFT_LENGTH/2 + 0.1, FORKLIFT_HEIGHT/2)
-    rod_distance = FORKLIFT_WIDTH * 0.3
-    rod_height = SCREW_ROD_LENGTH
-    
-    for x_offset in [-rod_distance, rod_distance]:
+
+def make_wheel_draw(i):
+    def draw_wheel():
+        create_mecanum_wheel(WHEEL_RADIUS, WHEEL_WIDTH, WHEEL_ROLLERS, WHEEL_ANGLES[i])
+    return draw_wheel
+
+def draw_mast():
+    for x_offset in [-ROD_DISTANCE, ROD_DISTANCE]:
         glPushMatrix()
         glTranslatef(x_offset, 0, 0)
         glColor3fv(GRAY)
-        create_cylinder(SCREW_ROD_RADIUS*0.5, rod_height, 8, GRAY)
+        create_cylinder(SCREW_ROD_RADIUS*0.5, SCREW_ROD_LENGTH, 8, GRAY)
         glPopMatrix()
     
-    for i, x_offset in enumerate([-rod_distance, rod_distance]):
+    for i, x_offset in enumerate([-ROD_DISTANCE, ROD_DISTANCE]):
         glPushMatrix()
         glTranslatef(x_offset, 0, -FORKLIFT_HEIGHT/2)
         create_stepper_motor(STEPPER_SIZE)
@@ -377,61 +489,102 @@ def draw_forklift():
         glPopMatrix()
         glPushMatrix()
         glTranslatef(0, 0, STEPPER_SIZE * 1.25)
-        create_threaded_rod(rod_height - STEPPER_SIZE * 1.25, SCREW_ROD_RADIUS, screw_rotation[i])
+        create_threaded_rod(SCREW_ROD_LENGTH - STEPPER_SIZE * 1.25, SCREW_ROD_RADIUS, render_screw_rotation[i])
         glPopMatrix()
         glPopMatrix()
-    
-    normalized_height = (fork_height - min_fork_height) / (max_fork_height - min_fork_height)
-    usable_rod_height = rod_height - STEPPER_SIZE * 1.25 - SCREW_ROD_RADIUS * 8
-    current_height = STEPPER_SIZE * 1.25 + normalized_height * usable_rod_height
-    
-    fork_vibration_offset = 0
-    if is_vibrating:
-        fork_vibration_offset = math.sin(pygame.time.get_ticks() * 0.01) * vibration_amplitude
-        if traveling and block['is_picked']:
-            vibration_data_travel.append(fork_vibration_offset)
-        if lifting and block['is_picked']:
-            vibration_data_lift.append(fork_vibration_offset)
-    
-    glPushMatrix()
-    glTranslatef(0, 0.1, current_height + fork_vibration_offset)
-    
-    for x_offset in [-rod_distance, rod_distance]:
+
+def draw_carriage():
+    for x_offset in [-ROD_DISTANCE, ROD_DISTANCE]:
         glPushMatrix()
         glTranslatef(x_offset, 0, 0)
         create_t_nut(SCREW_ROD_RADIUS * 2, SCREW_ROD_RADIUS * 8)
         glPopMatrix()
-    
-    glPushMatrix()
-    glTranslatef(0, 0, SCREW_ROD_RADIUS * 4)
+
+def draw_fork():
     glEnable(GL_BLEND)
     glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
     glColor4f(*ACRYLIC)
-    create_cube(rod_distance*2+0.2, FORK_LENGTH, 0.08, ACRYLIC)
+    create_cube(ROD_DISTANCE*2+0.2, FORK_LENGTH, 0.08, ACRYLIC)
     glDisable(GL_BLEND)
-    glPopMatrix()
-    
-    glPushMatrix()
-    glTranslatef(0, FORK_LENGTH*0.3, SCREW_ROD_RADIUS * 4 + 0.08)
-    create_loadcell(rod_distance*0.8, 0.3, 0.1, METAL)
-    glPopMatrix()
-    
-    glPopMatrix()
-    glPopMatrix()
-    glPopMatrix()
 
-def draw_block():
+def draw_load_cell():
+    create_loadcell(ROD_DISTANCE*0.8, 0.3, 0.1, METAL)
+
+def draw_payload():
     if block['is_picked']:
-        normalized_height = (fork_height - min_fork_height) / (max_fork_height - min_fork_height)
-        usable_rod_height = SCREW_ROD_LENGTH - STEPPER_SIZE * 1.25 - SCREW_ROD_RADIUS * 8
-        current_height = STEPPER_SIZE * 1.25 + normalized_height * usable_rod_height + SCREW_ROD_RADIUS * 4 + 0.08 + 0.1 + block['size'][2]/2
-        glPushMatrix()
-        glTranslatef(position[0], position[1], 0)
-        glRotatef(rotation, 0, 0, 1)
-        glTranslatef(0, -FORKLIFT_LENGTH/2 + 0.1 + FORK_LENGTH*0.3, current_height)
+        glTranslatef(0, 0, block['size'][2]/2)
         create_cube(*block['size'], block['color'])
-        glPopMatrix()
-    else:
+
+def build_forklift_graph():
+    # forklift -> mast -> carriage -> fork / load cell -> payload. Only the
+    # forklift pose and the carriage height change at runtime.
+    root = SceneNode("forklift", draw=draw_chassis)
+    for i in range(len(WHEEL_OFFSETS)):
+        SceneNode(f"wheel_{i}", root, wheel_matrix(i), make_wheel_draw(i))
+    mast = SceneNode("mast", root, translation_matrix(0, -FORKLIFT_LENGTH/2 + 0.1, FORKLIFT_HEIGHT/2), draw_mast)
+    carriage = SceneNode("carriage", mast, draw=draw_carriage)
+    SceneNode("fork", carriage, translation_matrix(0, 0, SCREW_ROD_RADIUS * 4), draw_fork)
+    load_cell = SceneNode("load_cell", carriage, translation_matrix(0, FORK_LENGTH*0.3, SCREW_ROD_RADIUS * 4 + 0.08), draw_load_cell)
+    SceneNode("payload", load_cell, translation_matrix(0, 0, 0.05), draw_payload)
+    # Underside of the fork below the load cell, used for picking
+    SceneNode("fork_tip", carriage, translation_matrix(0, FORK_LENGTH*0.3, SCREW_ROD_RADIUS * 4 - 0.04))
+    return root
+
+def wheel_matrix(i, spin=0):
+    wx, wy, wz = WHEEL_OFFSETS[i]
+    spin_axis = rotation_matrix(90 if i == 0 or i == 3 else -90, "y")
+    return translation_matrix(wx, wy, wz) @ spin_axis @ rotation_matrix(spin)
+
+def carriage_height(height_percent):
+    normalized_height = (height_percent - min_fork_height) / (max_fork_height - min_fork_height)
+    return STEPPER_SIZE * 1.25 + normalized_height * LIFT_TRAVEL
+
+def pose_forklift(nodes, pos, rot, height_percent, vibration_offset=0):
+    nodes["forklift"].set_pose(pos[0], pos[1], pos[2], rot)
+    nodes["carriage"].set_pose(0, 0.1, carriage_height(height_percent) + vibration_offset)
+
+def fork_tip_position():
+    # Fork tip of the physics state, used for picking
+    pose_forklift(physics_nodes, position, rotation, fork_height)
+    return physics_nodes["fork_tip"].world_point()
+
+def current_view_matrix():
+    return np.array(glGetFloatv(GL_MODELVIEW_MATRIX), dtype=np.float64).reshape(4, 4).T
+
+def load_matrix(matrix):
+    glLoadMatrixf(np.ascontiguousarray(matrix.T, dtype=np.float32))
+
+def draw_scene(root, view):
+    # Each node is drawn with its cached world matrix instead of rebuilding
+    # the chain on the GL matrix stack
+    for node in root.walk():
+        if node.draw is not None:
+            load_matrix(view @ node.world)
+            node.draw()
+    load_matrix(view)
+
+# Two instances of the graph: one drawn at the interpolated render pose, one
+# at the physics state for picking. Sharing one would re-pose it back and
+# forth every frame, so neither would ever hit its cache.
+forklift_graph = build_forklift_graph()
+forklift_nodes = {node.name: node for node in forklift_graph.walk()}
+physics_graph = build_forklift_graph()
+physics_nodes = {node.name: node for node in physics_graph.walk()}
+wheel_poses = [0, 0, 0, 0]
+
+# --- MAIN DRAW FUNCTION ---
+def draw_forklift():
+    pose_forklift(forklift_nodes, render_position, render_rotation, render_fork_height,
+                  fork_vibration_offset * VIBRATION_DISPLAY_GAIN)
+    for i in range(len(WHEEL_OFFSETS)):
+        if wheel_poses[i] != render_wheel_spin[i]:
+            wheel_poses[i] = render_wheel_spin[i]
+            forklift_nodes[f"wheel_{i}"].set_local(wheel_matrix(i, render_wheel_spin[i]))
+    draw_scene(forklift_graph, current_view_matrix())
+
+def draw_block():
+    # A picked block is drawn as the payload node of the forklift graph
+    if not block['is_picked']:
         glPushMatrix()
         glTranslatef(*block['position'])
         create_cube(*block['size'], block['color'])
@@ -476,7 +629,7 @@ def draw_grid():
     glEnable(GL_LIGHTING)
 
 def draw_loadcell_graph():
-    if not loadcell_data:
+    if not loadcell_store.count:
         return
     
     glMatrixMode(GL_PROJECTION)
@@ -506,14 +659,25 @@ def draw_loadcell_graph():
     glVertex2f(WIDTH - 300, HEIGHT - 20)
     glEnd()
     
+    # Min/max of each bucket as a dark bar, the means as the line, from
+    # the store tier that fits the graph's width
+    times, low, high, mean = loadcell_store.latest(graph_span, 280)
+    xs = (WIDTH - 300 + 280 * (times - max(loadcell_store.count - graph_span, 0)) / graph_span).tolist()
+    glColor3f(0.0, 0.4, 0.0)
+    glBegin(GL_LINES)
+    for x, bottom, top in zip(xs, low.tolist(), high.tolist()):
+        glVertex2f(x, HEIGHT - 110 + bottom * 80)
+        glVertex2f(x, HEIGHT - 110 + top * 80)
+    glEnd()
     glColor3f(0.0, 1.0, 0.0)
     glBegin(GL_LINE_STRIP)
-    for i, value in enumerate(loadcell_data[-MAX_DATA_POINTS:]):
-        x = WIDTH - 300 + (280 * i / min(len(loadcell_data), MAX_DATA_POINTS))
-        y = HEIGHT - 110 + value * 80
-        glVertex2f(x, y)
+    for x, value in zip(xs, mean.tolist()):
+        glVertex2f(x, HEIGHT - 110 + value * 80)
     glEnd()
     
+    # Fork vibration spectrogram underneath: time to the right, 0 Hz at the bottom
+    spectrogram.draw(WIDTH - 300, HEIGHT - 400, WIDTH - 20, HEIGHT - 230)
+    
     glEnable(GL_DEPTH_TEST)
     glEnable(GL_LIGHTING)
     glMatrixMode(GL_PROJECTION)
@@ -521,49 +685,109 @@ def draw_loadcell_graph():
     glMatrixMode(GL_MODELVIEW)
     glPopMatrix()
 
-def update_physics():
-    global screw_rotation, loadcell_data, vibration_amplitude, is_vibrating, traveling, lifting
+def update_physics(dt):
+    global screw_rotation, vibration_amplitude, is_vibrating, traveling, lifting, fork_vibration_offset
+    global screw_angle
     
     keys = pygame.key.get_pressed()
-    if keys[K_r] and fork_height < max_fork_height:
-        screw_rotation[0] = (screw_rotation[0] + screw_rotation_speed) % 360
-        screw_rotation[1] = (screw_rotation[1] + screw_rotation_speed) % 360
-        lifting = True
-    elif keys[K_f] and fork_height > min_fork_height:
-        screw_rotation[0] = (screw_rotation[0] - screw_rotation_speed) % 360
-        screw_rotation[1] = (screw_rotation[1] - screw_rotation_speed) % 360
-        lifting = True
-    else:
-        lifting = False
+    # The screws turn with the lift's actual speed
+    screw_rate = lift.velocity / SCREW_LEAD * 360  # Degrees per second
+    screw_rotation[0] = (screw_rotation[0] + screw_rate * dt) % 360
+    screw_rotation[1] = (screw_rotation[1] + screw_rate * dt) % 360
+    screw_angle += screw_rate * dt
+    lifting = lift.velocity != 0
     
     traveling = any(keys[k] for k in [K_w, K_s, K_a, K_d, K_q, K_e])
     
-    base_value = load_weight / 10.0
+    # The fork rings on the mast: driven by the lift's acceleration, the
+    # screws' runout and floor bumps that grow with travel speed
+    height = (fork_height - min_fork_height) / LIFT_PERCENT_PER_METRE
+    bumps = FLOOR_ROUGHNESS * chassis_speed * random.gauss(0, 1)
+    fork.step(dt, lift.acceleration + runout_acceleration(screw_rotation[0], screw_rate) + bumps, load_weight, height)
+    spectrogram.push(float(fork.displacement))
+    vibration_amplitude = float(fork.amplitude(load_weight, height))
+    is_vibrating = vibration_amplitude > VIBRATION_THRESHOLD
+    fork_acceleration = float(fork.acceleration(load_weight, height))
+    force = load_weight * fork_acceleration
+    fork_vibration_offset = float(fork.displacement)
+    samples.append(physics_clock.time, phase_of(traveling, lifting), block['is_picked'], fork=fork_vibration_offset,
+                   wheel_speed=sum(abs(speed) for speed in wheel_speeds) / 4, screw_angle=screw_angle)
+    if block['is_picked']:
+        if traveling:
+            travel_envelope.push(fork_vibration_offset)
+        if lifting:
+            lift_envelope.push(fork_vibration_offset)
+        if traveling or lifting:
+            health.push(fork_vibration_offset, load_weight, height, physics_clock.time)
+            expected, _ = resonance.fundamental(load_weight, height)
+            resonance_range[0] = min(resonance_range[0], expected)
+            resonance_range[1] = max(resonance_range[1], expected)
+    
     noise = random.uniform(-0.05, 0.05)
-    movement_vibration = 0
-    if (traveling or lifting) and block['is_picked']:
-        movement_vibration = math.sin(pygame.time.get_ticks() * 0.01) * 0.2
-        is_vibrating = True
-        vibration_amplitude = 0.03 + (load_weight * 0.01)
-    elif is_vibrating:
-        vibration_amplitude *= 0.98
-        if vibration_amplitude < 0.001:
-            is_vibrating = False
-            vibration_amplitude = 0
+    counts = loadcell_adc.counts(load_reading(load_weight, force) + noise)  # What the HX711 would report
+    loadcell_recording.append(counts)
+    current_value = loadcell_adc.units(counts)
+    load_estimator.update(current_value, fork_acceleration)
+    filtered = loadcell_filters.push(current_value)
+    loadcell_store.push(filtered[HUD_SIGNAL])
+    loadcell_wavelet.push(filtered[ANALYSIS_SIGNAL])
+
+def update_wheels(previous_position, previous_rotation, dt):
+    global chassis_speed
+    
+    # Wheel speeds from how the chassis actually moved this step
+    vx, vy, omega = chassis_velocity(previous_position, previous_rotation, position, rotation, dt).tolist()
+    wheel_speeds[:] = drive.wheel_speeds_scalar(vx, vy, omega)
+    chassis_speed = math.hypot(vx, vy)
+    for i, speed in enumerate(wheel_speeds):
+        wheel_spin[i] = (wheel_spin[i] + math.degrees(speed * dt) * MOTOR_DIRECTIONS[i]) % 360
+
+def handle_movement(keys, dt):
+    global rotation, fork_height
     
-    current_value = base_value + noise + movement_vibration
-    loadcell_data.append(current_value)
+    previous_position, previous_rotation = position.copy(), rotation
+    step = linear_speed * dt
+    if keys[K_w]:
+        position[0] += step * math.sin(math.radians(rotation))
+        position[1] -= step * math.cos(math.radians(rotation))
+    if keys[K_s]:
+        position[0] -= step * math.sin(math.radians(rotation))
+        position[1] += step * math.cos(math.radians(rotation))
+    if keys[K_a]:
+        position[0] -= step * math.cos(math.radians(rotation))
+        position[1] -= step * math.sin(math.radians(rotation))
+    if keys[K_d]:
+        position[0] += step * math.cos(math.radians(rotation))
+        position[1] += step * math.sin(math.radians(rotation))
+    if keys[K_q]:
+        rotation = (rotation - angular_speed * dt) % 360
+    if keys[K_e]:
+        rotation = (rotation + angular_speed * dt) % 360
     
-    if len(loadcell_data) > MAX_DATA_POINTS:
-        loadcell_data.pop(0)
-    if len(vibration_data_travel) > MAX_DATA_POINTS:
-        vibration_data_travel.pop(0)
-    if len(vibration_data_lift) > MAX_DATA_POINTS:
-        vibration_data_lift.pop(0)
+    # The lift ramps up and down within the motion profile's limits
+    command = 1 if keys[K_r] else -1 if keys[K_f] else 0
+    direction = lift.velocity or command
+    room = (max_fork_height - fork_height) if direction > 0 else (fork_height - min_fork_height)
+    fork_height += lift.update(command, dt, load_weight, room / LIFT_PERCENT_PER_METRE) * dt * LIFT_PERCENT_PER_METRE
+    
+    fork_height = max(min_fork_height, min(fork_height, max_fork_height))
+    update_wheels(previous_position, previous_rotation, dt)
+
+def snapshot_state():
+    return (position.copy(), rotation, fork_height, screw_rotation.copy(), wheel_spin.copy())
+
+def interpolate_render_state(previous, alpha):
+    global render_rotation, render_fork_height
+    previous_position, previous_rotation, previous_fork_height, previous_screw_rotation, previous_wheel_spin = previous
+    render_position[:] = lerp_list(previous_position, position, alpha)
+    render_rotation = lerp_angle(previous_rotation, rotation, alpha)
+    render_fork_height = lerp(previous_fork_height, fork_height, alpha)
+    render_screw_rotation[:] = [lerp_angle(a, b, alpha) for a, b in zip(previous_screw_rotation, screw_rotation)]
+    render_wheel_spin[:] = [lerp_angle(a, b, alpha) for a, b in zip(previous_wheel_spin, wheel_spin)]
 
 # --- MAIN LOOP ---
 async def main():
-    global position, rotation, fork_height, wheel_steering, load_weight
+    global position, rotation, fork_height, load_weight, graph_span
     
     pygame.init()
     pygame.display.set_mode((WIDTH, HEIGHT), DOUBLEBUF | OPENGL)
@@ -591,8 +815,11 @@ async def main():
     view_distance = 10
     
     fork_height = min_fork_height
+    previous_state = snapshot_state()
+    frame_time = 0.0
     
-    clock = pygame.time.Clock()
+    # In the browser the animation frame paces the loop; on desktop the scheduler does
+    scheduler = FrameScheduler(FPS, paced=not IS_EMSCRIPTEN)
     
     while True:
         for event in pygame.event.get():
@@ -613,42 +840,22 @@ async def main():
                     pick_block()
                 elif event.key == K_o:
                     place_block()
+                elif event.key == K_PAGEUP:
+                    graph_span = zoom_span(graph_span, 1, max(loadcell_store.history, MAX_DATA_POINTS))
+                elif event.key == K_PAGEDOWN:
+                    graph_span = zoom_span(graph_span, -1, max(loadcell_store.history, MAX_DATA_POINTS))
         
         keys = pygame.key.get_pressed()
         if keys[K_ESCAPE]:
             pygame.quit()
             return
         
-        if keys[K_w]:
-            position[0] += linear_speed * math.sin(math.radians(rotation))
-            position[1] -= linear_speed * math.cos(math.radians(rotation))
-            wheel_steering[:] = [0, 0, 0, 0]
-        if keys[K_s]:
-            position[0] -= linear_speed * math.sin(math.radians(rotation))
-            position[1] += linear_speed * math.cos(math.radians(rotation))
-            wheel_steering[:] = [0, 0, 0, 0]
-        if keys[K_a]:
-            position[0] -= linear_speed * math.cos(math.radians(rotation))
-            position[1] -= linear_speed * math.sin(math.radians(rotation))
-            wheel_steering[:] = [15, -15, -15, 15]
-        if keys[K_d]:
-            position[0] += linear_speed * math.cos(math.radians(rotation))
-            position[1] += linear_speed * math.sin(math.radians(rotation))
-            wheel_steering[:] = [-15, 15, 15, -15]
-        if keys[K_q]:
-            rotation = (rotation - angular_speed) % 360
-            wheel_steering[:] = [20, 20, -20, -20]
-        if keys[K_e]:
-            rotation = (rotation + angular_speed) % 360
-            wheel_steering[:] = [-20, -20, 20, 20]
-        if keys[K_r] and fork_height < max_fork_height:
-            fork_height += fork_speed
-        if keys[K_f] and fork_height > min_fork_height:
-            fork_height -= fork_speed
-        
-        fork_height = max(min_fork_height, min(fork_height, max_fork_height))
-        
-        update_physics()
+        # Run physics in fixed steps, then draw in between the last two states
+        for dt in physics_clock.steps(frame_time):
+            previous_state = snapshot_state()
+            handle_movement(keys, dt)
+            update_physics(dt)
+        interpolate_render_state(previous_state, physics_clock.alpha)
         
         glMatrixMode(GL_PROJECTION)
         glLoadIdentity()
@@ -678,24 +885,29 @@ async def main():
             "R/F - Raise/Lower Fork",
             "P - Pick Block",
             "O - Place Block",
+            f"Page Up/Down - Zoom Load Cell Graph (last {span_label(graph_span, PHYSICS_HZ)})",
             "Right Click + Move - Rotate Camera",
             "Mouse Wheel - Zoom In/Out",
             "ESC - Quit",
             f"Fork Height: {fork_height:.1f}%",
-            f"Load Weight: {load_weight} kg",
+            f"Load Weight: {load_weight} kg (estimated {float(load_estimator.mass):.2f} +- {float(load_estimator.std):.2f} kg)",
             f"Block Picked: {block['is_picked']}",
+            "Expected Resonance: {:.1f} Hz (damping {:.1%})".format(
+                *resonance.fundamental(load_weight, (fork_height - min_fork_height) / LIFT_PERCENT_PER_METRE)),
+            "Load Cell Wavelet Energy: " + " ".join(f"{energy:.1e}" for energy in loadcell_wavelet.energy[:-1]),
             f"Analysis Done: {analysis_complete}",
-            f"Plots Saved: {plots_saved}"
+            f"Plots Saved: {plots_saved}",
+            "Health Index: " + ("learning baseline" if health.latest is None else f"{health.latest:.2f} (alert at {ALERT_INDEX:.1f})"),
+            f"FPS: {scheduler.fps:.0f} (overruns: {scheduler.overruns}, last {scheduler.last_overrun*1000:.1f} ms)"
         ]
         
         for i, text in enumerate(instructions):
             display_text(text, 10, 10 + i*20)
         
         pygame.display.flip()
-        clock.tick(FPS)
-        await asyncio.sleep(1.0 / FPS)
+        frame_time = await scheduler.next_frame()
 
-if std_platform.system() == "Emscripten":
+if IS_EMSCRIPTEN:
     asyncio.ensure_future(main())
 else:
     if __name__ == "__main__":
@@ -0,0 +1,152 @@
+import math
+import time
+from functools import lru_cache
+import numpy as np
+from scipy.signal import butter, hilbert, sosfilt
+from analysis_context import CONTEXT
+
+# --- PARAMETERS ---
+ENVELOPE_BAND = (20.0, 55.0)  # Hz band-pass for the simulators' 120 Hz log: above the fork's resonance, below Nyquist
+FILTER_ORDER = 4              # Butterworth order of the band-pass
+BLOCK_SIZE = 256              # Samples per Hilbert transform; half of each block is new
+ENVELOPE_HISTORY = 4096       # Envelope samples kept for the envelope spectrum
+FAULT_TOLERANCE = 0.03        # Relative distance a peak may sit from a fault frequency (speed is never exact)
+FAULT_THRESHOLD = 4.0         # Peak over the local median that counts as a match (noise alone stays under 2)
+FLOOR_SPAN = 0.5              # The local median is taken within this fraction either side of the fault frequency
+
+# Screw support bearings: 608 deep groove ball bearings
+BEARING_BALLS = 7
+BEARING_BALL_DIAMETER = 3.97e-3   # m
+BEARING_PITCH_DIAMETER = 15.0e-3  # m
+
+# --- FAULT FREQUENCIES ---
+def fault_signatures(rollers):
+    # Name -> (shaft, impacts per revolution of that shaft). Add to or edit
+    # the returned dict to configure which faults are looked for.
+    ratio = BEARING_BALL_DIAMETER / BEARING_PITCH_DIAMETER
+    return {
+        "damaged roller": ("wheel", 1.0),                  # One bad roller meets the floor once per turn
+        "roller passing": ("wheel", float(rollers)),       # Worn rollers all knock as they take the load
+        "screw bearing outer race": ("screw", BEARING_BALLS / 2 * (1 - ratio)),
+        "screw bearing inner race": ("screw", BEARING_BALLS / 2 * (1 + ratio)),
+    }
+
+def fault_frequencies(shaft_rates, signatures):
+    # shaft_rates is shaft -> revolutions per second; shafts that aren't
+    # turning (or aren't given) have no fault frequency
+    return {name: shaft_rates[shaft] * per_rev for name, (shaft, per_rev) in signatures.items()
+            if shaft_rates.get(shaft, 0.0) > 0.0}
+
+def wheel_rate(wheel_speed):
+    # rad/s -> revolutions per second
+    return abs(wheel_speed) / (2 * math.pi)
+
+# --- FILTERS ---
+@lru_cache(maxsize=32)
+def bandpass(low, high, sample_rate, order=FILTER_ORDER):
+    # Second-order sections of the band-pass, designed once per band and
+    # rate and shared by every analyzer using them (don't modify)
+    return butter(order, (low, high), btype="bandpass", fs=sample_rate, output="sos")
+
+# --- ANALYZER ---
+class EnvelopeAnalyzer:
+    # Streaming envelope analysis: samples are band-passed as they arrive
+    # (the filter state carries over, so block edges leave no mark), and
+    # every time half a block is new the Hilbert transform runs over the
+    # last whole block. Only the middle half of each block's envelope is
+    # kept, away from the transform's edge effects, so consecutive blocks
+    # tile the envelope with a fixed delay of a quarter block. Both are
+    # shifted in place, and the spectrum is written into the analyzer's
+    # own array through a cached plan.
+    def __init__(self, sample_rate, band=ENVELOPE_BAND, block_size=BLOCK_SIZE, history=ENVELOPE_HISTORY,
+                 context=CONTEXT):
+        self.sample_rate = sample_rate
+        self.sos = bandpass(band[0], band[1], sample_rate)
+        self.state = np.zeros((self.sos.shape[0], 2))
+        self.block_size = block_size
+        self.hop = block_size // 2
+        self.filtered = np.zeros(block_size)
+        self.pending = []
+        self.envelope = np.zeros(history)
+        self.count = 0  # Valid samples in envelope
+        self.context = context
+        self.amplitude = np.zeros(history // 2 + 1)
+
+    def push(self, samples):
+        # Scalar or array of new samples; work is done a hop at a time
+        self.pending.extend(np.atleast_1d(samples).tolist())
+        while len(self.pending) >= self.hop:
+            block = np.array(self.pending[:self.hop])
+            del self.pending[:self.hop]
+            filtered, self.state = sosfilt(self.sos, block, zi=self.state)
+            self.filtered[:-self.hop] = self.filtered[self.hop:]
+            self.filtered[-self.hop:] = filtered
+            envelope = np.abs(hilbert(self.filtered))
+            start = (self.block_size - self.hop) // 2
+            self.envelope[:-self.hop] = self.envelope[self.hop:]
+            self.envelope[-self.hop:] = envelope[start:start + self.hop]
+            self.count = min(self.count + self.hop, len(self.envelope))
+
+    def spectrum(self):
+        # (frequencies, amplitude) of the envelope collected so far; the
+        # amplitude is the analyzer's array, overwritten by the next call
+        envelope = self.envelope[len(self.envelope) - self.count:]
+        if len(envelope) < 2:
+            return np.zeros(1), np.zeros(1)
+        plan = self.context.plan(len(envelope), self.sample_rate)
+        return plan.freqs, plan(envelope, self.context.window(len(envelope)), self.amplitude[:len(envelope) // 2 + 1])
+
+    def reset(self):
+        self.state[:] = 0.0
+        self.filtered[:] = 0.0
+        self.pending.clear()
+        self.count = 0
+
+def match_faults(freqs, amplitude, faults, tolerance=FAULT_TOLERANCE, threshold=FAULT_THRESHOLD):
+    # [(name, fault frequency, peak / local median)] for every fault whose
+    # frequency carries a clear envelope peak, strongest first. The floor
+    # is local because an envelope spectrum is anything but flat: it rises
+    # towards zero and is empty past the band-pass's width.
+    if len(freqs) < 2:
+        return []
+    width = freqs[1] - freqs[0]
+    matches = []
+    for name, frequency in faults.items():
+        if frequency >= freqs[-1]:
+            continue
+        distance = np.abs(freqs - frequency)
+        near = distance <= max(tolerance * frequency, width)
+        around = (distance <= FLOOR_SPAN * frequency) & ~near
+        near[0] = around[0] = False
+        if near.any() and around.any():
+            ratio = float(amplitude[near].max()) / max(float(np.median(amplitude[around])), 1e-30)
+            if ratio >= threshold:
+                matches.append((name, frequency, ratio))
+    return sorted(matches, key=lambda match: -match[2])
+
+if __name__ == "__main__":
+    # A chassis accelerometer at 2 kHz: a worn wheel knocks once per roller
+    # (12 rollers at 20 rad/s, 38.2 Hz), each knock ringing a 600 Hz frame
+    # mode, under the fork's 5.5 Hz sway and broadband noise
+    rng = np.random.default_rng(6)
+    sample_rate = 2000.0
+    t = np.arange(int(20 * sample_rate)) / sample_rate
+    faults = fault_frequencies({"wheel": wheel_rate(20.0), "screw": 2.5}, fault_signatures(12))
+    knock = faults["roller passing"]
+    since = (t * knock) % 1.0 / knock
+    signal = (0.4 * np.exp(-since * 400) * np.sin(2 * np.pi * 600 * t) + np.sin(2 * np.pi * 5.5 * t)
+              + 0.3 * rng.standard_normal(len(t)))
+
+    spectrum = 2.0 * np.abs(np.fft.rfft(signal)) / len(t)
+    freqs = np.fft.rfftfreq(len(t), 1 / sample_rate)
+    print(f"Plain FFT: {match_faults(freqs, spectrum, faults) or 'no fault found'}")
+
+    analyzer = EnvelopeAnalyzer(sample_rate, band=(400.0, 800.0), history=16384)
+    started = time.perf_counter()
+    for block in np.array_split(signal, len(signal) // 64):
+        analyzer.push(block)
+    elapsed = time.perf_counter() - started
+    for name, frequency, ratio in match_faults(*analyzer.spectrum(), faults):
+        print(f"Envelope: {name} at {frequency:.1f} Hz, {ratio:.0f}x the median")
+    print(f"Streamed {len(t)} samples in 64-sample blocks: {elapsed * 1000:.1f} ms "
+          f"({elapsed / len(t) * 1e6:.2f} us per sample)")
@@ -0,0 +1,39 @@
+# --- PARAMETERS ---
+PHYSICS_HZ = 120       # Physics and sensor sample rate, independent of the render rate
+MAX_FRAME_TIME = 0.25  # Longest frame fed to the accumulator, so a stall can't snowball
+
+# --- FIXED TIMESTEP ---
+class FixedTimestep:
+    # Accumulates real frame time and releases it in whole physics steps of
+    # dt seconds. After stepping, alpha is the fraction of a step left in the
+    # accumulator, used to blend the previous and current state for rendering.
+    def __init__(self, hz=PHYSICS_HZ, max_frame_time=MAX_FRAME_TIME):
+        self.dt = 1.0 / hz
+        self.max_frame_time = max_frame_time
+        self.accumulator = 0.0
+        self.time = 0.0  # Simulated seconds
+        self.step_count = 0
+
+    def steps(self, frame_time):
+        self.accumulator += min(max(frame_time, 0.0), self.max_frame_time)
+        while self.accumulator >= self.dt:
+            self.accumulator -= self.dt
+            self.time += self.dt
+            self.step_count += 1
+            yield self.dt
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.dt
+
+# --- INTERPOLATION ---
+def lerp(a, b, t):
+    return a + (b - a) * t
+
+def lerp_list(a, b, t):
+    return [lerp(x, y, t) for x, y in zip(a, b)]
+
+def lerp_angle(a, b, t):
+    # Degrees, taking the short way round so 359 -> 1 doesn't spin backwards
+    delta = (b - a + 180) % 360 - 180
+    return (a + delta * t) % 360
@@ -0,0 +1,121 @@
+import math
+import time
+import numpy as np
+from motion_profile import CARRIAGE_MASS, GRAVITY
+
+# --- PARAMETERS ---
+# Fork and lead screw as one mass on a spring: the carriage, fork and load
+# cell plus whatever sits on them, held by a mast that gets softer the
+# higher the carriage rides (a cantilever, so stiffness goes as 1 / length^3)
+REFERENCE_STIFFNESS = 7800.0  # N/m with the carriage REFERENCE_HEIGHT up the mast
+REFERENCE_HEIGHT = 0.7        # m of lift travel where REFERENCE_STIFFNESS applies
+MAST_BASE_LENGTH = 1.0        # m of mast below the lowest carriage position that also bends
+DAMPING_RATIO = 0.05          # Structural damping of a bolted steel/acrylic assembly
+FLOOR_ROUGHNESS = 0.5         # m/s^2 RMS of floor bumps per physics step, per m/s of travel
+VIBRATION_DISPLAY_GAIN = 20   # Millimetre motion is exaggerated to be visible in the scene
+VIBRATION_THRESHOLD = 1e-5    # m of amplitude below which the fork counts as still
+
+# --- MODEL ---
+def effective_mass(load_weight):
+    return CARRIAGE_MASS + np.asarray(load_weight, dtype=float)
+
+def stiffness(height):
+    # height is metres of lift travel above the lowest position
+    scale = (MAST_BASE_LENGTH + REFERENCE_HEIGHT) / (MAST_BASE_LENGTH + np.asarray(height, dtype=float))
+    return REFERENCE_STIFFNESS * scale**3
+
+def natural_frequency(load_weight, height):
+    # Undamped natural frequency in Hz; drops with load and with height
+    return np.sqrt(stiffness(height) / effective_mass(load_weight)) / (2 * math.pi)
+
+class ForkDynamics:
+    # State (displacement and velocity of the fork relative to the carriage,
+    # in m and m/s) for any number of cases at once: every argument
+    # broadcasts against shape, so one instance can run a single simulated
+    # forklift or a sweep over loads and heights. Steps use the trapezoidal
+    # rule, which is unconditionally stable and keeps the oscillation's
+    # energy, so the step size only limits accuracy, never stability.
+    def __init__(self, shape=(), damping_ratio=DAMPING_RATIO):
+        self.damping_ratio = damping_ratio
+        self.displacement = np.zeros(shape)
+        self.velocity = np.zeros(shape)
+        self.forcing = np.zeros(shape)  # Last input acceleration, held for the next step
+
+    def step(self, dt, base_acceleration, load_weight, height):
+        # Advance by dt with the carriage accelerating at base_acceleration
+        # (m/s^2, upward), which pushes the fork the other way
+        mass = effective_mass(load_weight)
+        k = stiffness(height)
+        w2 = k / mass
+        z = 2 * self.damping_ratio * np.sqrt(w2)
+        forcing = -np.asarray(base_acceleration, dtype=float)
+        h = dt / 2
+        x, v = self.displacement, self.velocity
+        rhs_x = x + h * v
+        rhs_v = (1 - h * z) * v - h * w2 * x + h * (self.forcing + forcing)
+        det = 1 + h * z + h * h * w2
+        self.displacement = ((1 + h * z) * rhs_x + h * rhs_v) / det
+        self.velocity = (rhs_v - h * w2 * rhs_x) / det
+        self.forcing = forcing
+        return self.displacement
+
+    def amplitude(self, load_weight, height):
+        # Envelope of the free oscillation: where the displacement would peak
+        w2 = stiffness(height) / effective_mass(load_weight)
+        return np.sqrt(self.displacement**2 + self.velocity**2 / w2)
+
+    def acceleration(self, load_weight, height):
+        # Absolute vertical acceleration of the fork (m/s^2, upward): the
+        # spring and damper force over the mass they carry. What an
+        # accelerometer on the carriage would read.
+        mass = effective_mass(load_weight)
+        k = stiffness(height)
+        c = 2 * self.damping_ratio * np.sqrt(k * mass)
+        return -(k * self.displacement + c * self.velocity) / mass
+
+    def load_force(self, load_weight, height):
+        # Dynamic force (N) the load cell feels from the payload riding on the
+        # fork: the payload's share of the spring and damper force
+        return self.acceleration(load_weight, height) * np.asarray(load_weight, dtype=float)
+
+def load_reading(load_weight, force):
+    # Load cell value in the simulators' units (kg / 10)
+    return (load_weight + force / GRAVITY) / 10.0
+
+def simulate(base_acceleration, dt, load_weight, height, damping_ratio=DAMPING_RATIO):
+    # base_acceleration is (steps, *cases); returns fork displacement of the same shape
+    base_acceleration = np.asarray(base_acceleration, dtype=float)
+    model = ForkDynamics(np.broadcast_shapes(base_acceleration.shape[1:], np.shape(load_weight), np.shape(height)),
+                         damping_ratio)
+    out = np.empty(base_acceleration.shape[:1] + model.displacement.shape)
+    for i, acceleration in enumerate(base_acceleration):
+        out[i] = model.step(dt, acceleration, load_weight, height)
+    return out
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(1)
+    dt = 1 / 120
+    loads = np.array([0.0, 2.0, 5.0, 10.0])[:, None]   # Empty, light, medium, heavy
+    heights = np.array([0.0, 0.7, 1.4])[None, :]
+    steps = 120 * 60
+    # A minute of travel over a rough floor at 1 m/s, every load and height at once
+    excitation = FLOOR_ROUGHNESS * rng.standard_normal((steps, 4, 3))
+    started = time.perf_counter()
+    displacement = simulate(excitation, dt, loads, heights)
+    elapsed = time.perf_counter() - started
+    spectrum = np.abs(np.fft.rfft(displacement - displacement.mean(axis=0), axis=0))
+    freqs = np.fft.rfftfreq(steps, dt)
+    peaks = freqs[np.argmax(spectrum[1:], axis=0) + 1]
+    expected = natural_frequency(loads, heights)
+    print(f"{steps} steps x 12 cases in {elapsed * 1000:.0f} ms ({elapsed / steps / 12 * 1e6:.2f} us per case-step)")
+    for i, load in enumerate(loads[:, 0]):
+        print(f"  {load:4.0f} kg: spectral peak " + ", ".join(
+            f"{peaks[i, j]:5.2f} Hz (model {expected[i, j]:5.2f}) at {height:.1f} m" for j, height in enumerate(heights[0])))
+
+    # Stability: a step far beyond explicit Euler's limit still rings down
+    model = ForkDynamics()
+    model.step(0.5, 2.0, 0.0, 1.4)
+    for _ in range(200):
+        model.step(0.5, 0.0, 0.0, 1.4)
+    print(f"dt = 0.5 s (explicit Euler diverges above {2 * DAMPING_RATIO / (2 * math.pi * float(natural_frequency(0, 0))):.4f} s): "
+          f"amplitude after 100 s {float(model.amplitude(0.0, 1.4)):.2e} m")
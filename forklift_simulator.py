@@ -3,12 +3,32 @@ from pygame.locals import *
 import sys
 import math
 import random
+import time
 import numpy as np
 from OpenGL.GL import *
 from OpenGL.GLU import *
+from lod import LodSelector, LOD_LEVELS
+from quality import QualityController
+from fixed_timestep import FixedTimestep, PHYSICS_HZ, lerp, lerp_list, lerp_angle
+from scene_graph import SceneNode, translation_matrix, rotation_matrix
+from path_planner import OccupancyGrid, PathPlanner
+from dispatcher import Dispatcher
+from collision import CollisionWorld, OrientedBox, LAYER_STATIC, LAYER_CARGO, LAYER_FORKLIFT
+from mecanum import MecanumDrive, MOTOR_DIRECTIONS, chassis_velocity
+from motion_profile import (LiftJog, lift_profile, MAX_LIFT_SPEED, SCREW_LEAD, SCREW_ROD_LENGTH, SCREW_ROD_RADIUS,
+                            STEPPER_SIZE, LIFT_TRAVEL)
+from fork_dynamics import ForkDynamics, FLOOR_ROUGHNESS, VIBRATION_DISPLAY_GAIN, VIBRATION_THRESHOLD, load_reading
+from load_estimator import LoadEstimator
+from hx711 import simulated_loadcell
+from resonance_table import load_table
+from order_tracking import runout_acceleration
+from spectrogram_hud import SpectrogramPanel
+from timeseries_store import TimeSeriesStore, zoom_span, span_label
+from filters import loadcell_bank
 
 # --- PARAMETERS ---
 WIDTH, HEIGHT = 1024, 768
+FPS = 60
 
 # Colors
 RED = (1, 0, 0)
@@ -32,12 +52,14 @@ FORKLIFT_HEIGHT = 0.5
 WHEEL_RADIUS = 0.3
 WHEEL_WIDTH = 0.2
 WHEEL_ROLLERS = 12
-SCREW_ROD_LENGTH = 2.0
-SCREW_ROD_RADIUS = 0.05
-STEPPER_SIZE = 0.25
 FORK_WIDTH = 1.0
 FORK_LENGTH = 1.8
 FORK_THICKNESS = 0.1
+# Bounding sphere of chassis plus mast, used for level-of-detail selection
+FORKLIFT_BOUND_RADIUS = math.sqrt((FORKLIFT_WIDTH/2)**2 + (FORKLIFT_LENGTH/2)**2 + (SCREW_ROD_LENGTH/2 + FORKLIFT_HEIGHT)**2)
+# Front of the fork ahead of the chassis centre, and the circle covering chassis and fork
+FORK_REACH = FORKLIFT_LENGTH/2 - 0.2 + FORK_LENGTH/2
+FOOTPRINT_RADIUS = math.sqrt((FORKLIFT_WIDTH/2)**2 + FORK_REACH**2)
 
 # Warehouse parameters
 WAREHOUSE_WIDTH = 40
@@ -48,6 +70,20 @@ SHELF_DEPTH = 2
 SHELF_HEIGHT = 5
 SHELF_LEVELS = 4
 NUM_SHELVES = 5
+WALL_THICKNESS = 0.3
+WALL_BOXES = [  # (x, y, size x, size y)
+    (0, WAREHOUSE_LENGTH/2, WAREHOUSE_WIDTH, WALL_THICKNESS),  # North wall
+    (0, -WAREHOUSE_LENGTH/2, WAREHOUSE_WIDTH, WALL_THICKNESS),  # South wall
+    (-WAREHOUSE_WIDTH/2, 0, WALL_THICKNESS, WAREHOUSE_LENGTH),  # West wall
+    (WAREHOUSE_WIDTH/2, 0, WALL_THICKNESS, WAREHOUSE_LENGTH),  # East wall
+]
+SHELF_POSITIONS = [
+    (WAREHOUSE_WIDTH/2 - SHELF_DEPTH/2 - 1, 0, 0),  # East wall
+    (-(WAREHOUSE_WIDTH/2 - SHELF_DEPTH/2 - 1), 0, 0),  # West wall
+    (0, WAREHOUSE_LENGTH/2 - SHELF_DEPTH/2 - 1, 0),  # North wall
+    (0, -(WAREHOUSE_LENGTH/2 - SHELF_DEPTH/2 - 1), 0),  # South wall
+    (WAREHOUSE_WIDTH/4, WAREHOUSE_LENGTH/4, 0),  # Middle
+]
 
 # State
 position = [0, 0, 0]
@@ -55,19 +91,41 @@ rotation = 0
 fork_height = 0
 max_fork_height = 95  # Set to 95% to prevent exceeding rod length
 min_fork_height = 5   # Minimum height to prevent going beyond bottom
-wheel_steering = [0, 0, 0, 0]
+wheel_speeds = [0.0, 0.0, 0.0, 0.0]  # rad/s, positive driving forward
+wheel_spin = [0, 0, 0, 0]  # Degrees each wheel has turned about its axle
+chassis_speed = 0.0  # m/s over the floor
 screw_rotation = [0, 0]  # Left and right screw rods
+fork_command = 0  # 1 raising, -1 lowering, 0 holding; set by the keys (the autopilot plans whole moves)
+
+# Movement parameters (physical units, so motion doesn't depend on frame rate)
+linear_speed = 6.0  # m/s
+angular_speed = 120  # Degrees per second
+physics_clock = FixedTimestep(PHYSICS_HZ)
+drive = MecanumDrive(FORKLIFT_WIDTH, FORKLIFT_LENGTH, WHEEL_RADIUS)
+LIFT_PERCENT_PER_METRE = (max_fork_height - min_fork_height) / LIFT_TRAVEL
+LIFT_TOLERANCE = 0.01  # Percent of fork height the autopilot treats as on target
+lift = LiftJog(MAX_LIFT_SPEED)  # Acceleration-limited lift at the motor's real top speed, ramping on fork_command
+fork = ForkDynamics()  # Fork and lead screw as a mass-spring-damper
+loadcell_adc = simulated_loadcell()  # HX711 the load cell is read through: 24-bit counts and their calibration
+load_estimator = LoadEstimator(dt=1.0 / PHYSICS_HZ)  # Payload mass inferred from the load cell alone
+resonance = load_table()  # Expected fork modes over height and load, looked up per frame
+spectrogram = SpectrogramPanel()  # Fork vibration over time, scrolling under the load cell graph
+lift_move = None  # (start height, profile, elapsed s) while a planned lift move runs
 
-# Movement parameters
-linear_speed = 0.1
-angular_speed = 2
-fork_speed = 1
-screw_rotation_speed = 15  # Degrees per frame when raising/lowering
+# Render state (physics state interpolated between the last two steps)
+render_position = [0, 0, 0]
+render_rotation = 0
+render_fork_height = 0
+render_screw_rotation = [0, 0]
+render_wheel_spin = [0, 0, 0, 0]
 
 # Loadcell parameters
-loadcell_data = []
-MAX_DATA_POINTS = 100
-vibration_amplitude = 0.0
+loadcell_store = TimeSeriesStore()  # Every load cell sample, with min/max/mean tiers for zooming out
+loadcell_filters = loadcell_bank(PHYSICS_HZ)  # Streaming low-pass, notch and DC blocker stages on the load cell
+HUD_SIGNAL = "display"  # Filter bank output the graph draws: "raw", "display" (low-passed) or "vibration" (DC-blocked)
+MAX_DATA_POINTS = 200  # Samples shown in the graph before zooming, taken once per physics step
+graph_span = MAX_DATA_POINTS  # Samples across the graph; Page Up/Down zoom out/in
+vibration_amplitude = 0.0  # m
 load_weight = 0.0
 is_vibrating = False
 
@@ -88,6 +146,25 @@ destination_zones = [
 
 carried_cargo = None
 
+# Autonomous mode
+AUTOPILOT_PICKUP_CLEARANCE = 0.1  # m of fork tip above the cargo top when driving in
+occupancy_grid = OccupancyGrid(WAREHOUSE_WIDTH, WAREHOUSE_LENGTH, inflation=FOOTPRINT_RADIUS)
+planner = PathPlanner(occupancy_grid)
+dispatcher = None  # Created with the zone distance fields when autonomous mode starts
+FORKLIFT_ID = 0
+autopilot = {"active": False, "task": None, "cargo": None, "path": [], "fork_target": None, "skipped": set()}
+
+# Collision
+CARGO_BAY_DEPTH = FORKLIFT_LENGTH/2 + 0.15  # m behind the chassis front that cargo can sit in, under the fork
+collision_world = CollisionWorld()
+released_cargo = set()  # Cargo dropped on the spot, ignored until the forklift has driven off it
+
+# Rendering state
+camera_position = [0, 0, 0]
+lod_selector = LodSelector()
+quality = QualityController(FPS)
+shelf_boxes = {}  # (shelf index, level) -> boxes, generated once so they don't flicker
+
 # --- OPENGL PRIMITIVES ---
 def create_cube(sx, sy, sz, color=RED):
     vertices = (
@@ -123,6 +200,7 @@ def create_cube(sx, sy, sz, color=RED):
     glEnd()
 
 def create_cylinder(radius, length, sides=20, color=GRAY):
+    sides = min(sides, quality.level["max_cylinder_sides"])
     glColor3fv(color)
     quadric = gluNewQuadric()
     gluCylinder(quadric, radius, radius, length, sides, 1)
@@ -133,14 +211,15 @@ def create_cylinder(radius, length, sides=20, color=GRAY):
     glPopMatrix()
     gluDeleteQuadric(quadric)
 
-def create_mecanum_wheel(radius, width, rollers=8, angle=45, color=BLUE):
+def create_mecanum_wheel(radius, width, rollers=8, angle=45, color=BLUE, sides=20, roller_sides=8):
+    sides = min(sides, quality.level["max_cylinder_sides"])
     glColor3fv(BLACK)
     quadric = gluNewQuadric()
-    gluCylinder(quadric, radius, radius, width, 20, 1)
+    gluCylinder(quadric, radius, radius, width, sides, 1)
     glPushMatrix()
-    gluDisk(quadric, 0, radius, 20, 1)
+    gluDisk(quadric, 0, radius, sides, 1)
     glTranslatef(0, 0, width)
-    gluDisk(quadric, 0, radius, 20, 1)
+    gluDisk(quadric, 0, radius, sides, 1)
     glPopMatrix()
     roller_radius = radius * 0.3
     roller_length = width * 1.2
@@ -152,19 +231,21 @@ def create_mecanum_wheel(radius, width, rollers=8, angle=45, color=BLUE):
         glRotatef(angle, 0, 0, 1)
         glColor3fv(color)
         glRotatef(90, 1, 0, 0)
-        create_cylinder(roller_radius, roller_length, 8, color)
+        create_cylinder(roller_radius, roller_length, roller_sides, color)
         glPopMatrix()
     gluDeleteQuadric(quadric)
 
-def create_threaded_rod(length, radius, rotation_angle=0, color=METAL):
+def create_threaded_rod(length, radius, rotation_angle=0, color=METAL, threads=20, sides=12):
     glColor3fv(color)
-    create_cylinder(radius, length, 12, color)
-    thread_spacing = length / 20
+    create_cylinder(radius, length, sides, color)
+    if threads <= 0:
+        return
+    thread_spacing = length / threads
     thread_height = radius * 0.2
     glColor3fv(BLACK)
-    for i in range(20):
+    for i in range(threads):
         glPushMatrix()
-        thread_angle = rotation_angle + (i * 18)
+        thread_angle = rotation_angle + (i * 360 / threads)
         glTranslatef(0, 0, i * thread_spacing)
         glRotatef(thread_angle, 0, 0, 1)
         glPushMatrix()
@@ -249,7 +330,7 @@ def create_floor():
 
 def create_walls():
     wall_height = WAREHOUSE_HEIGHT
-    wall_thickness = 0.3
+    wall_thickness = WALL_THICKNESS
     
     # North wall
     glPushMatrix()
@@ -285,16 +366,25 @@ def create_walls():
         create_cube(window_size, 0.1, window_size, (0.5, 0.7, 1.0))
         glPopMatrix()
 
+def generate_shelf_boxes():
+    boxes = []
+    if random.random() > 0.3:
+        num_boxes = random.randint(1, 3)
+        for _ in range(num_boxes):
+            box_x = random.uniform(-SHELF_WIDTH/2 + 0.3, SHELF_WIDTH/2 - 0.3)
+            box_y = random.uniform(-SHELF_DEPTH/2 + 0.3, SHELF_DEPTH/2 - 0.3)
+            box_width = random.uniform(0.3, 0.8)
+            box_depth = random.uniform(0.3, 0.8)
+            box_height = random.uniform(0.2, 0.5)
+            box_color = random.choice([BROWN, BLUE, RED, GREEN, YELLOW])
+            boxes.append((box_x, box_y, box_width, box_depth, box_height, box_color))
+    return boxes
+
 def create_shelves():
-    shelf_positions = [
-        (WAREHOUSE_WIDTH/2 - SHELF_DEPTH/2 - 1, 0, 0),  # East wall
-        (-(WAREHOUSE_WIDTH/2 - SHELF_DEPTH/2 - 1), 0, 0),  # West wall
-        (0, WAREHOUSE_LENGTH/2 - SHELF_DEPTH/2 - 1, 0),  # North wall
-        (0, -(WAREHOUSE_LENGTH/2 - SHELF_DEPTH/2 - 1), 0),  # South wall
-        (WAREHOUSE_WIDTH/4, WAREHOUSE_LENGTH/4, 0),  # Middle
-    ]
+    shelf_radius = math.sqrt((SHELF_WIDTH/2)**2 + (SHELF_DEPTH/2)**2 + (SHELF_HEIGHT/2)**2)
     
-    for pos in shelf_positions:
+    for i, pos in enumerate(SHELF_POSITIONS):
+        detail = lod_selector.select_at(("shelf", i), camera_position, (pos[0], pos[1], SHELF_HEIGHT/2), shelf_radius)
         glPushMatrix()
         glTranslatef(pos[0], pos[1], 0)
         
@@ -304,7 +394,7 @@ def create_shelves():
                 glPushMatrix()
                 glTranslatef(x, y, SHELF_HEIGHT/2)
                 glColor3fv(METAL)
-                create_cylinder(0.1, SHELF_HEIGHT, 8, METAL)
+                create_cylinder(0.1, SHELF_HEIGHT, detail["support_sides"], METAL)
                 glPopMatrix()
         
         # Horizontal shelves
@@ -317,20 +407,13 @@ def create_shelves():
             glPopMatrix()
             
             # Add some random boxes on shelves (except bottom shelf)
-            if level > 0 and random.random() > 0.3:
-                num_boxes = random.randint(1, 3)
-                for _ in range(num_boxes):
-                    box_x = random.uniform(-SHELF_WIDTH/2 + 0.3, SHELF_WIDTH/2 - 0.3)
-                    box_y = random.uniform(-SHELF_DEPTH/2 + 0.3, SHELF_DEPTH/2 - 0.3)
-                    box_width = random.uniform(0.3, 0.8)
-                    box_depth = random.uniform(0.3, 0.8)
-                    box_height = random.uniform(0.2, 0.5)
-                    box_color = random.choice([BROWN, BLUE, RED, GREEN, YELLOW])
-                    
-                    glPushMatrix()
-                    glTranslatef(box_x, box_y, level * level_height + box_height/2 + 0.05)
-                    create_cube(box_width, box_depth, box_height, box_color)
-                    glPopMatrix()
+            if (i, level) not in shelf_boxes:
+                shelf_boxes[(i, level)] = generate_shelf_boxes() if level > 0 else []
+            for box_x, box_y, box_width, box_depth, box_height, box_color in shelf_boxes[(i, level)][:quality.level["max_shelf_boxes"]]:
+                glPushMatrix()
+                glTranslatef(box_x, box_y, level * level_height + box_height/2 + 0.05)
+                create_cube(box_width, box_depth, box_height, box_color)
+                glPopMatrix()
                 
         glPopMatrix()
 
@@ -338,8 +421,9 @@ def create_destination_zones():
     for zone in destination_zones:
         glPushMatrix()
         glTranslatef(zone["position"][0], zone["position"][1], zone["position"][2] + 0.05)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        if quality.level["blend"]:
+            glEnable(GL_BLEND)
+            glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
         create_cube(zone["size"][0], zone["size"][1], 0.02, zone["color"])
         glDisable(GL_BLEND)
         glPopMatrix()
@@ -352,46 +436,37 @@ def create_cargo():
             create_cube(cargo["size"][0], cargo["size"][1], cargo["size"][2], cargo["color"])
             glPopMatrix()
 
-# --- MAIN DRAW FUNCTION ---
-def draw_forklift():
-    global vibration_amplitude, is_vibrating, carried_cargo
-    
-    glPushMatrix()
-    glTranslatef(position[0], position[1], position[2])
-    glRotatef(rotation, 0, 0, 1)
+# --- SCENE GRAPH ---
+ROD_DISTANCE = FORKLIFT_WIDTH * 0.3
+WHEEL_OFFSETS = [
+    (-FORKLIFT_WIDTH/2, -FORKLIFT_LENGTH/2 + WHEEL_RADIUS, -FORKLIFT_HEIGHT/2),
+    (FORKLIFT_WIDTH/2, -FORKLIFT_LENGTH/2 + WHEEL_RADIUS, -FORKLIFT_HEIGHT/2),
+    (FORKLIFT_WIDTH/2, FORKLIFT_LENGTH/2 - WHEEL_RADIUS, -FORKLIFT_HEIGHT/2),
+    (-FORKLIFT_WIDTH/2, FORKLIFT_LENGTH/2 - WHEEL_RADIUS, -FORKLIFT_HEIGHT/2)
+]
+WHEEL_ANGLES = [45, -45, 45, -45]
+forklift_detail = LOD_LEVELS[0]  # Detail level of the forklift currently being drawn
+
+def draw_chassis():
     create_cube(FORKLIFT_WIDTH, FORKLIFT_LENGTH, FORKLIFT_HEIGHT, BLUE)
-    wheel_positions = [
-        (-FORKLIFT_WIDTH/2, -FORKLIFT_LENGTH/2 + WHEEL_RADIUS, -FORKLIFT_HEIGHT/2),
-        (FORKLIFT_WIDTH/2, -FORKLIFT_LENGTH/2 + WHEEL_RADIUS, -FORKLIFT_HEIGHT/2),
-        (FORKLIFT_WIDTH/2, FORKLIFT_LENGTH/2 - WHEEL_RADIUS, -FORKLIFT_HEIGHT/2),
-        (-FORKLIFT_WIDTH/2, FORKLIFT_LENGTH/2 - WHEEL_RADIUS, -FORKLIFT_HEIGHT/2)
-    ]
-    wheel_angles = [45, -45, 45, -45]
-    for i, (wx, wy, wz) in enumerate(wheel_positions):
-        glPushMatrix()
-        glTranslatef(wx, wy, wz)
-        glRotatef(wheel_steering[i], 0, 0, 1)
-        if i == 0 or i == 3:
-            glRotatef(90, 0, 1, 0)
-        else:
-            glRotatef(-90, 0, 1, 0)
-        create_mecanum_wheel(WHEEL_RADIUS, WHEEL_WIDTH, WHEEL_ROLLERS, wheel_angles[i])
-        glPopMatrix()
-    # --- Vertical support and rods ---
-    glPushMatrix()
-    glTranslatef(0, -FORKLIFT_LENGTH/2 + 0.1, FORKLIFT_HEIGHT/2)
-    rod_distance = FORKLIFT_WIDTH * 0.3
-    rod_height = SCREW_ROD_LENGTH
-    
+
+def make_wheel_draw(i):
+    def draw_wheel():
+        rollers = min(WHEEL_ROLLERS, forklift_detail["max_rollers"], quality.level["max_rollers"])
+        create_mecanum_wheel(WHEEL_RADIUS, WHEEL_WIDTH, rollers, WHEEL_ANGLES[i],
+                             sides=forklift_detail["tire_sides"], roller_sides=forklift_detail["roller_sides"])
+    return draw_wheel
+
+def draw_mast():
     # Draw vertical poles to visualize limits
-    for x_offset in [-rod_distance, rod_distance]:
+    for x_offset in [-ROD_DISTANCE, ROD_DISTANCE]:
         glPushMatrix()
         glTranslatef(x_offset, 0, 0)
         glColor3fv(GRAY)
-        create_cylinder(SCREW_ROD_RADIUS*0.5, rod_height, 8, GRAY)
+        create_cylinder(SCREW_ROD_RADIUS*0.5, SCREW_ROD_LENGTH, 8, GRAY)
         glPopMatrix()
     
-    for i, x_offset in enumerate([-rod_distance, rod_distance]):
+    for i, x_offset in enumerate([-ROD_DISTANCE, ROD_DISTANCE]):
         glPushMatrix()
         glTranslatef(x_offset, 0, -FORKLIFT_HEIGHT/2)
         create_stepper_motor(STEPPER_SIZE)
@@ -401,62 +476,124 @@ def draw_forklift():
         glPopMatrix()
         glPushMatrix()
         glTranslatef(0, 0, STEPPER_SIZE * 1.25)
-        create_threaded_rod(rod_height - STEPPER_SIZE * 1.25, SCREW_ROD_RADIUS, screw_rotation[i])
+        create_threaded_rod(SCREW_ROD_LENGTH - STEPPER_SIZE * 1.25, SCREW_ROD_RADIUS, render_screw_rotation[i],
+                            threads=forklift_detail["threads"], sides=forklift_detail["cylinder_sides"])
         glPopMatrix()
         glPopMatrix()
-    
-    # Calculate normalized height percentage (0.0 to 1.0)
-    normalized_height = (fork_height - min_fork_height) / (max_fork_height - min_fork_height)
-    # Scale to actual rod height (accounting for limits)
-    usable_rod_height = rod_height - STEPPER_SIZE * 1.25 - SCREW_ROD_RADIUS * 8
-    current_height = STEPPER_SIZE * 1.25 + normalized_height * usable_rod_height
-    
-    # --- Acrylic fork attached to T-nuts with vibration ---
-    fork_vibration_offset = 0
-    if is_vibrating:
-        fork_vibration_offset = math.sin(pygame.time.get_ticks() * 0.01) * vibration_amplitude
-    
-    glPushMatrix()
-    glTranslatef(0, 0.1, current_height + fork_vibration_offset)
-    
+
+def draw_carriage():
     # T-nuts
-    for x_offset in [-rod_distance, rod_distance]:
+    for x_offset in [-ROD_DISTANCE, ROD_DISTANCE]:
         glPushMatrix()
         glTranslatef(x_offset, 0, 0)
         create_t_nut(SCREW_ROD_RADIUS * 2, SCREW_ROD_RADIUS * 8)
         glPopMatrix()
-    
-    # Acrylic sheet (fork)
-    glPushMatrix()
-    glTranslatef(0, 0, SCREW_ROD_RADIUS * 4)
-    glEnable(GL_BLEND)
-    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+def draw_fork():
+    # Acrylic sheet
+    if quality.level["blend"]:
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
     glColor4f(*ACRYLIC)
-    create_cube(rod_distance*2+0.2, FORK_LENGTH, 0.08, ACRYLIC)
+    create_cube(ROD_DISTANCE*2+0.2, FORK_LENGTH, 0.08, ACRYLIC)
     glDisable(GL_BLEND)
-    glPopMatrix()
-    
-    # Load cell on the fork
-    glPushMatrix()
-    glTranslatef(0, FORK_LENGTH*0.3, SCREW_ROD_RADIUS * 4 + 0.08)
-    create_loadcell(rod_distance*0.8, 0.3, 0.1, METAL)
-    glPopMatrix()
-    
-    # Draw carried cargo if any
+
+def draw_load_cell():
+    create_loadcell(ROD_DISTANCE*0.8, 0.3, 0.1, METAL)
+
+def draw_payload():
     if carried_cargo:
-        glPushMatrix()
-        glTranslatef(0, FORK_LENGTH*0.3, SCREW_ROD_RADIUS * 4 + 0.18)
-        create_cube(
-            carried_cargo["size"][0], 
-            carried_cargo["size"][1], 
-            carried_cargo["size"][2], 
-            carried_cargo["color"]
-        )
-        glPopMatrix()
+        glTranslatef(0, 0, carried_cargo["size"][2]/2)
+        create_cube(carried_cargo["size"][0], carried_cargo["size"][1], carried_cargo["size"][2], carried_cargo["color"])
+
+def build_forklift_graph():
+    # forklift -> mast -> carriage -> fork / load cell -> payload. Only the
+    # forklift pose and the carriage height change at runtime.
+    root = SceneNode("forklift", draw=draw_chassis)
+    for i, (wx, wy, wz) in enumerate(WHEEL_OFFSETS):
+        SceneNode(f"wheel_{i}", root, wheel_matrix(i), make_wheel_draw(i))
+    mast = SceneNode("mast", root, translation_matrix(0, -FORKLIFT_LENGTH/2 + 0.1, FORKLIFT_HEIGHT/2), draw_mast)
+    carriage = SceneNode("carriage", mast, draw=draw_carriage)
+    SceneNode("fork", carriage, translation_matrix(0, 0, SCREW_ROD_RADIUS * 4), draw_fork)
+    load_cell = SceneNode("load_cell", carriage, translation_matrix(0, FORK_LENGTH*0.3, SCREW_ROD_RADIUS * 4 + 0.08), draw_load_cell)
+    SceneNode("payload", load_cell, translation_matrix(0, 0, 0.05), draw_payload)
+    # Underside of the fork below the load cell, used for picking
+    SceneNode("fork_tip", carriage, translation_matrix(0, FORK_LENGTH*0.3, SCREW_ROD_RADIUS * 4 - 0.04))
+    return root
+
+def wheel_matrix(i, spin=0):
+    wx, wy, wz = WHEEL_OFFSETS[i]
+    spin_axis = rotation_matrix(90 if i == 0 or i == 3 else -90, "y")
+    return translation_matrix(wx, wy, wz) @ spin_axis @ rotation_matrix(spin)
+
+def carriage_height(height_percent):
+    # Fork height in percent -> carriage height above the mast base
+    normalized_height = (height_percent - min_fork_height) / (max_fork_height - min_fork_height)
+    return STEPPER_SIZE * 1.25 + normalized_height * LIFT_TRAVEL
+
+def fork_vibration():
+    # The fork's real motion is millimetres; exaggerated so it shows
+    return float(fork.displacement) * VIBRATION_DISPLAY_GAIN
+
+def pose_forklift(nodes, pos, rot, height_percent, vibration_offset=0):
+    nodes["forklift"].set_pose(pos[0], pos[1], pos[2], rot)
+    nodes["carriage"].set_pose(0, 0.1, carriage_height(height_percent) + vibration_offset)
+
+def pose_physics():
+    # The physics graph at the physics state; a no-op until the next step moves it
+    pose_forklift(physics_nodes, position, rotation, fork_height)
+
+def fork_tip_position():
+    # Fork tip of the physics state, shared by picking and collision
+    pose_physics()
+    return physics_nodes["fork_tip"].world_point()
+
+def current_view_matrix():
+    return np.array(glGetFloatv(GL_MODELVIEW_MATRIX), dtype=np.float64).reshape(4, 4).T
+
+def load_matrix(matrix):
+    glLoadMatrixf(np.ascontiguousarray(matrix.T, dtype=np.float32))
+
+def draw_scene(root, view):
+    # Each node is drawn with its cached world matrix instead of rebuilding
+    # the chain on the GL matrix stack
+    for node in root.walk():
+        if node.draw is not None:
+            load_matrix(view @ node.world)
+            node.draw()
+    load_matrix(view)
+
+# Two instances of the graph: one drawn at the interpolated render pose, one
+# at the physics state for picking and collision. Sharing one would re-pose
+# it back and forth every frame, so neither would ever hit its cache.
+forklift_graph = build_forklift_graph()
+forklift_nodes = {node.name: node for node in forklift_graph.walk()}
+physics_graph = build_forklift_graph()
+physics_nodes = {node.name: node for node in physics_graph.walk()}
+wheel_poses = [0, 0, 0, 0]
+
+# --- MAIN DRAW FUNCTION ---
+def draw_forklift_impostor():
+    # Single box covering chassis and mast for forklifts too far away to resolve
+    glTranslatef(0, 0, SCREW_ROD_LENGTH/2 - FORKLIFT_HEIGHT/2)
+    create_cube(FORKLIFT_WIDTH, FORKLIFT_LENGTH, SCREW_ROD_LENGTH + FORKLIFT_HEIGHT, BLUE)
+
+def draw_forklift(key="forklift", crowd=1):
+    global forklift_detail
     
-    glPopMatrix()  # End fork assembly
-    glPopMatrix()  # End vertical support
-    glPopMatrix()  # End forklift
+    forklift_detail = lod_selector.select_at(key, camera_position, render_position, FORKLIFT_BOUND_RADIUS, crowd)
+    pose_forklift(forklift_nodes, render_position, render_rotation, render_fork_height, fork_vibration())
+    for i in range(len(WHEEL_OFFSETS)):
+        if wheel_poses[i] != render_wheel_spin[i]:
+            wheel_poses[i] = render_wheel_spin[i]
+            forklift_nodes[f"wheel_{i}"].set_local(wheel_matrix(i, render_wheel_spin[i]))
+    view = current_view_matrix()
+    if forklift_detail["impostor"]:
+        load_matrix(view @ forklift_graph.world)
+        draw_forklift_impostor()
+        load_matrix(view)
+        return
+    draw_scene(forklift_graph, view)
 
 # --- SUPPORT ---
 def display_text(text, x, y, size=18):
@@ -498,7 +635,7 @@ def draw_grid():
     glEnable(GL_LIGHTING)
 
 def draw_loadcell_graph():
-    if not loadcell_data:
+    if not loadcell_store.count:
         return
         
     glMatrixMode(GL_PROJECTION)
@@ -530,18 +667,29 @@ def draw_loadcell_graph():
     glVertex2f(WIDTH - 300, HEIGHT - 20)
     glEnd()
     
-    # Draw data points
+    # Draw data points from the store tier with no more points than the
+    # quality level allows: each bucket's min/max as a dark bar, the means
+    # as the line
+    times, low, high, mean = loadcell_store.latest(graph_span, quality.level["hud_points"])
+    xs = (WIDTH - 300 + 280 * (times - max(loadcell_store.count - graph_span, 0)) / graph_span).tolist()
+    glColor3f(0.0, 0.4, 0.0)
+    glBegin(GL_LINES)
+    for x, bottom, top in zip(xs, low.tolist(), high.tolist()):
+        glVertex2f(x, HEIGHT - 110 + bottom * 80)
+        glVertex2f(x, HEIGHT - 110 + top * 80)
+    glEnd()
     glColor3f(0.0, 1.0, 0.0)
     glBegin(GL_LINE_STRIP)
-    data_len = len(loadcell_data)
-    for i, value in enumerate(loadcell_data):
-        x = WIDTH - 300 + (280 * i / MAX_DATA_POINTS)
+    for x, value in zip(xs, mean.tolist()):
         y = HEIGHT - 110 + value * 80  # Scale for display
         glVertex2f(x, y)
     glEnd()
 
     # Draw label
-    display_text("Load Cell Data", WIDTH - 300, HEIGHT - 220)
+    display_text(f"Load Cell Data (last {span_label(graph_span, PHYSICS_HZ)})", WIDTH - 300, HEIGHT - 220)
+    
+    # Fork vibration spectrogram underneath: time to the right, 0 Hz at the bottom
+    spectrogram.draw(WIDTH - 300, HEIGHT - 400, WIDTH - 20, HEIGHT - 230)
     
     glEnable(GL_DEPTH_TEST)
     glEnable(GL_LIGHTING)
@@ -550,16 +698,13 @@ def draw_loadcell_graph():
     glMatrixMode(GL_MODELVIEW)
     glPopMatrix()
 
-def update_physics():
-    global screw_rotation, loadcell_data, vibration_amplitude, is_vibrating, carried_cargo, load_weight
+def update_physics(dt):
+    global screw_rotation, vibration_amplitude, is_vibrating, carried_cargo, load_weight
     
-    keys = pygame.key.get_pressed()
-    if keys[K_r] and fork_height < max_fork_height:
-        screw_rotation[0] = (screw_rotation[0] + screw_rotation_speed) % 360
-        screw_rotation[1] = (screw_rotation[1] + screw_rotation_speed) % 360
-    elif keys[K_f] and fork_height > min_fork_height:
-        screw_rotation[0] = (screw_rotation[0] - screw_rotation_speed) % 360
-        screw_rotation[1] = (screw_rotation[1] - screw_rotation_speed) % 360
+    # The screws turn with the lift's actual speed
+    screw_rate = lift.velocity / SCREW_LEAD * 360  # Degrees per second
+    screw_rotation[0] = (screw_rotation[0] + screw_rate * dt) % 360
+    screw_rotation[1] = (screw_rotation[1] + screw_rate * dt) % 360
     
     # Update loadcell data
     current_weight = 0
@@ -567,31 +712,27 @@ def update_physics():
         current_weight = carried_cargo["weight"]
     load_weight = current_weight
     
-    base_value = load_weight / 10.0  # Base value depends on weight
+    
+    # The fork rings on the mast: driven by the lift's acceleration, the
+    # screws' runout and floor bumps that grow with travel speed
+    height = (fork_height - min_fork_height) / LIFT_PERCENT_PER_METRE
+    bumps = FLOOR_ROUGHNESS * chassis_speed * random.gauss(0, 1)
+    fork.step(dt, lift.acceleration + runout_acceleration(screw_rotation[0], screw_rate) + bumps, load_weight, height)
+    spectrogram.push(float(fork.displacement))
+    vibration_amplitude = float(fork.amplitude(load_weight, height))
+    is_vibrating = vibration_amplitude > VIBRATION_THRESHOLD
+    fork_acceleration = float(fork.acceleration(load_weight, height))
+    force = load_weight * fork_acceleration
     
     # Add some noise
     noise = random.uniform(-0.05, 0.05)
     
-    # Add vibration if fork is moving or if there's active vibration
-    movement_vibration = 0
-    if (keys[K_r] or keys[K_f]) and (fork_height > min_fork_height and fork_height < max_fork_height):
-        movement_vibration = math.sin(pygame.time.get_ticks() * 0.01) * 0.2
-        is_vibrating = True
-        vibration_amplitude = 0.03 + (load_weight * 0.01)
-    elif is_vibrating:
-        # Gradually reduce vibration when movement stops
-        vibration_amplitude *= 0.98
-        if vibration_amplitude < 0.001:
-            is_vibrating = False
-            vibration_amplitude = 0
-    
     # Calculate current value and add to data
-    current_value = base_value + noise + movement_vibration
-    loadcell_data.append(current_value)
-    
-    # Keep only the last MAX_DATA_POINTS values
-    if len(loadcell_data) > MAX_DATA_POINTS:
-        loadcell_data.pop(0)
+    counts = loadcell_adc.counts(load_reading(load_weight, force) + noise)  # What the HX711 would report
+    current_value = loadcell_adc.units(counts)
+    load_estimator.update(current_value, fork_acceleration)
+    filtered = loadcell_filters.push(current_value)
+    loadcell_store.push(filtered[HUD_SIGNAL])
 
 def check_pickup():
     global carried_cargo
@@ -599,15 +740,8 @@ def check_pickup():
     if carried_cargo:
         return  # Already carrying something
     
-    # Calculate normalized height percentage (0.0 to 1.0)
-    normalized_height = (fork_height - min_fork_height) / (max_fork_height - min_fork_height)
-    usable_rod_height = SCREW_ROD_LENGTH - STEPPER_SIZE * 1.25 - SCREW_ROD_RADIUS * 8
-    current_height = STEPPER_SIZE * 1.25 + normalized_height * usable_rod_height
-    
-    # Calculate the global position of the fork
-    fork_x = position[0] + math.sin(math.radians(rotation)) * (-FORKLIFT_LENGTH/2 + 0.1 + FORK_LENGTH*0.3)
-    fork_y = position[1] - math.cos(math.radians(rotation)) * (-FORKLIFT_LENGTH/2 + 0.1 + FORK_LENGTH*0.3)
-    fork_z = position[2] + current_height + SCREW_ROD_RADIUS * 4 + 0.08
+    # Global position of the fork tip from the scene graph
+    fork_x, fork_y, fork_z = fork_tip_position()
     
     pickup_distance = 0.8  # Maximum distance for pickup
     
@@ -626,6 +760,7 @@ def check_pickup():
             if distance < pickup_distance and height_diff < 0.3:
                 cargo["carried"] = True
                 carried_cargo = cargo
+                sync_cargo_bodies()
                 print(f"Picked up cargo {cargo['id']} with weight {cargo['weight']}kg")
                 break
 
@@ -636,52 +771,336 @@ def check_drop():
         return
     
     # Check if we're over a destination zone
+    if zone_at(position[0], position[1]):
+        # Drop the cargo here
+        carried_cargo["carried"] = False
+        carried_cargo["position"] = [position[0], position[1], 0]
+        print(f"Dropped cargo {carried_cargo['id']} in destination zone")
+        released_cargo.add(("cargo", carried_cargo["id"]))
+        carried_cargo = None
+        sync_cargo_bodies()
+
+def zone_at(x, y):
     for zone in destination_zones:
-        zone_x = zone["position"][0]
-        zone_y = zone["position"][1]
-        zone_width = zone["size"][0]
-        zone_depth = zone["size"][1]
-        
-        # Calculate forklift position relative to zone
-        rel_x = position[0] - zone_x
-        rel_y = position[1] - zone_y
-        
-        if (abs(rel_x) < zone_width/2 and abs(rel_y) < zone_depth/2):
-            # Drop the cargo here
-            carried_cargo["carried"] = False
-            carried_cargo["position"] = [position[0], position[1], 0]
-            print(f"Dropped cargo {carried_cargo['id']} in destination zone")
-            carried_cargo = None
-            break
-
-def handle_input():
-    global position, rotation, fork_height
-    
-    keys = pygame.key.get_pressed()
-    
-    # Movement controls
-    if keys[K_UP]:
-        position[0] += math.sin(math.radians(rotation)) * linear_speed
-        position[1] -= math.cos(math.radians(rotation)) * linear_speed
-    if keys[K_DOWN]:
-        position[0] -= math.sin(math.radians(rotation)) * linear_speed
-        position[1] += math.cos(math.radians(rotation)) * linear_speed
-    if keys[K_LEFT]:
-        rotation += angular_speed
-    if keys[K_RIGHT]:
-        rotation -= angular_speed
-    
-    # Fork controls
-    if keys[K_r] and fork_height < max_fork_height:
-        fork_height += fork_speed
-    if keys[K_f] and fork_height > min_fork_height:
-        fork_height -= fork_speed
-    
-    # Cargo controls
-    if keys[K_SPACE]:
+        # Position relative to zone
+        rel_x = x - zone["position"][0]
+        rel_y = y - zone["position"][1]
+        if abs(rel_x) < zone["size"][0]/2 and abs(rel_y) < zone["size"][1]/2:
+            return zone
+    return None
+
+# --- COLLISION ---
+def build_collision_world():
+    # Walls and shelves never move, so they are indexed once
+    for x, y, sx, sy in WALL_BOXES:
+        collision_world.add_static(OrientedBox(x, y, sx/2, sy/2, z0=0, z1=WAREHOUSE_HEIGHT))
+    for x, y, _ in SHELF_POSITIONS:
+        collision_world.add_static(OrientedBox(x, y, SHELF_WIDTH/2 + 0.05, SHELF_DEPTH/2 + 0.05, z0=0, z1=SHELF_HEIGHT))
+    sync_cargo_bodies()
+
+def sync_cargo_bodies():
+    # Cargo only moves when it is picked up or dropped
+    for cargo in cargo_objects:
+        key = ("cargo", cargo["id"])
+        if cargo["carried"]:
+            collision_world.remove_body(key)
+        else:
+            x, y, z = cargo["position"]
+            sx, sy, sz = cargo["size"]
+            collision_world.set_body(key, [OrientedBox(x, y, sx/2, sy/2, 0, z, z + sz, LAYER_CARGO)])
+
+def forklift_boxes():
+    # Footprints at the physics pose. Cargo can go under the fork, so only
+    # the chassis behind the fork bay collides with it; the full chassis
+    # (wheels included) collides with walls, shelves and other forklifts.
+    # The fork sheet and anything on it collide with everything at their height.
+    pose_physics()
+    x, y, z = position
+    bottom, top = z - FORKLIFT_HEIGHT/2, z + FORKLIFT_HEIGHT/2
+    rear_length = FORKLIFT_LENGTH - CARGO_BAY_DEPTH
+    rear_x, rear_y, _ = physics_graph.world_point(0, FORKLIFT_LENGTH/2 - rear_length/2, 0)
+    fork_x, fork_y, fork_z = physics_nodes["fork"].world_point()
+    boxes = [
+        OrientedBox(x, y, FORKLIFT_WIDTH/2 + WHEEL_WIDTH/2, FORKLIFT_LENGTH/2, rotation, bottom, top,
+                    LAYER_FORKLIFT, LAYER_STATIC | LAYER_FORKLIFT),
+        OrientedBox(rear_x, rear_y, FORKLIFT_WIDTH/2, rear_length/2, rotation, bottom, top, LAYER_FORKLIFT, LAYER_CARGO),
+        OrientedBox(fork_x, fork_y, ROD_DISTANCE + 0.1, FORK_LENGTH/2, rotation, fork_z - 0.04, fork_z + 0.04, LAYER_FORKLIFT),
+    ]
+    if carried_cargo:
+        payload_x, payload_y, payload_z = physics_nodes["payload"].world_point()
+        sx, sy, sz = carried_cargo["size"]
+        boxes.append(OrientedBox(payload_x, payload_y, sx/2, sy/2, rotation, payload_z, payload_z + sz, LAYER_FORKLIFT))
+    return boxes
+
+def stop_lift():
+    global lift_move
+    lift_move = None
+    lift.stop()
+
+def resolve_collisions(previous_position, previous_rotation, previous_fork_height):
+    # Push the forklift out of anything it has driven into; if it can't be
+    # pushed clear (e.g. turning the fork into a shelf), undo the move
+    global rotation, fork_height
+    key = ("forklift", FORKLIFT_ID)
+    collision_world.set_body(key, forklift_boxes())
+    collision_world.update()
+    for other in list(released_cargo):
+        if not collision_world.touching(key, other):
+            released_cargo.discard(other)
+    dx, dy, clear = collision_world.resolve(key, released_cargo)
+    if clear:
+        position[0] += float(dx)
+        position[1] += float(dy)
+    else:
+        position[:] = previous_position
+        rotation, fork_height = previous_rotation, previous_fork_height
+        stop_lift()
+
+# --- AUTONOMOUS MODE ---
+def build_occupancy_grid():
+    occupancy_grid.clear_static()
+    for x, y, sx, sy in WALL_BOXES:
+        occupancy_grid.add_static_box(x, y, sx, sy)
+    for x, y, _ in SHELF_POSITIONS:
+        occupancy_grid.add_static_box(x, y, SHELF_WIDTH, SHELF_DEPTH)
+
+def sync_cargo_obstacles():
+    for cargo in cargo_objects:
+        key = ("cargo", cargo["id"])
+        if cargo["carried"]:
+            occupancy_grid.remove_dynamic(key)
+        else:
+            occupancy_grid.set_dynamic(key, cargo["position"][0], cargo["position"][1], cargo["size"][0], cargo["size"][1])
+
+def pending_cargo():
+    return [cargo for cargo in cargo_objects
+            if not cargo["carried"] and not zone_at(cargo["position"][0], cargo["position"][1])]
+
+def zone_occupied(zone):
+    return any(not cargo["carried"] and zone_at(cargo["position"][0], cargo["position"][1]) is zone
+               for cargo in cargo_objects)
+
+def pickup_position(cargo):
+    # Chassis position that puts the fork tip over the cargo at the current heading.
+    # The autopilot never turns, so this stays valid for the whole approach.
+    tip = fork_tip_position()
+    return cargo["position"][0] - (tip[0] - position[0]), cargo["position"][1] - (tip[1] - position[1])
+
+def pickup_fork_height(cargo):
+    # Fork height that brings the tip just above the top of the cargo
+    # The carriage only slides up the mast, so the tip at the bottom is
+    # the current tip lowered by the carriage's travel
+    lowest = fork_tip_position()[2] - (carriage_height(fork_height) - carriage_height(min_fork_height))
+    top = cargo["position"][2] + cargo["size"][2] + AUTOPILOT_PICKUP_CLEARANCE
+    height = min_fork_height + (top - lowest) / LIFT_TRAVEL * (max_fork_height - min_fork_height)
+    return max(min_fork_height, min(height, max_fork_height))
+
+def zone_field(i):
+    # Goal cells sit a little inside the zone so check_drop sees the chassis in it
+    zone = destination_zones[i]
+    return planner.region_field(("zone", i), zone["position"][0], zone["position"][1],
+                                zone["size"][0] - 0.2, zone["size"][1] - 0.2)
+
+def sync_jobs():
+    # Pending cargo becomes a dispatcher job; anything picked, delivered or
+    # skipped since the last task is dropped
+    pending = {cargo["id"]: cargo for cargo in pending_cargo() if cargo["id"] not in autopilot["skipped"]}
+    for job_id in list(dispatcher.jobs):
+        if job_id not in pending:
+            dispatcher.remove_job(job_id)
+    for job_id, cargo in pending.items():
+        if job_id not in dispatcher.jobs:
+            x, y = pickup_position(cargo)
+            dispatcher.add_job(job_id, x, y)
+
+def prepare_distance_fields():
+    global dispatcher
+    started = time.perf_counter()
+    dispatcher = Dispatcher(planner, [zone_field(i) for i in range(len(destination_zones))], speed=linear_speed)
+    sync_jobs()
+    return time.perf_counter() - started
+
+def toggle_autopilot():
+    autopilot.update(active=not autopilot["active"], task=None, cargo=None, path=[], fork_target=None, skipped=set())
+    if autopilot["active"]:
+        build_time = prepare_distance_fields()
+        print(f"Autonomous mode on (distance fields ready in {build_time * 1000:.0f} ms)")
+    else:
+        print("Autonomous mode off")
+
+def stop_autopilot(reason):
+    global fork_command, lift_move
+    print(f"Autonomous mode off: {reason}")
+    autopilot.update(active=False, task=None, cargo=None, path=[], fork_target=None)
+    fork_command = 0
+    lift_move = None  # The jog ramps down from wherever the move was
+
+def plan_next_task():
+    sync_cargo_obstacles()
+    if carried_cargo:
+        # Deliver to the nearest zone, empty ones first; try the next if one is full
+        task, cargo, fork_target = "deliver", carried_cargo, None
+        path = None
+        zones = sorted((zone_occupied(zone), planner.distance(zone_field(i), position[0], position[1]), i)
+                       for i, zone in enumerate(destination_zones))
+        for _, distance, i in zones:
+            if math.isfinite(distance):
+                path = planner.plan(position, zone_field(i))
+                if path is not None:
+                    break
+    else:
+        sync_jobs()
+        dispatcher.release(FORKLIFT_ID)
+        assignment = dispatcher.dispatch([(FORKLIFT_ID, position[0], position[1], 0.0)])
+        if not assignment:
+            stop_autopilot("no cargo left to pick up")
+            return
+        job_id = assignment[FORKLIFT_ID]
+        cargo = next(cargo for cargo in cargo_objects if cargo["id"] == job_id)
+        path = planner.plan(position, dispatcher.fields[job_id], dispatcher.jobs[job_id], ignore=[("cargo", job_id)])
+        task, fork_target = "pickup", pickup_fork_height(cargo)
+
+    if path is None:
+        stop_autopilot(f"no path to {task} cargo {cargo['id']}")
+        return
+    autopilot.update(task=task, cargo=cargo, path=path, fork_target=fork_target)
+    print(f"Planned {task} of cargo {cargo['id']}: {len(path)} waypoints in {planner.plan_time * 1000:.2f} ms")
+
+def update_autopilot(dt):
+    if autopilot["task"] is None:
+        plan_next_task()
+        if not autopilot["active"]:
+            return
+    
+    # Drive straight at the next waypoint; the mecanum wheels translate without turning
+    path = autopilot["path"]
+    if path:
+        target_x, target_y = path[0]
+        dx, dy = target_x - position[0], target_y - position[1]
+        distance = math.hypot(dx, dy)
+        step = linear_speed * dt
+        if distance <= step:
+            position[0], position[1] = target_x, target_y
+            path.pop(0)
+        else:
+            position[0] += dx / distance * step
+            position[1] += dy / distance * step
+    
+    # Set the fork on the way
+    target = autopilot["fork_target"]
+    if target is not None and lift_move is None and abs(target - fork_height) > LIFT_TOLERANCE:
+        start_lift_move(target)
+    if path or lift_move is not None:
+        return
+    
+    if autopilot["task"] == "pickup":
         check_pickup()
-    if keys[K_d]:
+        if not carried_cargo:
+            # Out of the fork's reach, e.g. too low to get under
+            print(f"Could not pick up cargo {autopilot['cargo']['id']}, skipping it")
+            autopilot["skipped"].add(autopilot["cargo"]["id"])
+    else:
         check_drop()
+        if carried_cargo:
+            stop_autopilot(f"could not drop cargo {carried_cargo['id']}")
+            return
+    autopilot["task"] = None
+
+def draw_planned_path():
+    if not autopilot["active"] or not autopilot["path"]:
+        return
+    glDisable(GL_LIGHTING)
+    glColor3f(0.0, 1.0, 1.0)
+    glLineWidth(2.0)
+    glBegin(GL_LINE_STRIP)
+    glVertex3f(render_position[0], render_position[1], 0.08)
+    for x, y in autopilot["path"]:
+        glVertex3f(x, y, 0.08)
+    glEnd()
+    glLineWidth(1.0)
+    glEnable(GL_LIGHTING)
+
+def start_lift_move(target):
+    global lift_move
+    profile = lift_profile((target - fork_height) / LIFT_PERCENT_PER_METRE, load_weight, lift.max_speed)
+    lift_move = (fork_height, profile, 0.0)
+
+def move_lift(dt):
+    # Follow the planned move if there is one, otherwise jog on fork_command
+    global fork_height, lift_move
+    if lift_move is not None:
+        start, profile, elapsed = lift_move
+        elapsed += dt
+        offset, lift.velocity, lift.acceleration = profile.sample(elapsed)
+        fork_height = start + offset * LIFT_PERCENT_PER_METRE
+        lift_move = None if elapsed >= profile.duration else (start, profile, elapsed)
+    else:
+        direction = lift.velocity or fork_command
+        room = (max_fork_height - fork_height) if direction > 0 else (fork_height - min_fork_height)
+        fork_height += lift.update(fork_command, dt, load_weight, room / LIFT_PERCENT_PER_METRE) * dt * LIFT_PERCENT_PER_METRE
+    fork_height = max(min_fork_height, min(fork_height, max_fork_height))
+
+def update_wheels(previous_position, previous_rotation, dt):
+    global chassis_speed
+    
+    # Wheel speeds from how the chassis actually moved this step, after collisions
+    vx, vy, omega = chassis_velocity(previous_position, previous_rotation, position, rotation, dt).tolist()
+    wheel_speeds[:] = drive.wheel_speeds_scalar(vx, vy, omega)
+    chassis_speed = math.hypot(vx, vy)
+    for i, speed in enumerate(wheel_speeds):
+        wheel_spin[i] = (wheel_spin[i] + math.degrees(speed * dt) * MOTOR_DIRECTIONS[i]) % 360
+
+def handle_input(dt):
+    global position, rotation, fork_height, fork_command
+    
+    previous_position, previous_rotation, previous_fork_height = position.copy(), rotation, fork_height
+    if autopilot["active"]:
+        fork_command = 0
+        update_autopilot(dt)
+    else:
+        keys = pygame.key.get_pressed()
+        
+        # Movement controls
+        step = linear_speed * dt
+        if keys[K_UP]:
+            position[0] += math.sin(math.radians(rotation)) * step
+            position[1] -= math.cos(math.radians(rotation)) * step
+        if keys[K_DOWN]:
+            position[0] -= math.sin(math.radians(rotation)) * step
+            position[1] += math.cos(math.radians(rotation)) * step
+        if keys[K_LEFT]:
+            rotation += angular_speed * dt
+        if keys[K_RIGHT]:
+            rotation -= angular_speed * dt
+        
+        # Fork controls
+        fork_command = 0
+        if keys[K_r] and fork_height < max_fork_height:
+            fork_command = 1
+        elif keys[K_f] and fork_height > min_fork_height:
+            fork_command = -1
+        
+        # Cargo controls
+        if keys[K_SPACE]:
+            check_pickup()
+        if keys[K_d]:
+            check_drop()
+    
+    move_lift(dt)
+    resolve_collisions(previous_position, previous_rotation, previous_fork_height)
+    update_wheels(previous_position, previous_rotation, dt)
+
+def snapshot_state():
+    return (position.copy(), rotation, fork_height, screw_rotation.copy(), wheel_spin.copy())
+
+def interpolate_render_state(previous, alpha):
+    global render_rotation, render_fork_height
+    previous_position, previous_rotation, previous_fork_height, previous_screw_rotation, previous_wheel_spin = previous
+    render_position[:] = lerp_list(previous_position, position, alpha)
+    render_rotation = lerp(previous_rotation, rotation, alpha)
+    render_fork_height = lerp(previous_fork_height, fork_height, alpha)
+    render_screw_rotation[:] = [lerp_angle(a, b, alpha) for a, b in zip(previous_screw_rotation, screw_rotation)]
+    render_wheel_spin[:] = [lerp_angle(a, b, alpha) for a, b in zip(previous_wheel_spin, wheel_spin)]
 
 def setup_lighting():
     glEnable(GL_LIGHTING)
@@ -698,7 +1117,7 @@ def setup_lighting():
     glEnable(GL_NORMALIZE)
 
 def main():
-    global position, rotation, wheel_steering, fork_height
+    global position, rotation, fork_height, graph_span
     
     pygame.init()
     pygame.display.set_mode((WIDTH, HEIGHT), DOUBLEBUF|OPENGL)
@@ -714,6 +1133,9 @@ def main():
     
     # Initialize fork height
     fork_height = min_fork_height
+    previous_state = snapshot_state()
+    build_occupancy_grid()
+    build_collision_world()
     
     # Camera follow variables
     camera_distance = 15
@@ -724,18 +1146,29 @@ def main():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
+            elif event.type == KEYDOWN and event.key == K_m:
+                toggle_autopilot()
+            elif event.type == KEYDOWN and event.key in (K_PAGEUP, K_PAGEDOWN):
+                steps = 1 if event.key == K_PAGEUP else -1
+                graph_span = zoom_span(graph_span, steps, max(loadcell_store.history, MAX_DATA_POINTS))
         
-        handle_input()
-        update_physics()
+        # Run physics in fixed steps, then draw in between the last two states
+        for dt in physics_clock.steps(clock.get_time() / 1000.0):
+            previous_state = snapshot_state()
+            handle_input(dt)
+            update_physics(dt)
+        interpolate_render_state(previous_state, physics_clock.alpha)
+        lod_selector.detail_scale = quality.level["lod_scale"]
         
         # Camera follow
         glLoadIdentity()
-        camera_x = position[0] - math.sin(math.radians(rotation)) * camera_distance
-        camera_y = position[1] + math.cos(math.radians(rotation)) * camera_distance
-        camera_z = position[2] + camera_height
+        camera_x = render_position[0] - math.sin(math.radians(render_rotation)) * camera_distance
+        camera_y = render_position[1] + math.cos(math.radians(render_rotation)) * camera_distance
+        camera_z = render_position[2] + camera_height
+        camera_position[:] = [camera_x, camera_y, camera_z]
         gluLookAt(
             camera_x, camera_y, camera_z,  # Camera position
-            position[0], position[1], position[2],  # Look at point
+            render_position[0], render_position[1], render_position[2],  # Look at point
             0, 0, 1  # Up vector
         )
         
@@ -748,13 +1181,25 @@ def main():
         create_shelves()
         create_destination_zones()
         create_cargo()
+        draw_planned_path()
         draw_forklift()
         
         # UI elements
         draw_loadcell_graph()
         display_text(f"Position: X={position[0]:.1f}, Y={position[1]:.1f}", 10, 10)
         display_text(f"Rotation: {rotation:.1f}°", 10, 30)
-        display_text(f"Fork Height: {fork_height}%", 10, 50)
-        display_text(f"Current Load: {load_weight} kg", 10, 70)
-        display_text(f"Vibration: {'ON' if is_vibrating else 'OFF'} (Amp: {vibration_amplitude:.3f})", 10, 90)
-        display_text("Controls: Arrows=Move, R/F=Raise/Lower Fork, Space=Pickup, D=Drop", 10, HEIGHT-30)
+        display_text(f"Fork Height: {fork_height:.1f}%", 10, 50)
+        display_text(f"Current Load: {load_weight} kg (estimated {float(load_estimator.mass):.2f} "
+                     f"+- {float(load_estimator.std):.2f} kg)", 10, 70)
+        display_text(f"Vibration: {'ON' if is_vibrating else 'OFF'} (Amp: {vibration_amplitude * 1000:.2f} mm)", 10, 90)
+        display_text(f"Quality: {quality.level['name']} ({clock.get_fps():.0f} FPS, target {FPS})", 10, 110)
+        display_text(f"Mode: {'Autonomous (' + str(autopilot['task']) + ')' if autopilot['active'] else 'Manual'}", 10, 130)
+        motors = drive.motor_values(wheel_speeds)
+        display_text("Wheels: " + "  ".join(f"{speed:+.1f} rad/s ({value:+.0%})" for speed, value in zip(wheel_speeds, motors)), 10, 150)
+        display_text("Expected resonance: {:.1f} Hz (damping {:.1%})".format(
+            *resonance.fundamental(load_weight, (fork_height - min_fork_height) / LIFT_PERCENT_PER_METRE)), 10, 170)
+        display_text("Controls: Arrows=Move, R/F=Raise/Lower Fork, Space=Pickup, D=Drop, M=Autonomous, PgUp/PgDn=Graph Zoom", 10, HEIGHT-30)
+        
+        pygame.display.flip()
+        clock.tick(FPS)
+        quality.update(clock.get_rawtime() / 1000.0, clock.get_time() / 1000.0)
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+# --- PARAMETERS ---
+MAX_LAG_FRAMES = 3  # Beyond this many late frames, resync instead of rushing to catch up
+
+# --- SCHEDULER ---
+class FrameScheduler:
+    # Paces an async main loop against a monotonic deadline. The time left
+    # before the next deadline is spent in asyncio.sleep so other coroutines
+    # (telemetry, network, analysis) get predictable slots; a late frame still
+    # yields once so those tasks are never starved.
+    #
+    # With paced=False (Emscripten) the browser's animation frame drives the
+    # loop, so the scheduler only yields and keeps the statistics.
+    def __init__(self, fps=60, paced=True, max_lag_frames=MAX_LAG_FRAMES):
+        self.period = 1.0 / fps
+        self.paced = paced
+        self.max_lag_frames = max_lag_frames
+        self.deadline = None
+        self.last_frame = None
+        self.frame_time = self.period  # Wall time between the last two frames
+        self.frames = 0
+        self.overruns = 0
+        self.last_overrun = 0.0  # Seconds the most recent late frame missed its deadline by
+
+    async def next_frame(self):
+        now = time.monotonic()
+        if self.deadline is None:
+            self.deadline = now + self.period
+
+        slack = self.deadline - now
+        if slack < 0:
+            self.overruns += 1
+            self.last_overrun = -slack
+        if self.paced and slack > 0:
+            await asyncio.sleep(slack)
+        else:
+            await asyncio.sleep(0)
+
+        now = time.monotonic()
+        self.deadline += self.period
+        if now - self.deadline > self.period * self.max_lag_frames:
+            self.deadline = now + self.period
+        if self.last_frame is not None:
+            self.frame_time = now - self.last_frame
+        self.last_frame = now
+        self.frames += 1
+        return self.frame_time
+
+    @property
+    def fps(self):
+        return 1.0 / self.frame_time if self.frame_time > 0 else 0.0
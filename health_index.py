@@ -0,0 +1,199 @@
+import os
+import time
+import numpy as np
+from load_classifier import window_features, CLASS_LOADS, SAMPLE_RATE, WINDOW
+from sample_store import GAP_FACTOR
+
+# --- PARAMETERS ---
+HEIGHT_BANDS = (0.0, 0.35, 0.7, 1.0)  # m, lower edges of the fork-height bands baselines are kept for
+BASELINE_WINDOWS = 200      # Windows a (load class, height band) baseline learns from before it starts scoring
+MIN_SPREAD = 0.05           # Floor on a feature's spread, as a fraction of its baseline mean (or 1e-12)
+ALERT_INDEX = 1.0           # Health index that calls for maintenance: features a baseline spread off on average
+TREND_HALF_LIFE = 20        # Sessions after which a trend point counts half in the fit
+TREND_LENGTH = 1000         # Trend points kept on disk for plotting; the fit itself keeps only sums
+HEALTH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "health")
+FEATURES = window_features(np.zeros(WINDOW)).shape[-1]
+
+# --- MONITOR ---
+class HealthMonitor:
+    # Health of one truck from its vibration. Baselines of the window
+    # features are kept per load class and fork-height band as running
+    # mean and M2 (Welford), so each window costs the same whatever the
+    # history. A cell learns from its first BASELINE_WINDOWS windows
+    # (the truck is taken to be healthy then) and scores afterwards. Each
+    # window's features become z-scores against the baseline; a session
+    # keeps their running mean, and its index is the RMS of that mean, so
+    # window-to-window noise averages out and a healthy truck scores near
+    # zero while a shifted feature stands out. Session indices form the trend,
+    # fitted as an exponentially weighted line from five running sums, so
+    # time to ALERT_INDEX is a constant-time projection too.
+    def __init__(self, truck, directory=HEALTH_DIR):
+        self.truck = truck
+        self.directory = directory
+        shape = (len(CLASS_LOADS), len(HEIGHT_BANDS))
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape + (FEATURES,))
+        self.m2 = np.zeros(shape + (FEATURES,))
+        self.trend = np.zeros((0, 2))     # (time, index) per session
+        self.origin = None                # Time of the first trend point; fit times are relative to it
+        self.sums = np.zeros(5)           # Decayed sums of w, w*t, w*y, w*t*t, w*t*y
+        self.pending = []
+        self.pending_height = 0.0
+        self.pending_time = None          # Timestamp of the last pending sample
+        self.session_windows = 0
+        self.session_z = np.zeros(FEATURES)  # Running mean of the session's z-scores
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f"{self.truck}.npz")
+
+    def cell(self, load_weight, height):
+        load_class = int(np.argmin(np.abs(np.array(CLASS_LOADS) - load_weight)))
+        band = max(int(np.searchsorted(HEIGHT_BANDS, height, side="right")) - 1, 0)
+        return load_class, band
+
+    def add_window(self, features, load_weight, height):
+        # One window's features; returns their RMS z-score, or None while the cell is still baselining
+        cell = self.cell(load_weight, height)
+        if self.count[cell] < BASELINE_WINDOWS:
+            self.count[cell] += 1
+            delta = features - self.mean[cell]
+            self.mean[cell] += delta / self.count[cell]
+            self.m2[cell] += delta * (features - self.mean[cell])
+            return None
+        spread = np.sqrt(self.m2[cell] / (self.count[cell] - 1))
+        spread = np.maximum(spread, np.maximum(MIN_SPREAD * np.abs(self.mean[cell]), 1e-12))
+        z = (features - self.mean[cell]) / spread
+        self.session_windows += 1
+        self.session_z += (z - self.session_z) / self.session_windows
+        return float(np.sqrt(np.mean(z * z)))
+
+    def push(self, sample, load_weight, height, timestamp=None):
+        # One vibration sample; every WINDOW samples the window is scored
+        # (returns its RMS z-score) or learned from. With timestamps, a
+        # jump of more than GAP_FACTOR sample periods drops the part-filled
+        # window, so no window's spectrum spans a gap, as in segment_spectrum.
+        if timestamp is not None:
+            if self.pending_time is not None and timestamp - self.pending_time > GAP_FACTOR / SAMPLE_RATE:
+                self.pending.clear()
+                self.pending_height = 0.0
+            self.pending_time = timestamp
+        self.pending.append(sample)
+        self.pending_height += height
+        if len(self.pending) < WINDOW:
+            return None
+        index = self.add_window(window_features(self.pending), load_weight, self.pending_height / WINDOW)
+        self.pending.clear()
+        self.pending_height = 0.0
+        return index
+
+    def end_session(self, timestamp=None):
+        # Close the session: its index joins the trend and everything is
+        # saved. Returns the index, or None if no window was scored.
+        self.pending.clear()
+        self.pending_height = 0.0
+        self.pending_time = None
+        if not self.session_windows:
+            self.save()
+            return None
+        index = float(np.sqrt(np.mean(self.session_z**2)))
+        timestamp = time.time() if timestamp is None else timestamp
+        if self.origin is None:
+            self.origin = timestamp
+        t = timestamp - self.origin
+        decay = 0.5**(1.0 / TREND_HALF_LIFE)
+        self.sums = decay * self.sums + np.array([1.0, t, index, t * t, t * index])
+        self.trend = np.concatenate([self.trend, [[timestamp, index]]])[-TREND_LENGTH:]
+        self.session_windows = 0
+        self.session_z[:] = 0.0
+        self.save()
+        return index
+
+    def trend_line(self):
+        # (slope per second, index now) of the weighted fit, or None with under two sessions
+        w, wt, wy, wtt, wty = self.sums.tolist()
+        determinant = w * wtt - wt * wt
+        if len(self.trend) < 2 or determinant <= 1e-12 * max(w * wtt, 1e-300):
+            return None
+        slope = (w * wty - wt * wy) / determinant
+        intercept = (wy - slope * wt) / w
+        return slope, intercept + slope * (self.trend[-1, 0] - self.origin)
+
+    def time_to_threshold(self, threshold=ALERT_INDEX):
+        # Seconds from the last session until the trend reaches threshold;
+        # 0 once it has, None if the trend isn't rising (or is unknown)
+        line = self.trend_line()
+        if line is None:
+            return None
+        slope, now = line
+        if now >= threshold:
+            return 0.0
+        if slope <= 0:
+            return None
+        return (threshold - now) / slope
+
+    @property
+    def latest(self):
+        return float(self.trend[-1, 1]) if len(self.trend) else None
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        np.savez_compressed(self.path, count=self.count, mean=self.mean, m2=self.m2, trend=self.trend,
+                            sums=self.sums, origin=np.nan if self.origin is None else self.origin,
+                            bands=np.array(HEIGHT_BANDS), loads=np.array(CLASS_LOADS))
+
+    @classmethod
+    def load(cls, truck, directory=HEALTH_DIR):
+        # The truck's saved baselines and trend, or a fresh monitor if there
+        # are none (or they were kept for different classes or bands)
+        monitor = cls(truck, directory)
+        try:
+            with np.load(monitor.path) as data:
+                if (np.array_equal(data["bands"], HEIGHT_BANDS) and np.array_equal(data["loads"], CLASS_LOADS)
+                        and data["mean"].shape == monitor.mean.shape):
+                    monitor.count = data["count"]
+                    monitor.mean = data["mean"]
+                    monitor.m2 = data["m2"]
+                    monitor.trend = data["trend"]
+                    monitor.sums = data["sums"]
+                    monitor.origin = None if np.isnan(data["origin"]) else float(data["origin"])
+        except (OSError, KeyError, ValueError):
+            pass
+        return monitor
+
+if __name__ == "__main__":
+    import tempfile
+    from fork_dynamics import simulate, FLOOR_ROUGHNESS
+
+    # A truck's daily sessions: 60 s of travel with 5 kg at mid height. A
+    # roller starts to wear on day 30 and knocks a little harder each day
+    # at 38 Hz; the alert level is crossed some time later
+    rng = np.random.default_rng(13)
+    dt = 1 / 120
+    t = np.arange(int(60 / dt)) * dt
+    day = 86400.0
+    directory = tempfile.mkdtemp()
+    monitor = HealthMonitor("demo", directory)
+    window_time = 0.0
+    windows = 0
+    crossed = None
+    for session in range(90):
+        wear = 0.002 * max(session - 30, 0)**2
+        acceleration = FLOOR_ROUGHNESS * rng.standard_normal(len(t)) + wear * np.sin(2 * np.pi * 38 * t)
+        vibration = simulate(acceleration[:, None], dt, 5.0, 0.5)[:, 0]
+        started = time.perf_counter()
+        for value in vibration.tolist():
+            monitor.push(value, 5.0, 0.5)
+        window_time += time.perf_counter() - started
+        windows += len(t) // WINDOW
+        index = monitor.end_session(session * day)
+        if index is not None and index >= ALERT_INDEX and crossed is None:
+            crossed = session
+        if session in (10, 40, 50, 60, 70):
+            remaining = monitor.time_to_threshold()
+            projection = "not rising" if remaining is None else f"alert in {remaining / day:.1f} days"
+            print(f"Day {session}: wear {wear:.3f} m/s^2, health index {index:.2f}, {projection}")
+    print(f"Alert level {ALERT_INDEX} first crossed on day {crossed}")
+    monitor = HealthMonitor.load("demo", directory)
+    print(f"{windows} windows in {window_time:.2f} s ({window_time / windows * 1e6:.0f} us per window, features "
+          f"included); store {os.path.getsize(monitor.path) / 1024:.1f} KB with {len(monitor.trend)} trend points")
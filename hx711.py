@@ -0,0 +1,179 @@
+import time
+import numpy as np
+from load_estimator import READING_SCALE
+
+# --- PARAMETERS ---
+ADC_BITS = 24               # HX711 resolution: two's complement counts
+COUNT_MIN = -(1 << (ADC_BITS - 1))
+COUNT_MAX = (1 << (ADC_BITS - 1)) - 1
+SIM_COUNTS_PER_KG = 90000   # 20 kg, 1 mV/V bar cell at 4.3 V excitation and gain 128
+SIM_OFFSET = 84000          # Counts with nothing on the forks (bridge imbalance), removed by the tare
+SAMPLE_RATE = 120.0         # Hz, one reading per physics step
+RECORD_SECONDS = 3600       # Longest recording kept; the oldest quarter is dropped past it
+INITIAL_SAMPLES = 1 << 12   # Samples per channel allocated up front; doubled as needed
+
+# --- CONVERTER ---
+class HX711:
+    # One HX711 channel: engineering units <-> raw counts, with the
+    # calibration a scale and tare give, units = (counts - offset) * scale.
+    # counts() rounds and clips to the 24-bit range as the chip does, so
+    # the simulators produce exactly what a real cell would log.
+    def __init__(self, scale, offset=0):
+        self.scale = float(scale)   # Units per count
+        self.offset = int(offset)   # Counts at zero
+
+    @classmethod
+    def calibrate(cls, zero_counts, known_counts, known_value):
+        # Two-point calibration: mean counts empty and with a known load on
+        zero = float(np.mean(zero_counts))
+        return cls(known_value / (float(np.mean(known_counts)) - zero), round(zero))
+
+    def counts(self, value):
+        # Units -> counts; an int for a scalar, int32 array otherwise
+        if isinstance(value, float):
+            return min(max(round(value / self.scale) + self.offset, COUNT_MIN), COUNT_MAX)
+        counts = np.clip(np.rint(np.asarray(value, dtype=float) / self.scale) + self.offset, COUNT_MIN, COUNT_MAX)
+        return int(counts) if counts.ndim == 0 else counts.astype(np.int32)
+
+    def units(self, counts):
+        if isinstance(counts, int):
+            return (counts - self.offset) * self.scale
+        return (np.asarray(counts, dtype=float) - self.offset) * self.scale
+
+def simulated_loadcell():
+    # The converter the simulators read their load cell through
+    return HX711(READING_SCALE / SIM_COUNTS_PER_KG, SIM_OFFSET)
+
+# --- STORE ---
+class CountStore:
+    # Fixed-rate recording of raw counts, one packed integer column per
+    # channel, so time is implicit (start + index / rate) and a sample
+    # costs 4 bytes (int32, all 24 bits) or 2 (int16, the top 16 bits,
+    # a step of 256 counts). Calibration is kept per channel and applied
+    # on read only; nothing is converted to floats while recording.
+    def __init__(self, channels, converters, dtype=np.int32, rate=SAMPLE_RATE, max_samples=int(RECORD_SECONDS * SAMPLE_RATE)):
+        self.channels = {name: i for i, name in enumerate(channels)}
+        self.scale = np.array([converter.scale for converter in converters])
+        self.offset = np.array([converter.offset for converter in converters], dtype=np.int64)
+        self.dtype = np.dtype(dtype)
+        self.shift = max(ADC_BITS - 8 * self.dtype.itemsize, 0)
+        self.rate = rate
+        self.start = 0.0            # Time of the first sample kept
+        self.max_samples = max_samples
+        self.samples = 0
+        self.data = np.zeros((len(self.channels), min(INITIAL_SAMPLES, max_samples)), dtype=self.dtype)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def _make_room(self, count):
+        needed = self.samples + count
+        if needed <= self.data.shape[1]:
+            return
+        if needed > self.max_samples:
+            drop = min(max(needed - self.max_samples, self.max_samples // 4), self.samples)
+            self.data[:, :self.samples - drop] = self.data[:, drop:self.samples]
+            self.samples -= drop
+            self.start += drop / self.rate
+            needed = self.samples + count
+        if needed > self.data.shape[1]:
+            grown = np.zeros((len(self.channels), min(max(2 * self.data.shape[1], needed), self.max_samples)), dtype=self.dtype)
+            grown[:, :self.samples] = self.data[:, :self.samples]
+            self.data = grown
+
+    def _pack(self, counts):
+        if not self.shift:
+            return counts
+        info = np.iinfo(self.dtype)
+        return np.clip((np.asarray(counts, dtype=np.int64) + (1 << (self.shift - 1))) >> self.shift, info.min, info.max)
+
+    def append(self, *counts):
+        # One sample of counts per channel, in channel order
+        self._make_room(1)
+        self.data[:, self.samples] = self._pack(counts)
+        self.samples += 1
+
+    def extend(self, counts):
+        # (channels, samples) of counts at once
+        counts = np.asarray(counts)[:, -self.max_samples:]
+        self._make_room(counts.shape[1])
+        self.data[:, self.samples:self.samples + counts.shape[1]] = self._pack(counts)
+        self.samples += counts.shape[1]
+
+    def counts(self, channel, start=None, stop=None):
+        # Raw counts (int64, unpacked) of one channel, samples [start, stop)
+        packed = self.data[self.channels[channel], :self.samples][start:stop]
+        return packed.astype(np.int64) << self.shift
+
+    def read(self, channel, start=None, stop=None):
+        # (times, values in units) of one channel, samples [start, stop)
+        i = self.channels[channel]
+        first, last, _ = slice(start, stop).indices(self.samples)
+        values = (self.counts(channel, start, stop) - self.offset[i]) * self.scale[i]
+        return self.start + np.arange(first, max(last, first)) / self.rate, values
+
+    def clear(self):
+        self.samples = 0
+        self.start = 0.0
+
+    def save(self, path):
+        np.savez(path, data=self.data[:, :self.samples], channels=np.array(list(self.channels)), scale=self.scale,
+                 offset=self.offset, shift=self.shift, rate=self.rate, start=self.start, max_samples=self.max_samples)
+
+    @classmethod
+    def load(cls, path):
+        # A saved recording, ready to append to with the limit it was made
+        # with (RECORD_SECONDS at its rate for files that didn't keep one)
+        with np.load(path) as data:
+            converters = [HX711(scale, offset) for scale, offset in zip(data["scale"].tolist(), data["offset"].tolist())]
+            rate = float(data["rate"])
+            max_samples = int(data["max_samples"]) if "max_samples" in data else int(RECORD_SECONDS * rate)
+            store = cls(data["channels"].tolist(), converters, data["data"].dtype, rate,
+                        max(max_samples, data["data"].shape[1]))
+            store.data = data["data"].copy()
+            store.samples = store.data.shape[1]
+            store.start = float(data["start"])
+        return store
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import tempfile
+    from fork_dynamics import load_reading
+
+    # An hour of one load cell at 120 Hz: 5 kg ringing at 5.5 Hz with the
+    # simulators' noise, as floats in a list and as counts
+    rng = np.random.default_rng(15)
+    steps = int(RECORD_SECONDS * SAMPLE_RATE)
+    t = np.arange(steps) / SAMPLE_RATE
+    values = load_reading(5.0, 5.0 * 0.5 * np.sin(2 * np.pi * 5.5 * t)) + rng.uniform(-0.05, 0.05, steps)
+    as_list = values.tolist()
+    list_bytes = sys.getsizeof(as_list) + sum(sys.getsizeof(value) for value in as_list)
+    print(f"{RECORD_SECONDS / 3600:.0f} h at {SAMPLE_RATE:.0f} Hz as a list of floats: {list_bytes / 2**20:.1f} MB")
+
+    adc = simulated_loadcell()
+    counts = adc.counts(values)
+    for dtype in [np.int32, np.int16]:
+        store = CountStore(["loadcell"], [adc], dtype)
+        store.extend(counts[None])
+        error = np.max(np.abs(store.read("loadcell")[1] - values)) / READING_SCALE
+        print(f"  {np.dtype(dtype).name:>5} counts: {store.nbytes / 2**20:.2f} MB, worst error {error * 1000:.3f} g")
+
+    store = CountStore(["loadcell"], [adc], max_samples=steps)
+    started = time.perf_counter()
+    for value in as_list[:120000]:
+        store.append(adc.counts(value))
+    elapsed = time.perf_counter() - started
+    print(f"Converted and recorded a physics step at a time: {elapsed / 120000 * 1e6:.1f} us per sample")
+    path = os.path.join(tempfile.mkdtemp(), "loadcell_counts.npz")
+    store.save(path)
+    loaded = CountStore.load(path)
+    print(f"Saved {os.path.getsize(path) / 2**20:.2f} MB, read back identical: "
+          f"{np.array_equal(loaded.read('loadcell')[1], store.read('loadcell')[1])}")
+
+    # A tare and a 2 kg reference weight give the calibration back from counts alone
+    empty = adc.counts(rng.uniform(-0.05, 0.05, 240))
+    known = adc.counts(load_reading(2.0, 0.0) + rng.uniform(-0.05, 0.05, 240))
+    fitted = HX711.calibrate(empty, known, load_reading(2.0, 0.0))
+    print(f"Two-point calibration: scale {fitted.scale / adc.scale:.4f}x the true one, tare off by {(fitted.offset - adc.offset) * adc.scale / READING_SCALE * 1000:+.0f} g")
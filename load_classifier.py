@@ -0,0 +1,238 @@
+import os
+import time
+from functools import lru_cache
+import numpy as np
+from motion_profile import CARRIAGE_MASS, LIFT_TRAVEL, MAX_LIFT_ACCELERATION
+from fork_dynamics import ForkDynamics, FLOOR_ROUGHNESS, load_reading
+
+# --- PARAMETERS ---
+LOAD_CLASSES = ["empty", "light", "medium", "heavy"]
+CLASS_LOADS = [0.0, 2.0, 5.0, 10.0]  # kg, as on code.py's keys 1-4
+SAMPLE_RATE = 120.0         # Hz, one load cell reading per physics step
+WINDOW = 32                 # Readings per classified window (0.27 s at 120 Hz)
+HOP = 16                    # New readings between classifications
+SPECTRUM_BANDS = 6          # Log-spaced band energies between MIN_FREQUENCY and Nyquist
+MIN_FREQUENCY = 1.0         # Hz; slower than this is the load, not vibration
+SESSIONS = 400              # Synthetic training sessions, spread evenly over the classes
+SESSION_SECONDS = 20.0
+SESSION_OFFSET = 0.1        # Load cell units of tare drift between sessions (1 kg), so the mean alone isn't enough
+TRAINING_STEPS = 300        # Gradient descent iterations
+LEARNING_RATE = 0.5
+MOMENTUM = 0.9
+REGULARISATION = 1e-3
+SEED = 12
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "load_classifier.npz")
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "load_features.npz")
+
+def feature_parameters(window=WINDOW, hop=HOP):
+    # Everything the cached features and the trained model depend on
+    return np.array([window, hop, SAMPLE_RATE, SPECTRUM_BANDS, MIN_FREQUENCY, SESSIONS, SESSION_SECONDS,
+                     SESSION_OFFSET, SEED, TRAINING_STEPS, CARRIAGE_MASS, FLOOR_ROUGHNESS, MAX_LIFT_ACCELERATION, LIFT_TRAVEL] + CLASS_LOADS)
+
+# --- FEATURES ---
+@lru_cache(maxsize=16)
+def band_edges(window, sample_rate=SAMPLE_RATE):
+    # (bin frequencies, Hann window, FFT bin index ranges of the log-spaced
+    # bands), worked out once per window length (don't modify)
+    freqs = np.fft.rfftfreq(window, 1.0 / sample_rate)
+    edges = np.geomspace(MIN_FREQUENCY, sample_rate / 2, SPECTRUM_BANDS + 1)
+    return freqs, np.hanning(window), np.searchsorted(freqs, edges)
+
+def window_features(windows, sample_rate=SAMPLE_RATE):
+    # Statistical and spectral features of (..., window) readings -> (..., features):
+    # mean, standard deviation, range, skewness, kurtosis, log energy per
+    # band, spectral centroid and dominant frequency. The frequency features
+    # see the fork's resonance, which drops as the load gets heavier.
+    windows = np.asarray(windows, dtype=float)
+    mean = windows.mean(axis=-1, keepdims=True)
+    centred = windows - mean
+    std = np.sqrt((centred**2).mean(axis=-1, keepdims=True))
+    safe = np.maximum(std, 1e-12)
+    skew = (centred**3).mean(axis=-1, keepdims=True) / safe**3
+    kurtosis = (centred**4).mean(axis=-1, keepdims=True) / safe**4
+    spread = windows.max(axis=-1, keepdims=True) - windows.min(axis=-1, keepdims=True)
+    freqs, hann, edges = band_edges(windows.shape[-1], sample_rate)
+    power = np.abs(np.fft.rfft(centred * hann, axis=-1))**2
+    cumulative = np.concatenate([np.zeros(power.shape[:-1] + (1,)), np.cumsum(power, axis=-1)], axis=-1)
+    bands = np.log10(cumulative[..., edges[1:]] - cumulative[..., edges[:-1]] + 1e-12)
+    vibration = power[..., edges[0]:]
+    total = np.maximum(vibration.sum(axis=-1, keepdims=True), 1e-30)
+    centroid = (vibration * freqs[edges[0]:]).sum(axis=-1, keepdims=True) / total
+    dominant = freqs[edges[0] + np.argmax(vibration, axis=-1)][..., None]
+    return np.concatenate([mean, std, spread, skew, kurtosis, bands, centroid, dominant], axis=-1)
+
+def sliding_windows(readings, window=WINDOW, hop=HOP):
+    # (..., samples) -> (..., windows, window), as views
+    view = np.lib.stride_tricks.sliding_window_view(np.asarray(readings, dtype=float), window, axis=-1)
+    return view[..., ::hop, :]
+
+# --- SYNTHETIC SESSIONS ---
+def synthetic_sessions(sessions=SESSIONS, seconds=SESSION_SECONDS, seed=SEED):
+    # (readings (sessions, samples), labels (sessions,)): load cell logs
+    # from the fork model, each session with its own load class, height,
+    # travel speed, lift jogs and tare drift, all run as one batch
+    rng = np.random.default_rng(seed)
+    steps = int(seconds * SAMPLE_RATE)
+    labels = np.arange(sessions) % len(LOAD_CLASSES)
+    loads = np.array(CLASS_LOADS)[labels]
+    heights = rng.uniform(0.0, LIFT_TRAVEL, sessions)
+    speeds = rng.uniform(0.0, 2.0, sessions)
+    offsets = rng.uniform(-SESSION_OFFSET, SESSION_OFFSET, sessions)
+    jogs = (rng.random((steps, sessions)) < 0.002) * rng.choice([-1.0, 1.0], (steps, sessions))
+    lift = MAX_LIFT_ACCELERATION * np.apply_along_axis(lambda jog: np.convolve(jog, np.ones(5))[:steps], 0, jogs)
+    fork = ForkDynamics((sessions,))
+    readings = np.empty((sessions, steps))
+    for i in range(steps):
+        fork.step(1.0 / SAMPLE_RATE, lift[i] + FLOOR_ROUGHNESS * speeds * rng.standard_normal(sessions), loads, heights)
+        readings[:, i] = load_reading(loads, fork.load_force(loads, heights))
+    readings += offsets[:, None] + rng.uniform(-0.05, 0.05, readings.shape)
+    return readings, labels
+
+def feature_cache(path=CACHE_PATH, window=WINDOW, hop=HOP):
+    # (features, labels, sessions) of every window of the synthetic
+    # sessions; read back from path when it was made with the same
+    # parameters, else extracted again and saved. sessions gives the
+    # session each window came from, for splitting without leakage.
+    parameters = feature_parameters(window, hop)
+    try:
+        with np.load(path) as data:
+            if np.array_equal(data["parameters"], parameters):
+                return data["features"], data["labels"], data["sessions"]
+    except (OSError, KeyError, ValueError):
+        pass
+    readings, labels = synthetic_sessions()
+    features = window_features(sliding_windows(readings, window, hop))
+    count = features.shape[1]
+    features = features.reshape(-1, features.shape[-1])
+    labels = np.repeat(labels, count)
+    sessions = np.repeat(np.arange(len(readings)), count)
+    try:
+        np.savez_compressed(path, features=features, labels=labels, sessions=sessions, parameters=parameters)
+    except OSError:
+        pass
+    return features, labels, sessions
+
+# --- CLASSIFIER ---
+class LoadClassifier:
+    # Softmax regression on standardised window features: one small matrix
+    # product per window, so inference cost is set by the features.
+    def __init__(self, weights, bias, mean, scale, window=WINDOW, hop=HOP):
+        self.weights = weights
+        self.bias = bias
+        self.mean = mean
+        self.scale = scale
+        self.window = window
+        self.hop = hop
+
+    @classmethod
+    def train(cls, features, labels, window=WINDOW, hop=HOP, steps=TRAINING_STEPS):
+        mean = features.mean(axis=0)
+        scale = features.std(axis=0) + 1e-12
+        x = (features - mean) / scale
+        target = np.eye(len(LOAD_CLASSES))[labels]
+        weights = np.zeros((x.shape[1], len(LOAD_CLASSES)))
+        bias = np.zeros(len(LOAD_CLASSES))
+        weights_step = np.zeros_like(weights)
+        bias_step = np.zeros_like(bias)
+        for _ in range(steps):
+            error = _softmax(x @ weights + bias) - target
+            weights_step = MOMENTUM * weights_step - LEARNING_RATE * (x.T @ error / len(x) + REGULARISATION * weights)
+            bias_step = MOMENTUM * bias_step - LEARNING_RATE * error.mean(axis=0)
+            weights += weights_step
+            bias += bias_step
+        return cls(weights, bias, mean, scale, window, hop)
+
+    def probabilities(self, features):
+        return _softmax(((features - self.mean) / self.scale) @ self.weights + self.bias)
+
+    def predict(self, features):
+        return np.argmax(self.probabilities(features), axis=-1)
+
+    def save(self, path=MODEL_PATH):
+        np.savez(path, weights=self.weights, bias=self.bias, mean=self.mean, scale=self.scale,
+                 parameters=feature_parameters(self.window, self.hop))
+
+def _softmax(logits):
+    exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+def load_model(path=MODEL_PATH, cache_path=CACHE_PATH):
+    # The classifier saved by `python load_classifier.py`. One that is
+    # missing or was trained with different parameters is trained again in
+    # memory from the feature cache at cache_path and the file left alone:
+    # only the script writes it.
+    try:
+        with np.load(path) as data:
+            if np.array_equal(data["parameters"], feature_parameters()):
+                return LoadClassifier(data["weights"], data["bias"], data["mean"], data["scale"])
+    except (OSError, KeyError, ValueError):
+        pass
+    print(f"Load classifier '{path}' is missing or out of date, training in memory; run `python load_classifier.py` to refresh it.")
+    features, labels, _ = feature_cache(cache_path)
+    return LoadClassifier.train(features, labels)
+
+# --- STREAM ---
+class LoadStateStream:
+    # Classifies a live load cell stream: readings are gathered until a
+    # window is full, then every hop readings the latest window is
+    # classified. label is None until the first window.
+    def __init__(self, model):
+        self.model = model
+        self.pending = []
+        self.label = None
+        self.confidence = 0.0
+
+    def push(self, samples):
+        # Scalar or array; returns the class name if a window was classified, else None
+        self.pending.extend(np.atleast_1d(samples).tolist())
+        if len(self.pending) < self.model.window:
+            return None
+        classified = None
+        while len(self.pending) >= self.model.window:
+            probabilities = self.model.probabilities(window_features(self.pending[:self.model.window]))
+            del self.pending[:self.model.hop]
+            classified = int(np.argmax(probabilities))
+        self.label = LOAD_CLASSES[classified]
+        self.confidence = float(probabilities[classified])
+        return self.label
+
+if __name__ == "__main__":
+    import tempfile
+
+    # The shipped model, trained on every synthetic session
+    features, labels, _ = feature_cache()
+    LoadClassifier.train(features, labels).save()
+    print(f"Load classifier '{MODEL_PATH}' has been trained.")
+
+    readings, labels = synthetic_sessions()
+    train = np.arange(len(readings)) // len(LOAD_CLASSES) % 4 != 3   # A quarter of each class held out
+    print(f"{len(readings)} sessions of {SESSION_SECONDS:.0f} s, {train.sum()} to train and {(~train).sum()} to test")
+    print("Window   fill time   accuracy   us per window")
+    for window in [16, 32, 64, 128, 256]:
+        hop = window // 2
+        features = window_features(sliding_windows(readings, window, hop))
+        count = features.shape[1]
+        model = LoadClassifier.train(features[train].reshape(-1, features.shape[-1]),
+                                     np.repeat(labels[train], count), window, hop)
+        predicted = model.predict(features[~train].reshape(-1, features.shape[-1]))
+        accuracy = np.mean(predicted == np.repeat(labels[~train], count))
+        stream = LoadStateStream(model)
+        samples = readings[~train][0].tolist()
+        started = time.perf_counter()
+        classified = sum(stream.push(value) is not None for value in samples)
+        elapsed = time.perf_counter() - started
+        print(f"{window:6d}   {window / SAMPLE_RATE:7.2f} s   {accuracy:8.1%}   {elapsed / classified * 1e6:13.0f}"
+              f"{'   (model default)' if window == WINDOW else ''}")
+
+    # Cold start timed in a scratch directory, so the shipped model and the
+    # feature cache next to it are left alone
+    with tempfile.TemporaryDirectory() as scratch:
+        model_path = os.path.join(scratch, "load_classifier.npz")
+        cache_path = os.path.join(scratch, "load_features.npz")
+        started = time.perf_counter()
+        load_model(model_path, cache_path)
+        first = time.perf_counter() - started
+        started = time.perf_counter()
+        feature_cache(cache_path)
+        cached = time.perf_counter() - started
+    print(f"Features extracted and model trained in {first:.2f} s; features read from the cache in {cached * 1000:.0f} ms")
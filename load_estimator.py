@@ -0,0 +1,119 @@
+import time
+import numpy as np
+from motion_profile import GRAVITY
+
+# --- PARAMETERS ---
+# The load cell reads the payload's weight plus the force it takes to
+# accelerate it with the fork, in the simulators' units (kg / 10):
+#   reading = mass * (1 + a / g) / 10 + noise
+# with a the fork's absolute vertical acceleration. With a known (an
+# accelerometer on the carriage, or the fork model), the reading is linear
+# in the mass, so a scalar Kalman filter on the mass is exact.
+READING_SCALE = 0.1          # Load cell units per kg at rest
+READING_NOISE = 0.1 / 12**0.5  # Standard deviation of the simulators' uniform +-0.05 noise
+INITIAL_MASS = 0.0           # kg guessed before any reading
+INITIAL_STD = 10.0           # kg of doubt in that guess; wide, so the first readings take over
+MASS_DRIFT = 0.01            # kg per sqrt(s) the payload may creep (shifting load, temperature)
+CHANGE_SIGMA = 4.0           # Innovation, in standard deviations, that looks like a new load
+CHANGE_SAMPLES = 6           # Consecutive such readings that restart the estimate
+
+# --- FILTER ---
+class LoadEstimator:
+    # Payload mass and its standard deviation (kg) for any number of load
+    # cells at once: every argument broadcasts against shape, as in
+    # ForkDynamics, so one instance can follow one forklift or a fleet.
+    # Picking up or dropping a load is a step the random walk would take
+    # far too long to follow, so a run of readings all well off the
+    # prediction resets the doubt and the filter converges again.
+    def __init__(self, shape=(), dt=1.0 / 120, drift=MASS_DRIFT, noise=READING_NOISE):
+        self.mass = np.full(shape, INITIAL_MASS)
+        self.variance = np.full(shape, INITIAL_STD**2)
+        self.process_variance = drift**2 * dt
+        self.measurement_variance = noise**2
+        self.surprises = np.zeros(shape, dtype=int)  # Consecutive readings past CHANGE_SIGMA
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    def update(self, reading, acceleration=0.0):
+        # One load cell reading per cell, with the fork's vertical
+        # acceleration (m/s^2, upward) at the same instant
+        h = READING_SCALE * (1.0 + np.asarray(acceleration, dtype=float) / GRAVITY)
+        variance = self.variance + self.process_variance
+        innovation = np.asarray(reading, dtype=float) - h * self.mass
+        spread = h * h * variance + self.measurement_variance
+        surprised = innovation * innovation > CHANGE_SIGMA**2 * spread
+        self.surprises = np.where(surprised, self.surprises + 1, 0)
+        restart = self.surprises >= CHANGE_SAMPLES
+        if restart.any():
+            variance = np.where(restart, INITIAL_STD**2, variance)
+            spread = h * h * variance + self.measurement_variance
+            self.surprises = np.where(restart, 0, self.surprises)
+        gain = h * variance / spread
+        self.mass = self.mass + gain * innovation
+        self.variance = (1.0 - gain * h) * variance
+        return self.mass
+
+    def reset(self):
+        self.mass[...] = INITIAL_MASS
+        self.variance[...] = INITIAL_STD**2
+        self.surprises[...] = 0
+
+def estimate_batch(readings, accelerations, dt=1.0 / 120, **options):
+    # readings and accelerations are (steps, *cells), e.g. a fleet's logs
+    # or one recording; returns mass and standard deviation at every step
+    readings = np.asarray(readings, dtype=float)
+    accelerations = np.broadcast_to(np.asarray(accelerations, dtype=float), readings.shape)
+    estimator = LoadEstimator(readings.shape[1:], dt, **options)
+    mass = np.empty(readings.shape)
+    std = np.empty(readings.shape)
+    for i in range(len(readings)):
+        mass[i] = estimator.update(readings[i], accelerations[i])
+        std[i] = estimator.std
+    return mass, std
+
+if __name__ == "__main__":
+    from fork_dynamics import ForkDynamics, FLOOR_ROUGHNESS, load_reading
+
+    # Ten seconds of travel over a rough floor at 2 m/s: the payload is
+    # picked up after 2 s, and the fork rings hard enough that readings
+    # taken as plain weight swing by kilograms
+    rng = np.random.default_rng(11)
+    dt = 1 / 120
+    steps = 1200
+    true_mass = np.where(np.arange(steps) < 240, 0.0, 5.0)
+    fork = ForkDynamics()
+    readings = np.empty(steps)
+    accelerations = np.empty(steps)
+    for i in range(steps):
+        fork.step(dt, 2 * FLOOR_ROUGHNESS * rng.standard_normal(), true_mass[i], 0.6)
+        accelerations[i] = float(fork.acceleration(true_mass[i], 0.6))
+        readings[i] = load_reading(true_mass[i], true_mass[i] * accelerations[i]) + rng.uniform(-0.05, 0.05)
+
+    mass, std = estimate_batch(readings, accelerations, dt)
+    ignored, _ = estimate_batch(readings, 0.0, dt)
+    settled = np.flatnonzero((np.abs(mass - 5.0) < 0.1) & (np.arange(steps) >= 240))[0]
+    print(f"Load placed at 2.00 s, estimate within 0.1 kg after {(settled - 240) * dt:.2f} s; "
+          f"final {mass[-1]:.3f} +- {std[-1]:.3f} kg")
+    print(f"Ignoring the fork's acceleration: worst error over the last 5 s {np.max(np.abs(ignored[600:] - 5.0)):.3f} kg, "
+          f"compensated {np.max(np.abs(mass[600:] - 5.0)):.3f} kg")
+
+    # A fleet of 1000 forklifts, each with its own payload, one minute of readings
+    cells = 1000
+    loads = rng.uniform(0, 12, cells)
+    acceleration = rng.normal(0, 1.0, (120 * 60, cells))
+    fleet = loads * (1 + acceleration / GRAVITY) / 10 + rng.uniform(-0.05, 0.05, acceleration.shape)
+    started = time.perf_counter()
+    mass, std = estimate_batch(fleet, acceleration, dt)
+    elapsed = time.perf_counter() - started
+    inside = np.mean(np.abs(mass[-1] - loads) < 2 * std[-1])
+    print(f"{cells} cells x {len(fleet)} readings in {elapsed:.2f} s ({elapsed / fleet.size * 1e9:.0f} ns per reading); "
+          f"RMS error {np.sqrt(np.mean((mass[-1] - loads)**2)):.4f} kg, {inside:.0%} within 2 std")
+
+    estimator = LoadEstimator()
+    started = time.perf_counter()
+    for reading, acceleration in zip(readings.tolist(), accelerations.tolist()):
+        estimator.update(reading, acceleration)
+    elapsed = time.perf_counter() - started
+    print(f"One reading per physics step: {elapsed / steps * 1e6:.1f} us per update")
@@ -0,0 +1,71 @@
+import math
+
+# --- PARAMETERS ---
+FOV_Y = 45             # Vertical field of view used by gluPerspective in the simulators
+VIEWPORT_HEIGHT = 768
+LOD_HYSTERESIS = 0.15  # Fractional band around each threshold to avoid popping
+LOD_CROWD_THRESHOLD = 4  # More units than this on screen makes distant ones coarser
+
+# Detail levels from finest to coarsest. An object is drawn at a level once its
+# projected diameter reaches min_pixels; the last level is a single box impostor.
+LOD_LEVELS = [
+    {"name": "high", "min_pixels": 200, "tire_sides": 20, "max_rollers": 12, "roller_sides": 8,
+     "threads": 20, "cylinder_sides": 12, "support_sides": 8, "impostor": False},
+    {"name": "medium", "min_pixels": 80, "tire_sides": 12, "max_rollers": 8, "roller_sides": 6,
+     "threads": 10, "cylinder_sides": 8, "support_sides": 6, "impostor": False},
+    {"name": "low", "min_pixels": 30, "tire_sides": 8, "max_rollers": 4, "roller_sides": 4,
+     "threads": 0, "cylinder_sides": 6, "support_sides": 4, "impostor": False},
+    {"name": "impostor", "min_pixels": 0, "tire_sides": 6, "max_rollers": 0, "roller_sides": 4,
+     "threads": 0, "cylinder_sides": 4, "support_sides": 4, "impostor": True},
+]
+
+# --- PROJECTION ---
+def projected_size(radius, distance, fov_y=FOV_Y, viewport_height=VIEWPORT_HEIGHT):
+    # Approximate on-screen diameter in pixels of a bounding sphere
+    if distance <= radius:
+        return float("inf")
+    return radius * viewport_height / (distance * math.tan(math.radians(fov_y) / 2))
+
+def camera_distance(camera, point):
+    return math.sqrt(sum((c - p)**2 for c, p in zip(camera, point)))
+
+# --- LEVEL SELECTION ---
+class LodSelector:
+    # Remembers the level chosen for each object key so that an object sitting
+    # near a threshold does not flicker between two levels.
+    def __init__(self, levels=LOD_LEVELS, hysteresis=LOD_HYSTERESIS, crowd_threshold=LOD_CROWD_THRESHOLD):
+        self.levels = levels
+        self.hysteresis = hysteresis
+        self.crowd_threshold = crowd_threshold
+        self.detail_scale = 1.0  # Global multiplier on projected size (quality knob)
+        self.current = {}
+
+    def level_for(self, pixels):
+        for i, level in enumerate(self.levels):
+            if pixels >= level["min_pixels"]:
+                return i
+        return len(self.levels) - 1
+
+    def select(self, key, pixels, crowd=1):
+        pixels *= self.detail_scale
+        if crowd > self.crowd_threshold:
+            pixels *= self.crowd_threshold / crowd
+
+        index = self.current.get(key)
+        if index is None:
+            index = self.level_for(pixels)
+        else:
+            last = len(self.levels) - 1
+            while index > 0 and pixels >= self.levels[index - 1]["min_pixels"] * (1 + self.hysteresis):
+                index -= 1
+            while index < last and pixels < self.levels[index]["min_pixels"] * (1 - self.hysteresis):
+                index += 1
+        self.current[key] = index
+        return self.levels[index]
+
+    def select_at(self, key, camera, center, radius, crowd=1):
+        pixels = projected_size(radius, camera_distance(camera, center))
+        return self.select(key, pixels, crowd)
+
+    def forget(self, key):
+        self.current.pop(key, None)
@@ -0,0 +1,102 @@
+import math
+import time
+import numpy as np
+
+# --- PARAMETERS ---
+# Per wheel, in the simulators' WHEEL_OFFSETS order (the two front wheels
+# at -y first, then the rear ones from +x round to -x)
+ROLLER_ANGLES = [-45, 45, -45, 45]   # Degrees between each roller axis and the wheel axle at the ground (X layout)
+MOTOR_DIRECTIONS = [1, -1, -1, 1]    # Wheels on the +x side are mounted mirrored and turn backwards about their axle
+MAX_WHEEL_SPEED = 30.0               # rad/s at full duty (about 290 rpm gear motors)
+
+# --- KINEMATICS ---
+class MecanumDrive:
+    # Maps chassis velocity (vx, vy in m/s in the chassis frame, forward at
+    # -y as in the simulators; omega in rad/s counter-clockwise) to the
+    # four wheel speeds in rad/s, positive when the wheel drives forward, and
+    # back. Each roller can only push along its own axis, so a wheel's speed
+    # is its contact point's velocity along the roller axis, over the wheel
+    # radius. Both directions are one matrix product, so any leading shape
+    # works: one command, a fleet, or a whole time series.
+    def __init__(self, width, length, wheel_radius, roller_angles=ROLLER_ANGLES, max_speed=MAX_WHEEL_SPEED):
+        self.wheel_radius = wheel_radius
+        self.max_speed = max_speed
+        self.positions = np.array([(-width/2, -length/2 + wheel_radius), (width/2, -length/2 + wheel_radius),
+                                   (width/2, length/2 - wheel_radius), (-width/2, length/2 - wheel_radius)])
+        self.directions = np.array(MOTOR_DIRECTIONS, dtype=float)
+        cot = 1.0 / np.tan(np.radians(roller_angles))
+        x, y = self.positions[:, 0], self.positions[:, 1]
+        # Forward is -y, hence the sign
+        self.inverse = -np.column_stack([cot, np.ones(4), x - cot * y]) / wheel_radius  # (4, 3)
+        self.forward = np.linalg.pinv(self.inverse)  # (3, 4), least squares when the wheels disagree
+        # Transposed copies so batches multiply without a transpose per call
+        self._inverse_t = np.ascontiguousarray(self.inverse.T)
+        self._forward_t = np.ascontiguousarray(self.forward.T)
+        self._rows = [tuple(row) for row in self.inverse.tolist()]
+
+    def wheel_speeds(self, velocity):
+        # (..., 3) chassis velocities -> (..., 4) wheel speeds
+        return np.asarray(velocity, dtype=float) @ self._inverse_t
+
+    def body_velocity(self, speeds):
+        # (..., 4) wheel speeds (e.g. from encoders) -> (..., 3) chassis velocities
+        return np.asarray(speeds, dtype=float) @ self._forward_t
+
+    def wheel_speeds_scalar(self, vx, vy, omega):
+        # One command without numpy's per-call overhead, for tight control loops
+        return [a * vx + b * vy + c * omega for a, b, c in self._rows]
+
+    def saturate(self, speeds):
+        # Scale each command down uniformly so no wheel exceeds max_speed,
+        # which keeps the direction of travel instead of clipping it
+        speeds = np.asarray(speeds, dtype=float)
+        peak = np.max(np.abs(speeds), axis=-1, keepdims=True)
+        return speeds * np.minimum(1.0, self.max_speed / np.maximum(peak, 1e-12))
+
+    def motor_values(self, speeds):
+        # Wheel speeds -> signed motor driver values in [-1, 1] (gpiozero's
+        # Motor.value), with the mirrored mounting folded in
+        return np.clip(self.saturate(speeds) / self.max_speed * self.directions, -1.0, 1.0)
+
+def chassis_velocity(previous_position, previous_rotation, position, rotation, dt):
+    # Velocity in the chassis frame that moved it from one pose to the next,
+    # rotations in degrees as the simulators keep them. Works on arrays too.
+    dx = np.asarray(position[0]) - previous_position[0]
+    dy = np.asarray(position[1]) - previous_position[1]
+    turn = (np.asarray(rotation) - previous_rotation + 180) % 360 - 180
+    heading = np.radians(previous_rotation + turn / 2)
+    c, s = np.cos(heading), np.sin(heading)
+    return np.stack([(c * dx + s * dy) / dt, (-s * dx + c * dy) / dt, np.radians(turn) / dt], axis=-1)
+
+if __name__ == "__main__":
+    drive = MecanumDrive(1.5, 2.5, 0.3)
+    for name, velocity in [("forward", (0, -1, 0)), ("sideways +x", (1, 0, 0)), ("turn left", (0, 0, 1))]:
+        speeds = drive.wheel_speeds(velocity)
+        print(f"{name:>12}: wheels {np.round(speeds, 2)} rad/s, back to {np.round(drive.body_velocity(speeds), 3)}")
+
+    rng = np.random.default_rng(0)
+    ticks = 10000
+    commands = rng.uniform(-2, 2, (ticks, 3))
+
+    # A 1 kHz loop sends one command per tick
+    started = time.perf_counter()
+    for vx, vy, omega in commands.tolist():
+        drive.wheel_speeds_scalar(vx, vy, omega)
+    scalar = (time.perf_counter() - started) / ticks
+    started = time.perf_counter()
+    for command in commands:
+        drive.motor_values(drive.wheel_speeds(command))
+    single = (time.perf_counter() - started) / ticks
+    print(f"One command: {scalar * 1e6:.2f} us plain, {single * 1e6:.2f} us with numpy and duty conversion "
+          f"({1e-3 / single:.0f}x headroom at 1 kHz)")
+
+    # A fleet over a minute of 1 kHz samples in one call
+    fleet = rng.uniform(-2, 2, (20, 60000, 3))
+    started = time.perf_counter()
+    speeds = drive.wheel_speeds(fleet)
+    recovered = drive.body_velocity(speeds)
+    batch = time.perf_counter() - started
+    error = np.max(np.abs(recovered - fleet))
+    print(f"20 forklifts x 60000 samples there and back: {batch * 1000:.1f} ms "
+          f"({batch / fleet[..., 0].size * 1e9:.1f} ns per sample), max round-trip error {error:.1e}")
+    assert math.isclose(error, 0.0, abs_tol=1e-9)
@@ -0,0 +1,171 @@
+import math
+import time
+from functools import lru_cache
+import numpy as np
+
+# --- PARAMETERS ---
+# Lift hardware: NEMA 17 on a lead screw through an A4988/DRV8825 driver
+SCREW_ROD_LENGTH = 2.0      # m of lead screw up the mast
+SCREW_ROD_RADIUS = 0.05     # m
+STEPPER_SIZE = 0.25         # m, the motor at the foot of the screw
+LIFT_TRAVEL = SCREW_ROD_LENGTH - STEPPER_SIZE * 1.25 - SCREW_ROD_RADIUS * 8  # m of fork travel, less the motor mount and nut
+SCREW_LEAD = 0.008          # m of carriage travel per screw revolution
+STEPS_PER_REV = 200         # Full steps per motor revolution
+MICROSTEPS = 16             # Driver microstepping
+STEP_DISTANCE = SCREW_LEAD / (STEPS_PER_REV * MICROSTEPS)  # m per step pulse
+MOTOR_TORQUE = 0.4          # N*m the motor still has at working speed (well under holding torque)
+SCREW_EFFICIENCY = 0.5      # Lead screw with an anti-backlash nut
+CARRIAGE_MASS = 1.5         # kg of carriage, fork and load cell
+TORQUE_MARGIN = 0.5         # Fraction of the spare thrust used for acceleration, so steps aren't lost
+GRAVITY = 9.81
+
+MAX_LIFT_SPEED = 0.08       # m/s (600 rpm on the screw); faster loses steps, so every speed is clamped to it
+MAX_LIFT_ACCELERATION = 2.0  # m/s^2 cap, even when the motor could do more
+MAX_LIFT_JERK = 50.0        # m/s^3 for S-curve profiles
+PROFILE_DT = 0.001          # s between profile samples
+PROFILE_CACHE_SIZE = 64     # Profiles and step tables kept per (distance, load, ...)
+
+# --- LIMITS ---
+def max_acceleration(load_weight):
+    # Acceleration the lift can take with load_weight kg on the fork: the
+    # screw's thrust from the motor torque, less the weight of what it lifts
+    mass = CARRIAGE_MASS + load_weight
+    thrust = 2 * math.pi * MOTOR_TORQUE * SCREW_EFFICIENCY / SCREW_LEAD
+    spare = TORQUE_MARGIN * (thrust - mass * GRAVITY) / mass
+    if spare <= 0:
+        raise ValueError(f"{load_weight} kg is more than the lift motor can raise")
+    return min(spare, MAX_LIFT_ACCELERATION)
+
+def braking_distance(speed, acceleration, jerk=MAX_LIFT_JERK):
+    # Distance to stop from speed, ramping the deceleration in and out
+    speed = abs(speed)
+    return speed * speed / (2 * acceleration) + speed * acceleration / (2 * jerk)
+
+# --- PROFILES ---
+class MotionProfile:
+    # Point-to-point move sampled every dt seconds from rest to rest. The
+    # trapezoid (or triangle, if the move is too short to reach max_speed)
+    # is built first. For an S-curve its velocity is then averaged over a
+    # window of max_acceleration / max_jerk: that turns each corner of the
+    # velocity into a jerk-limited ramp and keeps the area (the distance)
+    # the same, at the cost of one window of extra time.
+    def __init__(self, distance, max_speed=MAX_LIFT_SPEED, max_acceleration=MAX_LIFT_ACCELERATION,
+                 max_jerk=MAX_LIFT_JERK, dt=PROFILE_DT):
+        self.distance = distance
+        self.dt = dt
+        length = abs(distance)
+        if length * max_acceleration >= max_speed * max_speed:
+            ramp = max_speed / max_acceleration
+            peak = max_speed
+            cruise = length / max_speed - ramp
+        else:
+            ramp = math.sqrt(length / max_acceleration)
+            peak = max_acceleration * ramp
+            cruise = 0.0
+        total = 2 * ramp + cruise
+        t = np.arange(int(math.ceil(total / dt)) + 1) * dt
+        velocity = peak * np.clip(np.minimum(t, total - t) / max(ramp, dt), 0.0, 1.0)
+        if max_jerk:
+            window = max(1, int(round(max_acceleration / max_jerk / dt)))
+            velocity = np.convolve(velocity, np.full(window, 1.0 / window))
+        position = np.concatenate([[0.0], np.cumsum((velocity[1:] + velocity[:-1]) / 2) * dt])
+        if position[-1] > 0:
+            position *= length / position[-1]
+        sign = 1.0 if distance >= 0 else -1.0
+        self.time = np.arange(len(velocity)) * dt
+        self.position = sign * position
+        self.velocity = sign * velocity
+        self.acceleration = np.gradient(self.velocity, dt) if len(velocity) > 1 else np.zeros(1)
+        self.duration = float(self.time[-1])
+        for array in (self.time, self.position, self.velocity, self.acceleration):
+            array.flags.writeable = False
+
+    def sample(self, t):
+        # (position, velocity, acceleration) t seconds into the move; holds the end after it
+        i = min(max(int(t / self.dt), 0), len(self.time) - 1)
+        return float(self.position[i]), float(self.velocity[i]), float(self.acceleration[i])
+
+@lru_cache(maxsize=PROFILE_CACHE_SIZE)
+def _lift_profile(steps, load_weight, max_speed, s_curve):
+    return MotionProfile(steps * STEP_DISTANCE, max_speed, max_acceleration(load_weight),
+                         MAX_LIFT_JERK if s_curve else None)
+
+def lift_profile(distance, load_weight=0.0, max_speed=MAX_LIFT_SPEED, s_curve=True):
+    # Cached per (distance rounded to whole steps, load, speed, shape)
+    return _lift_profile(int(round(distance / STEP_DISTANCE)), load_weight, min(max_speed, MAX_LIFT_SPEED), s_curve)
+
+@lru_cache(maxsize=PROFILE_CACHE_SIZE)
+def step_intervals(steps, load_weight=0.0, max_speed=MAX_LIFT_SPEED, s_curve=True):
+    # Microseconds to wait before each step pulse of a move of |steps|
+    # steps, for a driver that pulses STEP and sleeps (or a pigpio wave).
+    # The sign of steps is the DIR pin; the table is the same both ways.
+    profile = _lift_profile(abs(steps), load_weight, min(max_speed, MAX_LIFT_SPEED), s_curve)
+    edges = np.arange(1, abs(steps) + 1) * STEP_DISTANCE
+    # Rounded as absolute times, so rounding doesn't add up over a long move
+    times = np.rint(np.interp(edges, np.abs(profile.position), profile.time) * 1e6)
+    table = np.maximum(np.diff(times, prepend=0.0), 1).astype(np.uint32)
+    table.flags.writeable = False
+    return table
+
+# --- JOGGING ---
+class LiftJog:
+    # Velocity-mode lift for a held button: ramps towards command * max_speed
+    # (command is 1, -1 or 0) with the same acceleration and jerk limits as
+    # the move profiles, and brakes early enough to stop within room metres
+    # of the end of travel. max_speed is capped at MAX_LIFT_SPEED, so the
+    # simulators never plan a move the motor couldn't step.
+    def __init__(self, max_speed=MAX_LIFT_SPEED, max_jerk=MAX_LIFT_JERK):
+        self.max_speed = min(max_speed, MAX_LIFT_SPEED)
+        self.max_jerk = max_jerk
+        self.velocity = 0.0
+        self.acceleration = 0.0
+
+    def update(self, command, dt, load_weight=0.0, room=math.inf):
+        limit = max_acceleration(load_weight)
+        target = command * self.max_speed
+        if room <= braking_distance(self.velocity, limit, self.max_jerk):
+            target = 0.0
+        error = target - self.velocity
+        # Deceleration that reaches the target speed just as it reaches zero
+        wanted = math.copysign(min(limit, math.sqrt(2 * self.max_jerk * abs(error))), error)
+        change = self.max_jerk * dt
+        self.acceleration += max(-change, min(wanted - self.acceleration, change))
+        velocity = self.velocity + self.acceleration * dt
+        if (velocity - target) * (self.velocity - target) <= 0:
+            velocity, self.acceleration = target, 0.0
+        self.velocity = velocity
+        return velocity
+
+    def stop(self):
+        self.velocity = self.acceleration = 0.0
+
+if __name__ == "__main__":
+    print(f"Step {STEP_DISTANCE * 1e6:.1f} um; max acceleration "
+          + ", ".join(f"{load} kg {max_acceleration(load):.2f} m/s^2" for load in [0, 5, 10]))
+    for load in [0, 10]:
+        for s_curve in [False, True]:
+            profile = lift_profile(0.5, load, s_curve=s_curve)
+            jerk = np.max(np.abs(np.diff(profile.acceleration))) / PROFILE_DT
+            print(f"0.5 m with {load} kg, {'S-curve' if s_curve else 'trapezoid'}: {profile.duration:.3f} s, "
+                  f"peak {np.max(np.abs(profile.acceleration)):.2f} m/s^2, peak jerk {jerk:.0f} m/s^3")
+
+    moves = [(steps, load) for steps in [1000, 20000, 100000, 300000] for load in [0, 5, 10]]
+    started = time.perf_counter()
+    tables = [step_intervals(steps, load) for steps, load in moves]
+    cold = (time.perf_counter() - started) / len(moves)
+    started = time.perf_counter()
+    for _ in range(100):
+        for steps, load in moves:
+            step_intervals(steps, load)
+    warm = (time.perf_counter() - started) / (100 * len(moves))
+    table = tables[-1]
+    print(f"Step tables: {cold * 1000:.1f} ms to build, {warm * 1e6:.2f} us from the cache; "
+          f"300000 steps with 10 kg: {table.nbytes / 1e6:.1f} MB, shortest interval {table.min()} us "
+          f"({1e6 / table.min() / 1000:.1f} kHz), move {table.sum() / 1e6:.2f} s")
+
+    jog = LiftJog()
+    height, peak = 0.0, 0.0
+    for i in range(6000):
+        height += jog.update(1, 0.001, 10, room=0.3 - height) * 0.001
+        peak = max(peak, abs(jog.acceleration))
+    print(f"Jog towards a limit 0.3 m away: stopped at {height:.4f} m, peak {peak:.2f} m/s^2")
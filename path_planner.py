@@ -0,0 +1,412 @@
+import heapq
+import math
+import time
+from collections import OrderedDict
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+# --- PARAMETERS ---
+GRID_RESOLUTION = 0.1   # m per cell
+FIELD_CACHE_SIZE = 32   # Distance fields kept before the least recently used one is dropped
+COARSE_FACTOR = 4       # Cells per side of a block in the detour search
+DETOUR_WEIGHT = 1.5     # Heuristic weight of the detour search; its path is smoothed anyway
+COARSE_MAX_EXPANSIONS = 1000  # Blocks searched before handing over to the full grid
+START_SEARCH_RADIUS = 1.0  # m searched for a free cell when the robot starts inside an obstacle
+SQRT2 = math.sqrt(2)
+
+# Mecanum wheels let the forklift translate in any direction without turning,
+# so the planner moves to all eight neighbours and never has to align first
+NEIGHBOURS = [
+    (-1, 0, 1.0), (1, 0, 1.0), (0, -1, 1.0), (0, 1, 1.0),
+    (-1, -1, SQRT2), (-1, 1, SQRT2), (1, -1, SQRT2), (1, 1, SQRT2),
+]
+
+# --- OCCUPANCY GRID ---
+class OccupancyGrid:
+    # Rows run along y and columns along x, centred on the warehouse origin.
+    # The static layer (walls, shelves) only changes with the layout and bumps
+    # version when it does; dynamic boxes (cargo, other forklifts) are kept as
+    # cell rectangles so they can come and go without invalidating anything.
+    # Every obstacle is grown by the inflation radius, so the planner can treat
+    # the forklift as a point at its centre.
+    def __init__(self, width, length, resolution=GRID_RESOLUTION, inflation=0.0):
+        self.resolution = resolution
+        self.inflation = inflation
+        self.cols = int(round(width / resolution))
+        self.rows = int(round(length / resolution))
+        self.origin = (-width / 2, -length / 2)
+        self.static = np.zeros((self.rows, self.cols), dtype=bool)
+        self.dynamic = {}
+        self.version = 0
+        self._graph = None
+        self._graph_version = -1
+
+    def world_to_cell(self, x, y):
+        col = int((x - self.origin[0]) / self.resolution)
+        row = int((y - self.origin[1]) / self.resolution)
+        return min(max(row, 0), self.rows - 1), min(max(col, 0), self.cols - 1)
+
+    def cell_to_world(self, row, col):
+        return (self.origin[0] + (col + 0.5) * self.resolution,
+                self.origin[1] + (row + 0.5) * self.resolution)
+
+    def box_cells(self, x, y, sx, sy, margin=0.0):
+        # Half-open (r0, r1, c0, c1) of the cells a box covers, clipped to the grid
+        c0 = int(math.floor((x - sx / 2 - margin - self.origin[0]) / self.resolution))
+        c1 = int(math.ceil((x + sx / 2 + margin - self.origin[0]) / self.resolution))
+        r0 = int(math.floor((y - sy / 2 - margin - self.origin[1]) / self.resolution))
+        r1 = int(math.ceil((y + sy / 2 + margin - self.origin[1]) / self.resolution))
+        return max(r0, 0), min(max(r1, 0), self.rows), max(c0, 0), min(max(c1, 0), self.cols)
+
+    def add_static_box(self, x, y, sx, sy):
+        r0, r1, c0, c1 = self.box_cells(x, y, sx, sy, self.inflation)
+        self.static[r0:r1, c0:c1] = True
+        self.version += 1
+
+    def clear_static(self):
+        self.static[:] = False
+        self.version += 1
+
+    def downsample(self, factor):
+        # Same area at factor times the cell size. A coarse cell is free when
+        # the fine cell at its centre is, i.e. when the robot can stand there.
+        coarse = OccupancyGrid(self.cols * self.resolution, self.rows * self.resolution,
+                               self.resolution * factor, self.inflation)
+        rows = np.minimum(np.arange(coarse.rows) * factor + factor // 2, self.rows - 1)
+        cols = np.minimum(np.arange(coarse.cols) * factor + factor // 2, self.cols - 1)
+        coarse.static = self.static[np.ix_(rows, cols)]
+        coarse.version = 1
+        return coarse
+
+    def set_dynamic(self, key, x, y, sx, sy):
+        self.dynamic[key] = self.box_cells(x, y, sx, sy, self.inflation)
+
+    def remove_dynamic(self, key):
+        self.dynamic.pop(key, None)
+
+    def dynamic_rects(self, ignore=(), start=None):
+        # Rectangles to avoid, leaving out ignored keys and any box the robot
+        # is already standing in (it has to be allowed to drive out of it)
+        rects = []
+        for key, (r0, r1, c0, c1) in self.dynamic.items():
+            if key in ignore:
+                continue
+            if start is not None and r0 <= start[0] < r1 and c0 <= start[1] < c1:
+                continue
+            rects.append((r0, r1, c0, c1))
+        return rects
+
+    def graph(self):
+        # Sparse 8-connected graph of the free static cells, rebuilt per version.
+        # Diagonals may not cut the corner of a blocked cell.
+        if self._graph_version == self.version:
+            return self._graph
+        free = ~self.static
+        index = np.arange(self.rows * self.cols).reshape(self.rows, self.cols)
+        sources, targets, weights = [], [], []
+        for dr, dc, cost in [(0, 1, 1.0), (1, 0, 1.0), (1, 1, SQRT2), (1, -1, SQRT2)]:
+            r1 = self.rows - dr
+            c0, c1 = max(0, -dc), self.cols - max(0, dc)
+            mask = free[:r1, c0:c1] & free[dr:r1 + dr, c0 + dc:c1 + dc]
+            if dr and dc:
+                mask &= free[dr:r1 + dr, c0:c1] & free[:r1, c0 + dc:c1 + dc]
+            sources.append(index[:r1, c0:c1][mask])
+            targets.append(index[dr:r1 + dr, c0 + dc:c1 + dc][mask])
+            weights.append(np.full(len(sources[-1]), cost))
+        size = self.rows * self.cols
+        self._graph = csr_matrix((np.concatenate(weights), (np.concatenate(sources), np.concatenate(targets))),
+                                 shape=(size, size))
+        self._graph_version = self.version
+        return self._graph
+
+# --- PLANNER ---
+class DistanceField:
+    # Distance in cells from every cell to the nearest goal cell over the
+    # static layer; inf where blocked or unreachable
+    def __init__(self, key, version, values):
+        self.key = key
+        self.version = version
+        self.values = values
+        self.lookup = memoryview(values)  # Fast scalar reads for the descent loop
+        self.coarse = None  # Block-level values for the detour search
+        self.goals = np.flatnonzero(values == 0)
+
+class PathPlanner:
+    # Distance fields are computed once per goal with Dijkstra over the static
+    # layer and cached until the layout version changes. A plan then just
+    # walks down the field from the start, which is linear in the path length.
+    # Only when a dynamic obstacle sits on that path does it fall back to A*,
+    # using the field as an exact-for-static, admissible heuristic.
+    def __init__(self, grid, cache_size=FIELD_CACHE_SIZE):
+        self.grid = grid
+        self.cache_size = cache_size
+        self.fields = OrderedDict()
+        self.expanded = 0        # A* expansions of the last plan, 0 if the field was followed
+        self.plan_time = 0.0     # Seconds spent in the last plan
+
+    def field(self, key, cells):
+        grid = self.grid
+        cache_key = (key, cells)
+        cached = self.fields.get(cache_key)
+        if cached is not None and cached.version == grid.version:
+            self.fields.move_to_end(cache_key)
+            return cached
+
+        r0, r1, c0, c1 = cells
+        rows, cols = np.mgrid[r0:r1, c0:c1]
+        goals = (rows * grid.cols + cols)[~grid.static[r0:r1, c0:c1]]
+        if len(goals):
+            values = dijkstra(grid.graph(), directed=False, indices=goals, min_only=True)
+            values = values.astype(np.float32)
+        else:
+            values = np.full(grid.rows * grid.cols, np.inf, dtype=np.float32)
+        field = DistanceField(key, grid.version, values)
+        field.coarse = _coarse_values(values, grid, COARSE_FACTOR)
+        self.fields[cache_key] = field
+        while len(self.fields) > self.cache_size:
+            self.fields.popitem(last=False)
+        return field
+
+    def region_field(self, key, x, y, sx, sy):
+        return self.field(key, self.grid.box_cells(x, y, sx, sy))
+
+    def point_field(self, key, x, y):
+        row, col = self.grid.world_to_cell(x, y)
+        return self.field(key, (row, row + 1, col, col + 1))
+
+    def invalidate(self):
+        self.fields.clear()
+
+    def distance(self, field, x, y):
+        row, col = self.grid.world_to_cell(x, y)
+        return float(field.values[row * self.grid.cols + col]) * self.grid.resolution
+
+    def plan(self, start, field, goal=None, ignore=()):
+        # World waypoints from start to the field's goal, or None if unreachable.
+        # goal, if given, replaces the final cell centre with the exact point.
+        started = time.perf_counter()
+        self.expanded = 0
+        corners = None
+        begin = self._free_start(start, field)
+        if begin is not None:
+            rects = self.grid.dynamic_rects(ignore, begin)
+            if self._goals_covered(field, rects):
+                self.plan_time = time.perf_counter() - started
+                return None
+            # Cheapest first: follow the field, detour on the coarse grid, then
+            # search the full grid
+            for search in (self._descend, self._coarse_search, self._astar):
+                cells = search(begin, field, rects)
+                if cells is not None:
+                    corners = self._smooth(self._corners(cells), rects)
+                    if corners is not None:
+                        break
+        self.plan_time = time.perf_counter() - started
+        if corners is None:
+            return None
+        waypoints = [self.grid.cell_to_world(r, c) for r, c in corners]
+        if goal is not None:
+            waypoints[-1] = (goal[0], goal[1])
+        return waypoints[1:] if len(waypoints) > 1 else waypoints
+
+    def _goals_covered(self, field, rects):
+        # Every goal cell under a dynamic box: fail now rather than flood the grid
+        if not rects or not len(field.goals):
+            return not len(field.goals)
+        rows, cols = np.divmod(field.goals, self.grid.cols)
+        covered = np.zeros(len(field.goals), dtype=bool)
+        for r0, r1, c0, c1 in rects:
+            covered |= (rows >= r0) & (rows < r1) & (cols >= c0) & (cols < c1)
+        return covered.all()
+
+    def _free_start(self, start, field):
+        grid = self.grid
+        row, col = grid.world_to_cell(start[0], start[1])
+        if math.isfinite(field.lookup[row * grid.cols + col]):
+            return row, col
+        # Started inside an inflated obstacle: use the closest reachable cell nearby
+        radius = int(START_SEARCH_RADIUS / grid.resolution)
+        r0, r1 = max(row - radius, 0), min(row + radius + 1, grid.rows)
+        c0, c1 = max(col - radius, 0), min(col + radius + 1, grid.cols)
+        window = field.values.reshape(grid.rows, grid.cols)[r0:r1, c0:c1]
+        rows, cols = np.mgrid[r0:r1, c0:c1]
+        spread = np.where(np.isfinite(window), (rows - row)**2 + (cols - col)**2, np.inf)
+        if not np.isfinite(spread).any():
+            return None
+        best = np.unravel_index(np.argmin(spread), spread.shape)
+        return r0 + best[0], c0 + best[1]
+
+    def _descend(self, begin, field, rects):
+        # Follow the steepest descent of the field; None if a dynamic box is in the way
+        lookup = field.lookup
+        rows, cols = self.grid.rows, self.grid.cols
+        row, col = begin
+        cells = [begin]
+        value = lookup[row * cols + col]
+        while value > 0:
+            best = None
+            for r, c, cost, neighbour in _neighbours(row, col, lookup, rows, cols):
+                if neighbour < value and (best is None or neighbour < best[2]):
+                    best = (r, c, neighbour)
+            if best is None:
+                return None
+            row, col, value = best
+            if _blocked(row, col, rects):
+                return None
+            cells.append((row, col))
+        return cells
+
+    def _coarse_search(self, begin, field, rects):
+        # A* over blocks of COARSE_FACTOR x COARSE_FACTOR cells. Going round a
+        # box on the fine grid floods its whole shadow; on blocks it's 1/16th of
+        # the work. Blocks touching any obstacle count as blocked, so narrow gaps
+        # close and the full-grid search takes over.
+        grid = self.grid
+        factor = COARSE_FACTOR
+        values, lookup = field.coarse
+        rows, cols = values.shape
+        coarse_rects = [(r0 // factor, -(-r1 // factor), c0 // factor, -(-c1 // factor)) for r0, r1, c0, c1 in rects]
+        blocks = self._search((begin[0] // factor, begin[1] // factor), lookup, rows, cols, coarse_rects,
+                              DETOUR_WEIGHT, COARSE_MAX_EXPANSIONS)
+        if blocks is None:
+            return None
+        centre = factor // 2
+        cells = [begin] + [(r * factor + centre, c * factor + centre) for r, c in blocks[1:]]
+        # Finish on the fine grid from the centre of the goal block
+        tail = self._search(cells[-1], field.lookup, grid.rows, grid.cols, rects, 1.0, factor**2 * 4)
+        if tail is None:
+            return None
+        return cells + tail[1:]
+
+    def _astar(self, begin, field, rects):
+        return self._search(begin, field.lookup, self.grid.rows, self.grid.cols, rects)
+
+    def _search(self, begin, lookup, rows, cols, rects, weight=1.0, limit=None):
+        # A* towards any cell where the field is 0, with the field as heuristic.
+        # A weight above 1 trades optimality for fewer expansions; past limit
+        # expansions the search gives up.
+        start = begin[0] * cols + begin[1]
+        g = {start: 0.0}
+        parent = {start: None}
+        # Ties on f go to the deeper node (negated cost), which keeps the search
+        # from flooding the plateaus an 8-connected grid is full of
+        heap = [(lookup[start], -0.0, start)]
+        expanded = 0
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            cost = -cost
+            if cost > g[node]:
+                continue
+            self.expanded += 1
+            expanded += 1
+            if limit is not None and expanded > limit:
+                return None
+            if lookup[node] == 0:
+                cells = []
+                while node is not None:
+                    cells.append(divmod(node, cols))
+                    node = parent[node]
+                return cells[::-1]
+            row, col = divmod(node, cols)
+            for r, c, step, heuristic in _neighbours(row, col, lookup, rows, cols):
+                if _blocked(r, c, rects):
+                    continue
+                neighbour = r * cols + c
+                new_cost = cost + step
+                if new_cost < g.get(neighbour, math.inf):
+                    g[neighbour] = new_cost
+                    parent[neighbour] = node
+                    heapq.heappush(heap, (new_cost + weight * heuristic, -new_cost, neighbour))
+        return None
+
+    def _corners(self, cells):
+        # Keep only the cells where the step direction changes
+        if len(cells) < 3:
+            return cells
+        corners = [cells[0]]
+        for previous, cell, following in zip(cells, cells[1:], cells[2:]):
+            if (cell[0] - previous[0], cell[1] - previous[1]) != (following[0] - cell[0], following[1] - cell[1]):
+                corners.append(cell)
+        corners.append(cells[-1])
+        return corners
+
+    def _smooth(self, corners, rects):
+        # The chassis can drive straight at any angle, so skip corners that have
+        # a clear line of sight past them. None if even neighbouring corners
+        # can't see each other (only possible for coarse paths).
+        smoothed = [corners[0]]
+        i = 0
+        while i < len(corners) - 1:
+            j = len(corners) - 1
+            while j > i and not self._line_of_sight(corners[i], corners[j], rects):
+                j -= 1
+            if j == i:
+                return None
+            smoothed.append(corners[j])
+            i = j
+        return smoothed
+
+    def _line_of_sight(self, a, b, rects):
+        samples = int(max(abs(b[0] - a[0]), abs(b[1] - a[1])) * 2) + 1
+        rows = np.rint(np.linspace(a[0], b[0], samples)).astype(int)
+        cols = np.rint(np.linspace(a[1], b[1], samples)).astype(int)
+        if self.grid.static[rows, cols].any():
+            return False
+        for r0, r1, c0, c1 in rects:
+            if ((rows >= r0) & (rows < r1) & (cols >= c0) & (cols < c1)).any():
+                return False
+        return True
+
+def _coarse_values(values, grid, factor):
+    # Block heuristic: the smallest fine distance inside the block, in block
+    # units; inf for any block that isn't entirely free
+    rows, cols = -(-grid.rows // factor), -(-grid.cols // factor)
+    padded = np.full((rows * factor, cols * factor), np.inf, dtype=np.float32)
+    padded[:grid.rows, :grid.cols] = values.reshape(grid.rows, grid.cols)
+    blocks = padded.reshape(rows, factor, cols, factor)
+    coarse = blocks.min(axis=(1, 3)) / factor
+    coarse[np.isinf(blocks).any(axis=(1, 3))] = np.inf
+    coarse = coarse.ravel()
+    return coarse.reshape(rows, cols), memoryview(coarse)
+
+def _neighbours(row, col, lookup, rows, cols):
+    for dr, dc, cost in NEIGHBOURS:
+        r, c = row + dr, col + dc
+        if r < 0 or r >= rows or c < 0 or c >= cols:
+            continue
+        value = lookup[r * cols + c]
+        if value == math.inf:
+            continue
+        if dr and dc and (lookup[r * cols + col] == math.inf or lookup[row * cols + c] == math.inf):
+            continue
+        yield r, c, cost, value
+
+def _blocked(row, col, rects):
+    for r0, r1, c0, c1 in rects:
+        if r0 <= row < r1 and c0 <= col < c1:
+            return True
+    return False
+
+if __name__ == "__main__":
+    # Forklift-sized robot in the simulator warehouse
+    grid = OccupancyGrid(40, 40, inflation=2.1)
+    for x, y, sx, sy in [(0, 20, 40, 0.3), (0, -20, 40, 0.3), (-20, 0, 0.3, 40), (20, 0, 0.3, 40),
+                         (18, 0, 5, 2), (-18, 0, 5, 2), (0, 18, 5, 2), (0, -18, 5, 2), (10, 10, 5, 2)]:
+        grid.add_static_box(x, y, sx, sy)
+    grid.set_dynamic("cargo", 0, -4, 1, 1)
+    planner = PathPlanner(grid)
+
+    started = time.perf_counter()
+    zone = planner.region_field("zone", -10, -10, 3, 3)
+    cargo = planner.point_field("cargo", 8, -6)
+    print(f"Distance fields: {(time.perf_counter() - started) * 1000 / 2:.1f} ms each")
+
+    for label, start, field in [("to cargo", (-12, 6), cargo), ("to zone", (8, -6), zone),
+                                ("around cargo", (0, 2), planner.point_field("below", 0, -9))]:
+        times = []
+        for _ in range(50):
+            path = planner.plan(start, field)
+            times.append(planner.plan_time)
+        print(f"Plan {label}: {len(path)} waypoints, {planner.expanded} A* expansions, "
+              f"{np.median(times) * 1000:.2f} ms")
@@ -0,0 +1,60 @@
+# --- PARAMETERS ---
+TARGET_FPS = 60
+FRAME_TIME_SMOOTHING = 0.1  # Weight of the newest frame in the moving average
+DEGRADE_MARGIN = 1.05       # Step down when the average exceeds the budget by this factor
+UPGRADE_MARGIN = 0.75       # Step up only when the average is this far under budget
+CHANGE_COOLDOWN = 1.0       # Seconds to wait after a change before judging again
+
+# Quality levels from best to cheapest. Each knob is read by the renderer:
+#   lod_scale        - multiplier on projected size fed to the LOD selector
+#   max_cylinder_sides - cap on tessellation of every cylinder
+#   max_rollers      - cap on mecanum rollers drawn per wheel
+#   max_shelf_boxes  - boxes drawn per shelf level
+#   hud_points       - vertices in the load-cell graph
+#   blend            - transparent passes (acrylic fork, zones, windows)
+QUALITY_LEVELS = [
+    {"name": "high", "lod_scale": 1.0, "max_cylinder_sides": 20, "max_rollers": 12,
+     "max_shelf_boxes": 3, "hud_points": 100, "blend": True},
+    {"name": "medium", "lod_scale": 0.7, "max_cylinder_sides": 12, "max_rollers": 8,
+     "max_shelf_boxes": 2, "hud_points": 50, "blend": True},
+    {"name": "low", "lod_scale": 0.45, "max_cylinder_sides": 8, "max_rollers": 6,
+     "max_shelf_boxes": 1, "hud_points": 25, "blend": False},
+    {"name": "minimal", "lod_scale": 0.25, "max_cylinder_sides": 6, "max_rollers": 4,
+     "max_shelf_boxes": 0, "hud_points": 15, "blend": False},
+]
+
+# --- CONTROLLER ---
+class QualityController:
+    # Tracks a moving average of the time spent producing each frame and steps
+    # through QUALITY_LEVELS to keep it inside the budget for the target rate.
+    def __init__(self, target_fps=TARGET_FPS, levels=QUALITY_LEVELS, start_level=0):
+        self.levels = levels
+        self.budget = 1.0 / target_fps
+        self.index = start_level
+        self.average = self.budget
+        self.since_change = 0.0
+
+    @property
+    def level(self):
+        return self.levels[self.index]
+
+    def update(self, frame_time, elapsed=None):
+        # frame_time is the busy time of the last frame, elapsed the wall time
+        # since the previous call (defaults to frame_time)
+        self.average += FRAME_TIME_SMOOTHING * (frame_time - self.average)
+        self.since_change += frame_time if elapsed is None else elapsed
+        if self.since_change < CHANGE_COOLDOWN:
+            return self.level
+
+        if self.average > self.budget * DEGRADE_MARGIN and self.index < len(self.levels) - 1:
+            self._change(self.index + 1)
+        elif self.average < self.budget * UPGRADE_MARGIN and self.index > 0:
+            self._change(self.index - 1)
+        return self.level
+
+    def _change(self, index):
+        previous = self.level["name"]
+        self.index = index
+        self.since_change = 0.0
+        print(f"Quality {previous} -> {self.level['name']} "
+              f"(frame {self.average * 1000:.1f} ms, budget {self.budget * 1000:.1f} ms)")
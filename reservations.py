@@ -0,0 +1,287 @@
+import heapq
+import math
+import time
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+from path_planner import OccupancyGrid, NEIGHBOURS
+
+# --- PARAMETERS ---
+AGENT_SPEED = 2.0           # m/s, one traffic cell per step at this speed
+PLAN_HORIZON = 500          # Steps a single search may look ahead
+MAX_PRIORITY_ROUNDS = 4     # Re-orderings tried before stuck agents are parked at their start
+MOVES = [(0, 0)] + [(dr, dc) for dr, dc, _ in NEIGHBOURS]  # Wait, then the eight neighbours
+
+# --- RESERVATION TABLE ---
+class ReservationTable:
+    # Space-time occupancy of a traffic grid, with cells as flat indices and
+    # time in whole steps. Cells are reserved per step and moves per
+    # (from, to, step), so two agents can neither meet in a cell nor swap
+    # through each other. An agent that has arrived stays parked on its goal.
+    # Every check is one or two dict lookups, independent of the fleet size.
+    def __init__(self):
+        self.cells = {}    # (cell, t) -> agent
+        self.moves = {}    # (from, to, t) -> agent moving between t and t + 1
+        self.parked = {}   # cell -> (t, agent) holding the cell from step t on
+        self.last = {}     # cell -> {agent: last step reserved}, to check parking
+        self.owned = {}    # agent -> reserved keys, for release
+        self.end = 0       # Last step with a reservation; after it only parked agents remain
+
+    def cell_free(self, cell, t, agent):
+        owner = self.cells.get((cell, t))
+        if owner is not None and owner != agent:
+            return False
+        parked = self.parked.get(cell)
+        return parked is None or parked[1] == agent or t < parked[0]
+
+    def move_free(self, a, b, t, agent):
+        # Nobody coming the other way between the same two cells
+        owner = self.moves.get((b, a, t))
+        return owner is None or owner == agent
+
+    def crossing_free(self, a, b, t, agent):
+        # Nobody on the other diagonal of the square a diagonal move cuts across
+        for key in ((a, b, t), (b, a, t)):
+            owner = self.moves.get(key)
+            if owner is not None and owner != agent:
+                return False
+        return True
+
+    def park_after(self, cell, agent):
+        # First step from which the agent may stop on cell for good: after
+        # everyone else has passed through. inf if someone is parked there.
+        parked = self.parked.get(cell)
+        if parked is not None and parked[1] != agent:
+            return math.inf
+        return max((last + 1 for other, last in self.last.get(cell, {}).items() if other != agent), default=0)
+
+    def reserve(self, agent, path, start_time=0, park=True):
+        keys = self.owned.setdefault(agent, [])
+        for i, cell in enumerate(path):
+            t = start_time + i
+            self.cells[(cell, t)] = agent
+            keys.append((self.cells, (cell, t)))
+            self.last.setdefault(cell, {})[agent] = t
+            self.end = max(self.end, t)
+            if i:
+                self.moves[(path[i - 1], cell, t - 1)] = agent
+                keys.append((self.moves, (path[i - 1], cell, t - 1)))
+        if park:
+            self.parked[path[-1]] = (start_time + len(path) - 1, agent)
+            keys.append((self.parked, path[-1]))
+
+    def release(self, agent):
+        for table, key in self.owned.pop(agent, []):
+            entry = table.get(key)
+            if entry is not None and (entry == agent or (isinstance(entry, tuple) and entry[1] == agent)):
+                del table[key]
+            if table is self.cells:
+                agents = self.last.get(key[0])
+                if agents is not None and agents.pop(agent, None) is not None and not agents:
+                    del self.last[key[0]]
+
+    def clear(self):
+        for table in (self.cells, self.moves, self.parked, self.last, self.owned):
+            table.clear()
+        self.end = 0
+
+# --- COOPERATIVE PLANNER ---
+class CooperativePlanner:
+    # Prioritised planning: agents are planned one at a time with space-time
+    # A* (wait or step to any of eight neighbours, one step per time unit)
+    # against the reservations of the agents before them, then reserve their
+    # own path. An agent that can't get through is moved to the front and the
+    # fleet re-planned; after MAX_PRIORITY_ROUNDS such agents stay parked at
+    # their start instead, so every agent always ends up with a valid plan.
+    def __init__(self, grid, speed=AGENT_SPEED, horizon=PLAN_HORIZON):
+        self.grid = grid
+        self.table = ReservationTable()
+        self.horizon = horizon
+        self.step_time = grid.resolution / speed
+        self.heuristics = {}  # Goal cell -> steps to it from every cell, ignoring other agents
+        self.stats = {}       # Agent -> waits, delay, conflicts, plan time, stalled
+
+    def heuristic(self, goal):
+        lookup = self.heuristics.get(goal)
+        if lookup is None:
+            steps = dijkstra(self.grid.graph(), directed=False, indices=goal, unweighted=True)
+            lookup = self.heuristics[goal] = memoryview(steps.astype(np.float32))
+        return lookup
+
+    def cell_at(self, x, y):
+        row, col = self.grid.world_to_cell(x, y)
+        return row * self.grid.cols + col
+
+    def plan(self, agent, start, goal, start_time=0):
+        # Space-time path of flat cells from start_time, reserved on success
+        started = time.perf_counter()
+        rows, cols = self.grid.rows, self.grid.cols
+        table = self.table
+        h = self.heuristic(goal)
+        # Arriving before the goal is clear for good means waiting, so no path
+        # can finish before park_after; folding that into f keeps the search
+        # from flooding every state that could reach the goal early
+        park_after = table.park_after(goal, agent)
+        if h[start] == math.inf or park_after == math.inf:
+            return None
+        # Past the table's last step the world no longer changes, so a cell
+        # reached at any later step is the same state; without this, waiting
+        # behind a parked agent would fan out over every future step
+        settled = table.end + 1
+        parent = {(start, start_time): None}
+        visited = {(start, start_time if start_time < settled else settled)}
+        heap = [(max(start_time + h[start], park_after), -start_time, start)]
+        conflicts = 0
+        path = None
+        while heap:
+            _, t, cell = heapq.heappop(heap)
+            t = -t
+            if cell == goal and t >= park_after:
+                path = []
+                state = (cell, t)
+                while state is not None:
+                    path.append(state[0])
+                    state = parent[state]
+                path.reverse()
+                break
+            if t - start_time >= self.horizon:
+                continue
+            row, col = divmod(cell, cols)
+            step = t + 1
+            state_step = step if step < settled else settled
+            for dr, dc in MOVES:
+                r, c = row + dr, col + dc
+                if r < 0 or r >= rows or c < 0 or c >= cols:
+                    continue
+                following = r * cols + c
+                if h[following] == math.inf or (following, state_step) in visited:
+                    continue
+                diagonal = dr and dc
+                if diagonal and (h[r * cols + col] == math.inf or h[row * cols + c] == math.inf):
+                    continue
+                if (not table.cell_free(following, step, agent) or not table.move_free(cell, following, t, agent)
+                        or (diagonal and not table.crossing_free(row * cols + c, r * cols + col, t, agent))):
+                    conflicts += 1
+                    continue
+                parent[(following, step)] = (cell, t)
+                visited.add((following, state_step))
+                arrival = step + h[following]
+                heapq.heappush(heap, (arrival if arrival > park_after else park_after, -step, following))
+
+        if path is not None:
+            table.reserve(agent, path, start_time)
+            waits = sum(1 for a, b in zip(path, path[1:]) if a == b)
+            self.stats[agent] = {"waits": waits, "wait_time": waits * self.step_time,
+                                 "delay": len(path) - 1 - int(h[start]), "conflicts": conflicts,
+                                 "plan_time": time.perf_counter() - started, "stalled": False}
+        return path
+
+    def plan_fleet(self, requests, start_time=0, max_rounds=MAX_PRIORITY_ROUNDS):
+        # requests is a list of (agent, start cell, goal cell); returns {agent: path}
+        order = list(requests)
+        stalled = set()
+        rounds = 0
+        while True:
+            self.table.clear()
+            self.stats.clear()
+            # Everyone holds their start until planned; stalled agents hold it for good
+            for agent, start, _ in order:
+                self.table.reserve(agent, [start], start_time, park=agent in stalled)
+            paths = {}
+            failed = []
+            for agent, start, goal in order:
+                if agent in stalled:
+                    paths[agent] = [start]
+                    self.stats[agent] = {"waits": 0, "wait_time": 0.0, "delay": 0, "conflicts": 0,
+                                         "plan_time": 0.0, "stalled": True}
+                    continue
+                self.table.release(agent)
+                path = self.plan(agent, start, goal, start_time)
+                if path is None:
+                    failed.append(agent)
+                    self.table.reserve(agent, [start], start_time, park=False)
+                else:
+                    paths[agent] = path
+            if not failed:
+                return paths
+            rounds += 1
+            if rounds < max_rounds:
+                first = set(failed)
+                order = [request for request in order if request[0] in first] + \
+                        [request for request in order if request[0] not in first]
+            else:
+                stalled.update(failed)
+
+    def metrics(self):
+        waits = [stats["wait_time"] for stats in self.stats.values()]
+        return {"agents": len(self.stats),
+                "stalled": sum(stats["stalled"] for stats in self.stats.values()),
+                "mean_wait_time": float(np.mean(waits)) if waits else 0.0,
+                "max_wait_time": max(waits, default=0.0),
+                "conflicts": sum(stats["conflicts"] for stats in self.stats.values()),
+                "mean_plan_time": float(np.mean([stats["plan_time"] for stats in self.stats.values()]))}
+
+def find_collisions(paths):
+    # Vertex and swap conflicts between finished plans, agents staying on their last cell
+    horizon = max(len(path) for path in paths.values())
+    collisions = 0
+    for t in range(horizon):
+        seen = {}
+        for agent, path in paths.items():
+            cell = path[min(t, len(path) - 1)]
+            if cell in seen:
+                collisions += 1
+            seen[cell] = agent
+        if t:
+            moves = set()
+            for path in paths.values():
+                a, b = path[min(t - 1, len(path) - 1)], path[min(t, len(path) - 1)]
+                if a != b and (b, a) in moves:
+                    collisions += 1
+                moves.add((a, b))
+    return collisions
+
+def benchmark(grid, counts, rng):
+    free = np.flatnonzero(~grid.static.ravel())
+    for count in counts:
+        cells = rng.choice(free, size=count * 2, replace=False)
+        requests = [(i, int(cells[i]), int(cells[count + i])) for i in range(count)]
+        planner = CooperativePlanner(grid)
+        for _, _, goal in requests:
+            planner.heuristic(goal)
+
+        started = time.perf_counter()
+        paths = planner.plan_fleet(requests)
+        elapsed = time.perf_counter() - started
+        metrics = planner.metrics()
+
+        queries = [(int(c), int(t), -1) for c, t in zip(rng.choice(free, 100000), rng.integers(0, 100, 100000))]
+        started = time.perf_counter()
+        for cell, t, agent in queries:
+            planner.table.cell_free(cell, t, agent)
+        query_time = (time.perf_counter() - started) / len(queries)
+
+        print(f"  {count} agents: planned in {elapsed:.2f} s ({metrics['mean_plan_time'] * 1000:.2f} ms per agent), "
+              f"{metrics['stalled']} stalled, wait {metrics['mean_wait_time']:.1f} s mean / "
+              f"{metrics['max_wait_time']:.1f} s max, {metrics['conflicts']} conflicts, "
+              f"{find_collisions(paths)} collisions, {query_time * 1e6:.2f} us per reservation query")
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(3)
+
+    # The simulator hall, from the planner's 10 cm grid to 4 m traffic cells
+    # (about one forklift footprint apart)
+    hall = OccupancyGrid(40, 40, inflation=2.1)
+    for x, y, sx, sy in [(0, 20, 40, 0.3), (0, -20, 40, 0.3), (-20, 0, 0.3, 40), (20, 0, 0.3, 40),
+                         (18, 0, 5, 2), (-18, 0, 5, 2), (0, 18, 5, 2), (0, -18, 5, 2), (10, 10, 5, 2)]:
+        hall.add_static_box(x, y, sx, sy)
+    print("Simulator hall, 4 m cells:")
+    benchmark(hall.downsample(40), [8], rng)
+
+    # 100 x 60 m at 1 m cells: rows of 16 m racks with 3 m aisles and a cross aisle
+    grid = OccupancyGrid(100, 60, resolution=1.0)
+    for x in range(-40, 41, 20):
+        for y in range(-24, 25, 5):
+            if abs(y) > 2:
+                grid.add_static_box(x, y, 16, 2)
+    print("Racked hall, 1 m cells:")
+    benchmark(grid, [100, 200, 400], rng)
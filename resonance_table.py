@@ -0,0 +1,149 @@
+import os
+import time
+import numpy as np
+from motion_profile import CARRIAGE_MASS, LIFT_TRAVEL
+from fork_dynamics import DAMPING_RATIO, stiffness
+
+# --- PARAMETERS ---
+# Two-mass model of the fork assembly: the carriage riding the mast (the
+# spring from fork_dynamics, soft and height dependent) and the payload on
+# the acrylic fork and load cell beam (stiff). The first mode is the mast
+# sway the simulators animate; the second is the payload bouncing on the cell.
+FORK_PLATE_MASS = 0.3           # kg of the carriage mass that rides on the load cell with the payload
+LOAD_CELL_STIFFNESS = 3.0e5     # N/m of the load cell beam and fork plate together
+LOAD_CELL_DAMPING_RATIO = 0.02  # Aluminium beam, little damping
+MAX_TABLE_LOAD = 20.0           # kg, past the heaviest load the lift can raise
+HEIGHT_POINTS = 27              # Table rows, 5 cm apart
+LOAD_POINTS = 41                # Table columns, 0.5 kg apart
+MODES = 2
+RESONANCE_TOLERANCE = 0.15      # Relative distance from the nearest expected mode still counted as normal
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resonance_table.npz")
+
+def model_parameters():
+    # Everything the table depends on, stored with it to catch a stale file
+    return np.array([CARRIAGE_MASS, FORK_PLATE_MASS, LOAD_CELL_STIFFNESS, LOAD_CELL_DAMPING_RATIO,
+                     DAMPING_RATIO, float(stiffness(0.0)), LIFT_TRAVEL, MAX_TABLE_LOAD, HEIGHT_POINTS, LOAD_POINTS])
+
+# --- MODEL ---
+def fork_modes(load_weight, height):
+    # Natural frequencies (Hz) and damping ratios of both modes for every
+    # (load, height) pair; arguments broadcast, result is (..., MODES, 2).
+    # The eigenvalues s of the damped system give each mode's undamped
+    # frequency |s| / 2pi and damping ratio -Re(s) / |s|.
+    load_weight, height = np.broadcast_arrays(np.asarray(load_weight, dtype=float), np.asarray(height, dtype=float))
+    m1 = np.full(load_weight.shape, CARRIAGE_MASS - FORK_PLATE_MASS)
+    m2 = FORK_PLATE_MASS + load_weight
+    k1 = stiffness(height)
+    k2 = np.full(load_weight.shape, LOAD_CELL_STIFFNESS)
+    c1 = 2 * DAMPING_RATIO * np.sqrt(k1 * (m1 + m2))
+    c2 = 2 * LOAD_CELL_DAMPING_RATIO * np.sqrt(k2 * m2)
+    # State x1, x2, v1, v2: dv = -M^-1 (K x + C v)
+    state = np.zeros(load_weight.shape + (4, 4))
+    state[..., 0, 2] = state[..., 1, 3] = 1.0
+    state[..., 2, 0] = -(k1 + k2) / m1
+    state[..., 2, 1] = k2 / m1
+    state[..., 3, 0] = k2 / m2
+    state[..., 3, 1] = -k2 / m2
+    state[..., 2, 2] = -(c1 + c2) / m1
+    state[..., 2, 3] = c2 / m1
+    state[..., 3, 2] = c2 / m2
+    state[..., 3, 3] = -c2 / m2
+    roots = np.linalg.eigvals(state)
+    # One of each conjugate pair, lowest mode first
+    roots = np.where(roots.imag >= 0, roots, np.inf)
+    order = np.argsort(np.abs(roots), axis=-1)[..., :MODES]
+    roots = np.take_along_axis(roots, order, axis=-1)
+    magnitude = np.abs(roots)
+    return np.stack([magnitude / (2 * np.pi), -roots.real / magnitude], axis=-1)
+
+# --- TABLE ---
+class ResonanceTable:
+    # Modes on a uniform (height, load) grid. A lookup is two index
+    # computations and a bilinear blend of four cells held as plain lists,
+    # so it costs the same few microseconds whatever the table size, and
+    # nothing is solved at run time. Frequencies are blended as 1 / f^2,
+    # which goes with mass / stiffness and so is nearly linear in load.
+    # Outside the grid the edge is held.
+    def __init__(self, heights, loads, modes):
+        self.heights = heights
+        self.loads = loads
+        self.modes = modes  # (heights, loads, MODES, 2): frequency, damping
+        self.height_origin, self.height_step = float(heights[0]), float(heights[1] - heights[0])
+        self.load_origin, self.load_step = float(loads[0]), float(loads[1] - loads[0])
+        blend = np.array(modes, dtype=float)
+        blend[..., 0] = 1.0 / blend[..., 0]**2
+        self._cells = blend.reshape(len(heights), len(loads), -1).tolist()
+
+    @classmethod
+    def build(cls, height_points=HEIGHT_POINTS, load_points=LOAD_POINTS):
+        heights = np.linspace(0.0, LIFT_TRAVEL, height_points)
+        loads = np.linspace(0.0, MAX_TABLE_LOAD, load_points)
+        return cls(heights, loads, fork_modes(loads[None, :], heights[:, None]).astype(np.float32))
+
+    def save(self, path=TABLE_PATH):
+        np.savez_compressed(path, heights=self.heights, loads=self.loads, modes=self.modes,
+                            parameters=model_parameters())
+
+    def lookup(self, load_weight, height):
+        # [(frequency, damping), ...] per mode, lowest first
+        u = min(max((height - self.height_origin) / self.height_step, 0.0), len(self.heights) - 1.0)
+        v = min(max((load_weight - self.load_origin) / self.load_step, 0.0), len(self.loads) - 1.0)
+        i = min(int(u), len(self.heights) - 2)
+        j = min(int(v), len(self.loads) - 2)
+        fu, fv = u - i, v - j
+        low, high = self._cells[i], self._cells[i + 1]
+        blended = [(a * (1 - fv) + b * fv) * (1 - fu) + (c * (1 - fv) + d * fv) * fu
+                   for a, b, c, d in zip(low[j], low[j + 1], high[j], high[j + 1])]
+        return [(blended[k]**-0.5, blended[k + 1]) for k in range(0, len(blended), 2)]
+
+    def fundamental(self, load_weight, height):
+        return self.lookup(load_weight, height)[0]
+
+    def deviation(self, frequency, load_weight, height):
+        # Relative distance from frequency to the nearest expected mode
+        return min(abs(frequency - expected) / expected for expected, _ in self.lookup(load_weight, height))
+
+    def is_expected(self, frequency, load_weight, height, tolerance=RESONANCE_TOLERANCE):
+        return self.deviation(frequency, load_weight, height) <= tolerance
+
+def load_table(path=TABLE_PATH):
+    # The table saved by `python resonance_table.py`. One that is missing
+    # or was made with different model parameters is rebuilt in memory (a
+    # few milliseconds) and the file left alone: only the script writes it.
+    try:
+        with np.load(path) as data:
+            if np.array_equal(data["parameters"], model_parameters()):
+                return ResonanceTable(data["heights"], data["loads"], data["modes"])
+        print(f"Resonance table '{path}' is out of date, built in memory; run `python resonance_table.py` to refresh it.")
+    except (OSError, KeyError, ValueError):
+        pass
+    return ResonanceTable.build()
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    table = ResonanceTable.build()
+    build_time = time.perf_counter() - started
+    table.save()
+    started = time.perf_counter()
+    table = load_table()
+    load_time = time.perf_counter() - started
+    print(f"{HEIGHT_POINTS} heights x {LOAD_POINTS} loads x {MODES} modes: built in {build_time * 1000:.1f} ms, "
+          f"{os.path.getsize(TABLE_PATH) / 1024:.1f} KB on disk, loaded in {load_time * 1000:.1f} ms")
+    for load in [0, 2, 5, 10]:
+        print(f"  {load:2d} kg: " + ", ".join(
+            "{:.1f} m {:.2f} Hz ({:.1%}) / {:.1f} Hz ({:.1%})".format(height, *table.lookup(load, height)[0], *table.lookup(load, height)[1])
+            for height in [0.0, LIFT_TRAVEL / 2, LIFT_TRAVEL]))
+
+    rng = np.random.default_rng(2)
+    loads = rng.uniform(0, 12, 10000)
+    heights = rng.uniform(0, LIFT_TRAVEL, 10000)
+    exact = fork_modes(loads, heights)
+    started = time.perf_counter()
+    looked_up = np.array([table.lookup(load, height) for load, height in zip(loads.tolist(), heights.tolist())])
+    lookup_time = (time.perf_counter() - started) / len(loads)
+    started = time.perf_counter()
+    fork_modes(loads[0], heights[0])
+    solve_time = time.perf_counter() - started
+    error = np.max(np.abs(looked_up[..., 0] - exact[..., 0]) / exact[..., 0], axis=0)
+    print(f"Lookup {lookup_time * 1e6:.2f} us against {solve_time * 1e6:.0f} us to solve the model; "
+          f"max frequency error {error[0]:.2%} (first mode), {error[1]:.2%} (second) over 10000 random cases")
@@ -0,0 +1,196 @@
+import time
+import numpy as np
+from analysis_context import CONTEXT
+
+# --- PARAMETERS ---
+PHASE_IDLE = 0
+PHASE_TRAVEL = 1    # Flags, so a step spent doing both is PHASE_TRAVEL | PHASE_LIFT
+PHASE_LIFT = 2
+PHASE_LIFT_TRAVEL = PHASE_TRAVEL | PHASE_LIFT
+PHASE_NAMES = {PHASE_IDLE: "idle", PHASE_TRAVEL: "travel", PHASE_LIFT: "lift", PHASE_LIFT_TRAVEL: "lift+travel"}
+STORE_ROWS = 1 << 19    # Rows kept, oldest dropped first (24 minutes of three channels at 120 Hz, 10 MB)
+INITIAL_ROWS = 1 << 12  # Rows allocated up front; doubled as needed up to STORE_ROWS
+GAP_FACTOR = 1.5        # A jump of more than this many sample periods between rows starts a new segment
+MIN_SEGMENT = 32        # Shortest run of samples worth a spectrum
+COLUMNS = ("time", "channel", "phase", "loaded", "value")
+
+def phase_of(traveling, lifting):
+    return (PHASE_TRAVEL if traveling else 0) | (PHASE_LIFT if lifting else 0)
+
+# --- STORE ---
+class SampleStore:
+    # Long-format log of sensor samples: one row per (time, channel) with
+    # the phase and whether a load was on the forks, held as parallel numpy
+    # columns. Rows arrive in time order, so a time range is two binary
+    # searches and everything else is a boolean mask over that slice.
+    # When full, the oldest quarter is dropped in one move.
+    def __init__(self, channels, max_rows=STORE_ROWS):
+        self.channels = {name: i for i, name in enumerate(channels)}
+        self.max_rows = max_rows
+        self.rows = 0
+        size = min(INITIAL_ROWS, max_rows)
+        self.time = np.zeros(size)
+        self.channel = np.zeros(size, dtype=np.uint8)
+        self.phase = np.zeros(size, dtype=np.uint8)
+        self.loaded = np.zeros(size, dtype=bool)
+        self.value = np.zeros(size)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in COLUMNS)
+
+    def _make_room(self, count):
+        needed = self.rows + count
+        if needed <= len(self.time):
+            return
+        if needed > self.max_rows:
+            drop = min(max(needed - self.max_rows, self.max_rows // 4), self.rows)
+            for name in COLUMNS:
+                column = getattr(self, name)
+                column[:self.rows - drop] = column[drop:self.rows]
+            self.rows -= drop
+            needed = self.rows + count
+        if needed > len(self.time):
+            size = min(max(2 * len(self.time), needed), self.max_rows)
+            for name in COLUMNS:
+                column = getattr(self, name)
+                grown = np.zeros(size, dtype=column.dtype)
+                grown[:self.rows] = column[:self.rows]
+                setattr(self, name, grown)
+
+    def append(self, timestamp, phase, loaded, **values):
+        # One physics step: every channel given by keyword at the same time
+        self._make_room(len(values))
+        for name, value in values.items():
+            i = self.rows
+            self.time[i] = timestamp
+            self.channel[i] = self.channels[name]
+            self.phase[i] = phase
+            self.loaded[i] = loaded
+            self.value[i] = value
+            self.rows += 1
+
+    def extend(self, times, channel, values, phase, loaded):
+        # Many rows of one channel at once; phase and loaded broadcast
+        values = np.asarray(values, dtype=float)
+        count = min(len(values), self.max_rows)
+        self._make_room(count)
+        rows = slice(self.rows, self.rows + count)
+        self.time[rows] = np.asarray(times, dtype=float)[-count:]
+        self.channel[rows] = self.channels[channel]
+        self.phase[rows] = np.broadcast_to(phase, values.shape)[-count:]
+        self.loaded[rows] = np.broadcast_to(loaded, values.shape)[-count:]
+        self.value[rows] = values[-count:]
+        self.rows += count
+
+    def select(self, channel, phase=None, start=None, stop=None, loaded=None):
+        # (times, values) of one channel, optionally only in the given phase
+        # (or any of a sequence of phases), time range [start, stop) and load state
+        times = self.time[:self.rows]
+        first = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+        last = self.rows if stop is None else int(np.searchsorted(times, stop, side="left"))
+        mask = self.channel[first:last] == self.channels[channel]
+        if phase is not None:
+            mask &= np.isin(self.phase[first:last], phase)
+        if loaded is not None:
+            mask &= self.loaded[first:last] == loaded
+        return times[first:last][mask], self.value[first:last][mask]
+
+    def phases(self, channel, loaded=None):
+        # Phases the channel has samples in, in PHASE_NAMES order
+        mask = self.channel[:self.rows] == self.channels[channel]
+        if loaded is not None:
+            mask &= self.loaded[:self.rows] == loaded
+        present = np.unique(self.phase[:self.rows][mask]).tolist()
+        return [phase for phase in PHASE_NAMES if phase in present]
+
+    def clear(self):
+        self.rows = 0
+
+# --- SEGMENTS AND SPECTRA ---
+def sample_period(times):
+    # Typical spacing of a selection, robust to the gaps between segments
+    steps = np.diff(times)
+    steps = steps[steps > 0]
+    return float(np.median(steps)) if len(steps) else 0.0
+
+def segments(times, period=None):
+    # Slices of runs with no gap longer than GAP_FACTOR sample periods
+    if not len(times):
+        return []
+    period = sample_period(times) if period is None else period
+    breaks = np.flatnonzero(np.diff(times) > GAP_FACTOR * period) + 1
+    edges = [0] + breaks.tolist() + [len(times)]
+    return [slice(start, end) for start, end in zip(edges, edges[1:])]
+
+def segment_spectrum(times, values, min_samples=MIN_SEGMENT, context=CONTEXT, out=None):
+    # (frequencies, amplitude) of a selection: each gap-free segment under
+    # a Hann window, zero-padded to a common length, amplitudes averaged by
+    # length. The sample rate comes from the timestamps, and no FFT runs
+    # across a gap, so segments from different moments don't blur together.
+    # Windows and axes come from context; amplitude goes into out if given.
+    times = np.asarray(times, dtype=float)
+    values = np.asarray(values, dtype=float)
+    period = sample_period(times)
+    parts = [part for part in segments(times, period) if part.stop - part.start >= min_samples]
+    if not parts:
+        raise ValueError(f"No stretch of {min_samples} samples without a gap")
+    n = 1 << int(max(part.stop - part.start for part in parts) - 1).bit_length()
+    amplitude = np.zeros(n // 2 + 1) if out is None else out
+    amplitude[:] = 0.0
+    total = 0
+    for part in parts:
+        plan = context.plan(n, 1.0 / period)
+        spectrum = plan(values[part], context.window(part.stop - part.start))
+        spectrum *= part.stop - part.start
+        amplitude += spectrum
+        total += part.stop - part.start
+    amplitude /= total
+    return plan.freqs, amplitude
+
+if __name__ == "__main__":
+    # Ten minutes at 120 Hz in alternating runs: travel rings the fork at
+    # 5.5 Hz, lifting at 8 Hz through the screw, idle is noise only
+    rng = np.random.default_rng(10)
+    sample_rate = 120.0
+    tones = {PHASE_IDLE: 0.0, PHASE_TRAVEL: 5.5, PHASE_LIFT: 8.0, PHASE_LIFT_TRAVEL: 5.5}
+    store = SampleStore(["fork", "wheel_speed", "screw_angle"])
+    steps = int(600 * sample_rate)
+    phase = PHASE_IDLE
+    phase_log = np.zeros(steps, dtype=np.uint8)
+    signal = np.zeros(steps)
+    started = time.perf_counter()
+    for step in range(steps):
+        if step % 360 == 0:
+            phase = int(rng.integers(4))
+        t = step / sample_rate
+        signal[step] = 0.001 * np.sin(2 * np.pi * tones[phase] * t) + 0.0002 * rng.standard_normal()
+        phase_log[step] = phase
+        store.append(t, phase, True, fork=signal[step], wheel_speed=20.0 * (phase & PHASE_TRAVEL), screw_angle=0.0)
+    elapsed = time.perf_counter() - started
+    print(f"{store.rows} rows appended a physics step at a time (with signal generation): "
+          f"{elapsed / steps * 1e6:.1f} us per step, {store.nbytes / 1024:.0f} KB")
+
+    started = time.perf_counter()
+    for _ in range(100):
+        times, values = store.select("fork", PHASE_LIFT, start=100.0, stop=400.0)
+    elapsed = (time.perf_counter() - started) / 100
+    rows = list(zip(store.time[:store.rows].tolist(), store.channel[:store.rows].tolist(),
+                    store.phase[:store.rows].tolist(), store.value[:store.rows].tolist()))
+    started = time.perf_counter()
+    naive = [value for t, channel, phase, value in rows if channel == 0 and phase == PHASE_LIFT and 100.0 <= t < 400.0]
+    naive_time = time.perf_counter() - started
+    print(f"Lift samples from 100-400 s: {len(values)} in {elapsed * 1e6:.0f} us "
+          f"(filtering a list of rows: {naive_time * 1e6:.0f} us, same values {np.array_equal(values, naive)})")
+
+    # The old way: everything moving concatenated on an invented time axis
+    moving = signal[phase_log != PHASE_IDLE]
+    spectrum = 2.0 * np.abs(np.fft.rfft(moving)) / len(moving)
+    freqs = np.fft.rfftfreq(len(moving), 1 / sample_rate)
+    top = freqs[np.argsort(spectrum)[-2:]]
+    print(f"Phases concatenated: peaks at {top[1]:.2f} and {top[0]:.2f} Hz, one spectrum for both")
+    for phase in store.phases("fork"):
+        freqs, amplitude = segment_spectrum(*store.select("fork", phase))
+        band = freqs > 1.0
+        print(f"  {PHASE_NAMES[phase]:>11}: peak {freqs[band][np.argmax(amplitude[band])]:.2f} Hz, "
+              f"{amplitude[band].max() * 1000:.3f} mm")
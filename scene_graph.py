@@ -0,0 +1,91 @@
+import math
+import numpy as np
+
+# --- MATRICES ---
+def translation_matrix(x, y, z):
+    matrix = np.identity(4)
+    matrix[:3, 3] = (x, y, z)
+    return matrix
+
+def rotation_matrix(angle, axis="z"):
+    # Degrees, right-handed, same convention as glRotatef
+    c = math.cos(math.radians(angle))
+    s = math.sin(math.radians(angle))
+    matrix = np.identity(4)
+    if axis == "x":
+        matrix[1:3, 1:3] = ((c, -s), (s, c))
+    elif axis == "y":
+        matrix[0, 0], matrix[0, 2], matrix[2, 0], matrix[2, 2] = c, s, -s, c
+    else:
+        matrix[0:2, 0:2] = ((c, -s), (s, c))
+    return matrix
+
+# --- NODES ---
+class SceneNode:
+    # A node holds its transform relative to the parent and caches its world
+    # matrix. Changing a transform marks the node and its subtree dirty, so a
+    # world matrix is only recomputed when something above it has moved.
+    def __init__(self, name, parent=None, local=None, draw=None):
+        self.name = name
+        self.parent = None
+        self.children = []
+        self.local = np.identity(4) if local is None else local
+        self.draw = draw
+        self._world = np.identity(4)
+        self._dirty = True
+        self._pose = None
+        if parent is not None:
+            parent.add_child(self)
+
+    def add_child(self, node):
+        node.parent = self
+        self.children.append(node)
+        node.mark_dirty()
+        return node
+
+    def mark_dirty(self):
+        # A dirty node's descendants are always dirty too, so we can stop early
+        if self._dirty:
+            return
+        self._dirty = True
+        for child in self.children:
+            child.mark_dirty()
+
+    def set_local(self, matrix):
+        self.local = matrix
+        self._pose = None
+        self.mark_dirty()
+
+    def set_pose(self, x=0.0, y=0.0, z=0.0, angle=0.0):
+        # Translation followed by a rotation about z; a no-op if nothing changed
+        pose = (x, y, z, angle)
+        if pose == self._pose:
+            return
+        self.local = translation_matrix(x, y, z) @ rotation_matrix(angle) if angle else translation_matrix(x, y, z)
+        self._pose = pose
+        self.mark_dirty()
+
+    @property
+    def world(self):
+        if self._dirty:
+            if self.parent is None:
+                self._world = self.local
+            else:
+                self._world = self.parent.world @ self.local
+            self._dirty = False
+        return self._world
+
+    def world_point(self, x=0.0, y=0.0, z=0.0):
+        world = self.world
+        return world[:3, :3] @ (x, y, z) + world[:3, 3]
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def find(self, name):
+        for node in self.walk():
+            if node.name == name:
+                return node
+        return None
@@ -0,0 +1,152 @@
+import time
+import numpy as np
+from analysis_context import CONTEXT
+from OpenGL.GL import (glGenTextures, glBindTexture, glTexImage2D, glTexSubImage2D, glTexParameteri, glPixelStorei,
+                       glEnable, glDisable, glBegin, glEnd, glColor3f, glTexCoord2f, glVertex2f,
+                       GL_TEXTURE_2D, GL_RGB, GL_UNSIGNED_BYTE, GL_TEXTURE_MIN_FILTER, GL_TEXTURE_MAG_FILTER,
+                       GL_TEXTURE_WRAP_S, GL_TEXTURE_WRAP_T, GL_NEAREST, GL_REPEAT, GL_CLAMP_TO_EDGE,
+                       GL_UNPACK_ALIGNMENT, GL_QUADS, GL_LINE_LOOP)
+
+# --- PARAMETERS ---
+SPECTROGRAM_FFT = 64        # Samples per STFT frame; at 120 Hz, 33 bins 1.9 Hz apart
+SPECTROGRAM_HOP = 8         # New samples per column (15 columns a second at 120 Hz)
+SPECTROGRAM_COLUMNS = 256   # Texture width: columns on screen before the oldest is overwritten
+DB_RANGE = 60.0             # dB from the recent peak down to black
+PEAK_DECAY = 0.995          # Per column, so the colour scale follows the signal level down again
+
+# Black - blue - magenta - orange - yellow, as 256 RGB entries
+_STOPS = np.array([0.0, 0.25, 0.5, 0.75, 1.0])
+_COLOURS = np.array([[0, 0, 0], [40, 20, 140], [180, 40, 140], [250, 130, 30], [255, 250, 160]])
+COLORMAP = np.stack([np.interp(np.linspace(0, 1, 256), _STOPS, _COLOURS[:, c]) for c in range(3)],
+                    axis=1).astype(np.uint8)
+
+# --- STFT ---
+class StftColumns:
+    # Short-time spectrum of a stream, one colour column per hop: the last
+    # fft_size samples under a Hann window, magnitude in dB below a slowly
+    # decaying peak, mapped through COLORMAP. Pure numpy, so it runs (and
+    # can be measured) without a GL context. The frame and the per-bin
+    # arrays are worked in place; only the finished columns are new.
+    def __init__(self, fft_size=SPECTROGRAM_FFT, hop=SPECTROGRAM_HOP, context=CONTEXT):
+        self.hop = hop
+        self.plan = context.plan(fft_size, 1.0)  # Bins only, so any sample rate will do
+        self.window = context.window(fft_size)
+        self.frame = np.zeros(fft_size)
+        self.pending = []
+        self.peak = 1e-12
+        self.bins = fft_size // 2 + 1
+        self.magnitude = np.zeros(self.bins)
+        self.level = np.zeros(self.bins)
+        self.index = np.zeros(self.bins, dtype=np.intp)
+
+    def push(self, samples):
+        # Scalar or array; returns the (bins, 3) uint8 columns completed
+        self.pending.extend(np.atleast_1d(samples).tolist())
+        columns = []
+        while len(self.pending) >= self.hop:
+            self.frame[:-self.hop] = self.frame[self.hop:]
+            self.frame[-self.hop:] = self.pending[:self.hop]
+            del self.pending[:self.hop]
+            magnitude = self.plan(self.frame, self.window, self.magnitude)
+            self.peak = max(self.peak * PEAK_DECAY, float(magnitude.max()))
+            level = self.level
+            np.maximum(magnitude, 1e-30, out=level)
+            level /= self.peak
+            np.log10(level, out=level)
+            level *= 20 * 255 / DB_RANGE
+            level += 255
+            np.clip(level, 0, 255, out=level)
+            self.index[:] = level
+            columns.append(COLORMAP[self.index])
+        return columns
+
+# --- PANEL ---
+class SpectrogramPanel:
+    # Scrolling spectrogram drawn as one textured quad. Each new column
+    # overwrites the oldest texel column with glTexSubImage2D (bins * 3
+    # bytes), and the quad's texture coordinates start at the write
+    # position and wrap round with GL_REPEAT, so the picture scrolls
+    # without the texture ever being uploaded again. Columns computed
+    # between frames are queued and uploaded at draw time, when a GL
+    # context is certain to exist.
+    def __init__(self, fft_size=SPECTROGRAM_FFT, hop=SPECTROGRAM_HOP, columns=SPECTROGRAM_COLUMNS):
+        self.stft = StftColumns(fft_size, hop)
+        self.width = columns
+        self.height = 1 << (self.stft.bins - 1).bit_length()  # Power of two for older GL
+        self.texture = None
+        self.column = 0     # Next texel column to write; also the oldest on screen
+        self.queued = []
+
+    def push(self, samples):
+        self.queued.extend(self.stft.push(samples))
+        del self.queued[:-self.width]
+
+    def _create_texture(self):
+        self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, self.width, self.height, 0, GL_RGB, GL_UNSIGNED_BYTE,
+                     np.zeros((self.height, self.width, 3), dtype=np.uint8))
+
+    def upload(self):
+        if self.texture is None:
+            self._create_texture()
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        for column in self.queued:
+            glTexSubImage2D(GL_TEXTURE_2D, 0, self.column, 0, 1, len(column), GL_RGB, GL_UNSIGNED_BYTE,
+                            np.ascontiguousarray(column))
+            self.column = (self.column + 1) % self.width
+        self.queued.clear()
+
+    def draw(self, x0, y0, x1, y1):
+        # In a 2D ortho projection with lighting and depth test off, as the load-cell graph
+        self.upload()
+        start = self.column / self.width
+        top = self.stft.bins / self.height
+        glEnable(GL_TEXTURE_2D)
+        glColor3f(1.0, 1.0, 1.0)
+        glBegin(GL_QUADS)
+        glTexCoord2f(start, 0.0)
+        glVertex2f(x0, y0)
+        glTexCoord2f(start + 1.0, 0.0)
+        glVertex2f(x1, y0)
+        glTexCoord2f(start + 1.0, top)
+        glVertex2f(x1, y1)
+        glTexCoord2f(start, top)
+        glVertex2f(x0, y1)
+        glEnd()
+        glDisable(GL_TEXTURE_2D)
+        glBegin(GL_LINE_LOOP)
+        glVertex2f(x0, y0)
+        glVertex2f(x1, y0)
+        glVertex2f(x1, y1)
+        glVertex2f(x0, y1)
+        glEnd()
+
+if __name__ == "__main__":
+    # A minute of fork vibration at 120 Hz with the resonance sliding from
+    # 11 Hz (empty, low) to 4 Hz (heavy, high)
+    rng = np.random.default_rng(8)
+    sample_rate = 120.0
+    t = np.arange(int(60 * sample_rate)) / sample_rate
+    frequency = np.linspace(11, 4, len(t))
+    signal = np.sin(2 * np.pi * np.cumsum(frequency) / sample_rate) + 0.1 * rng.standard_normal(len(t))
+
+    panel = SpectrogramPanel()
+    started = time.perf_counter()
+    columns = 0
+    for value in signal.tolist():
+        panel.push(value)
+        columns += len(panel.queued)
+        panel.queued.clear()
+    elapsed = time.perf_counter() - started
+    print(f"{columns} columns from {len(t)} samples: {elapsed / len(t) * 1e6:.2f} us per physics step, "
+          f"{elapsed / columns * 1e6:.1f} us per column")
+    full = panel.width * panel.height * 3
+    print(f"Upload per column {panel.stft.bins * 3} bytes against {full} bytes to re-send the texture "
+          f"({full // (panel.stft.bins * 3)}x less)")
@@ -0,0 +1,261 @@
+import time
+import numpy as np
+
+# --- PARAMETERS ---
+STORE_FANOUT = 8            # Entries of one tier summarised by each bucket of the next
+STORE_TIERS = 6             # Raw samples plus five pyramid tiers: buckets of 8, 64, 512, 4096 and 32768 samples
+RAW_CAPACITY = 1 << 16      # Raw samples kept (9 minutes at 120 Hz); at least the largest bucket
+TIER_CAPACITY = 1 << 13     # Buckets kept per pyramid tier (the top one reaches back 25 days at 120 Hz)
+ZOOM_STEP = 4               # Span multiplier per zoom key press
+MIN_SPAN = 50               # Fewest samples across the graph when zoomed all the way in
+
+# --- TIERS ---
+class PyramidTier:
+    # Ring of buckets, each the min, max and sum of `size` consecutive
+    # samples, fed with whole entries of the tier below (or raw samples).
+    # The bucket being filled is held as plain floats until it completes,
+    # so a push touches the arrays once per bucket rather than per sample.
+    def __init__(self, size, fanout, capacity):
+        self.size = size
+        self.fanout = fanout
+        self.capacity = capacity
+        self.low = np.zeros(capacity)
+        self.high = np.zeros(capacity)
+        self.sum = np.zeros(capacity)
+        self.total = 0  # Buckets completed since the start, so bucket b covers samples b*size to (b+1)*size
+        self._clear()
+
+    def _clear(self):
+        self.partial_low = np.inf
+        self.partial_high = -np.inf
+        self.partial_sum = 0.0
+        self.partial_count = 0  # Entries from the tier below
+
+    def add(self, low, high, total):
+        # One entry from below; returns the completed bucket, or None
+        self.partial_low = min(self.partial_low, low)
+        self.partial_high = max(self.partial_high, high)
+        self.partial_sum += total
+        self.partial_count += 1
+        if self.partial_count < self.fanout:
+            return None
+        bucket = (self.partial_low, self.partial_high, self.partial_sum)
+        i = self.total % self.capacity
+        self.low[i], self.high[i], self.sum[i] = bucket
+        self.total += 1
+        self._clear()
+        return bucket
+
+    def extend(self, low, high, total):
+        # Many entries from below as arrays; returns the completed buckets as arrays
+        completed = []
+        if self.partial_count:
+            head = min(self.fanout - self.partial_count, len(low))
+            self.partial_low = min(self.partial_low, float(low[:head].min()))
+            self.partial_high = max(self.partial_high, float(high[:head].max()))
+            self.partial_sum += float(total[:head].sum())
+            self.partial_count += head
+            low, high, total = low[head:], high[head:], total[head:]
+            if self.partial_count < self.fanout:
+                return low, high, total  # Nothing left over: empty arrays
+            completed.append(([self.partial_low], [self.partial_high], [self.partial_sum]))
+            self._clear()
+        whole = len(low) - len(low) % self.fanout
+        if whole:
+            completed.append((low[:whole].reshape(-1, self.fanout).min(axis=1),
+                              high[:whole].reshape(-1, self.fanout).max(axis=1),
+                              total[:whole].reshape(-1, self.fanout).sum(axis=1)))
+        if whole < len(low):
+            self.partial_low = float(low[whole:].min())
+            self.partial_high = float(high[whole:].max())
+            self.partial_sum = float(total[whole:].sum())
+            self.partial_count = len(low) - whole
+        if not completed:
+            return low[:0], high[:0], total[:0]
+        low, high, total = (np.concatenate(parts) for parts in zip(*completed))
+        _write_ring((self.low, self.high, self.sum), self.total, (low, high, total))
+        self.total += len(low)
+        return low, high, total
+
+    def oldest(self):
+        # First bucket still held
+        return max(self.total - self.capacity, 0)
+
+    def buckets(self, first, last):
+        # (low, high, sum) of held buckets first..last-1
+        index = np.arange(first, last) % self.capacity
+        return self.low[index], self.high[index], self.sum[index]
+
+def _write_ring(rings, start, values):
+    # Write parallel arrays into parallel rings at absolute position start;
+    # only the newest len(ring) values can survive, so only those are written
+    capacity = len(rings[0])
+    skip = max(len(values[0]) - capacity, 0)
+    index = np.arange(start + skip, start + len(values[0])) % capacity
+    for ring, value in zip(rings, values):
+        ring[index] = value[skip:]
+
+# --- STORE ---
+class TimeSeriesStore:
+    # Raw samples in a ring, plus a pyramid of min/max/mean tiers each
+    # STORE_FANOUT times coarser than the last, all updated as samples are
+    # pushed. Memory is fixed by the capacities. A read asks for a sample
+    # range and a pixel width and is served from the finest tier with no
+    # more buckets than pixels, so drawing a day costs about the same as
+    # drawing a second. Sample times are indices since the first push.
+    def __init__(self, fanout=STORE_FANOUT, tiers=STORE_TIERS, raw_capacity=RAW_CAPACITY,
+                 tier_capacity=TIER_CAPACITY):
+        self.fanout = fanout
+        self.raw = np.zeros(raw_capacity)
+        self.count = 0  # Samples pushed since the start
+        self.tiers = [PyramidTier(fanout**level, fanout, tier_capacity) for level in range(1, tiers)]
+
+    @property
+    def nbytes(self):
+        return self.raw.nbytes + sum(tier.low.nbytes + tier.high.nbytes + tier.sum.nbytes for tier in self.tiers)
+
+    @property
+    def span(self):
+        # Samples the coarsest tier can reach back over when full
+        if not self.tiers:
+            return len(self.raw)
+        return self.tiers[-1].size * self.tiers[-1].capacity
+
+    @property
+    def history(self):
+        # Samples a read can reach back over now: those pushed, up to span
+        return min(self.count, self.span)
+
+    def push(self, value):
+        value = float(value)
+        self.raw[self.count % len(self.raw)] = value
+        self.count += 1
+        bucket = (value, value, value)
+        for tier in self.tiers:
+            bucket = tier.add(*bucket)
+            if bucket is None:
+                break
+
+    def extend(self, values):
+        # Many samples at once (an offline log), vectorised tier by tier
+        values = np.asarray(values, dtype=float).ravel()
+        _write_ring((self.raw,), self.count, (values,))
+        self.count += len(values)
+        low = high = total = values
+        for tier in self.tiers:
+            low, high, total = tier.extend(low, high, total)
+            if not len(low):
+                break
+
+    def oldest(self):
+        # First sample still held at any resolution
+        if not self.tiers:
+            return max(self.count - len(self.raw), 0)
+        return self.tiers[-1].oldest() * self.tiers[-1].size
+
+    def level_for(self, start, stop, pixels):
+        # 0 for raw samples, else the tier number: the finest that fits the
+        # range into pixels and still holds its start
+        span = max(stop - start, 1)
+        if span <= pixels and start >= self.count - len(self.raw):
+            return 0
+        for level, tier in enumerate(self.tiers, 1):
+            if span <= pixels * tier.size and start >= tier.oldest() * tier.size:
+                return level
+        return len(self.tiers)
+
+    def read(self, start, stop, pixels):
+        # (times, low, high, mean) arrays covering samples start..stop-1,
+        # at most about pixels long; times are each entry's first sample.
+        # The bucket still filling at the end is summarised from the raw
+        # ring, so the newest samples show at every zoom.
+        start, stop = max(int(start), self.oldest(), 0), min(int(stop), self.count)
+        if stop <= start:
+            empty = np.zeros(0)
+            return empty, empty, empty, empty
+        level = self.level_for(start, stop, pixels)
+        if level == 0:
+            values = self.raw[np.arange(start, stop) % len(self.raw)]
+            return np.arange(start, stop), values, values, values
+        tier = self.tiers[level - 1]
+        first = max(start // tier.size, tier.oldest())
+        last = min(-(-stop // tier.size), tier.total)
+        low, high, total = tier.buckets(first, last)
+        times = np.arange(first, last) * tier.size
+        mean = total / tier.size
+        tail = last * tier.size
+        if tail < stop and tail >= self.count - len(self.raw):
+            values = self.raw[np.arange(tail, stop) % len(self.raw)]
+            times = np.append(times, tail)
+            low = np.append(low, values.min())
+            high = np.append(high, values.max())
+            mean = np.append(mean, values.mean())
+        return times, low, high, mean
+
+    def latest(self, span, pixels):
+        # The newest span samples, for a graph scrolling with the stream
+        return self.read(self.count - span, self.count, pixels)
+
+# --- ZOOM ---
+def zoom_span(span, steps, longest):
+    # Graph span after steps zoom presses (out is positive)
+    return int(min(max(span * ZOOM_STEP**steps, MIN_SPAN), longest))
+
+def span_label(samples, sample_rate):
+    seconds = samples / sample_rate
+    if seconds < 120:
+        return f"{seconds:.1f} s"
+    if seconds < 7200:
+        return f"{seconds / 60:.0f} min"
+    if seconds < 172800:
+        return f"{seconds / 3600:.1f} h"
+    return f"{seconds / 86400:.1f} days"
+
+if __name__ == "__main__":
+    # Eight hours of a 120 Hz load cell: a load coming and going, fork
+    # ringing and noise, then reads zooming from the whole shift to a second
+    rng = np.random.default_rng(9)
+    sample_rate = 120.0
+    hours = 8
+    t = np.arange(int(hours * 3600 * sample_rate)) / sample_rate
+    signal = (0.5 * (np.sin(2 * np.pi * t / 600) > 0) + 0.05 * np.sin(2 * np.pi * 5.5 * t)
+              + 0.02 * rng.standard_normal(len(t)))
+
+    store = TimeSeriesStore()
+    started = time.perf_counter()
+    store.extend(signal)
+    elapsed = time.perf_counter() - started
+    print(f"{len(t)} samples ({hours} h) stored in {elapsed:.2f} s ({len(t) / elapsed / 1e6:.1f} M samples/s); "
+          f"{store.nbytes / 1024:.0f} KB held against {signal.nbytes / 1024 / 1024:.0f} MB raw")
+
+    streamed = TimeSeriesStore()
+    started = time.perf_counter()
+    for value in signal[:120 * 600].tolist():
+        streamed.push(value)
+    elapsed = time.perf_counter() - started
+    print(f"One sample per physics step: {elapsed / (120 * 600) * 1e6:.2f} us per push")
+
+    check = TimeSeriesStore()
+    check.extend(signal[:100000])
+    for value in signal[100000:123457].tolist():
+        check.push(value)
+    tier = check.tiers[2]
+    expected = signal[:tier.total * tier.size].reshape(-1, tier.size)
+    low, high, total = tier.buckets(tier.oldest(), tier.total)
+    held = expected[tier.oldest():]
+    print(f"Mixed extend and push match the batch min/max/mean: "
+          f"{np.allclose(low, held.min(axis=1)) and np.allclose(high, held.max(axis=1)) and np.allclose(total / tier.size, held.mean(axis=1))}")
+
+    pixels = 280
+    for span in [MIN_SPAN, 120 * 60, 120 * 3600, len(t)]:
+        started = time.perf_counter()
+        for _ in range(100):
+            times, low, high, mean = store.latest(span, pixels)
+        elapsed = (time.perf_counter() - started) / 100
+        start = len(t) - span
+        started = time.perf_counter()
+        naive = signal[start:].min(), signal[start:].max()
+        naive_time = time.perf_counter() - started
+        print(f"Last {span_label(span, sample_rate):>8}: tier {store.level_for(start, len(t), pixels)}, "
+              f"{len(times)} points in {elapsed * 1e6:6.1f} us (scanning the raw samples {naive_time * 1e6:8.1f} us); "
+              f"range {low.min():+.3f}..{high.max():+.3f}, exact {naive[0]:+.3f}..{naive[1]:+.3f}")